@@ -0,0 +1,51 @@
+from typing import Dict
+
+import numpy as np
+
+
+def population_diversity(ids: np.ndarray, symbols: int) -> Dict[str, object]:
+    """
+    Diversity of a population, from its chord ids, [chromosome, planet].
+
+    Everything is derived from how often each chord occurs at each planet,
+    so the cost grows with the population, not with its square:
+
+        Planet entropy  Shannon entropy of each planet's chords, divided by
+                        the most it could be, so 0 when every chromosome has
+                        the same chord there and 1 when no two do
+        Entropy         the mean over planets
+        Hamming         mean Hamming distance between two chromosomes, as a
+                        share of the planets; exact, since the pairs that
+                        differ at a planet are n^2 - sum(count^2), halved
+        Unique          number of distinct chromosomes
+
+    Args:
+        ids (np.ndarray): Chord ids of the population.
+        symbols (int): Number of chord ids, e.g. len(CHORDS).
+    """
+    n, planets = ids.shape
+    # Runs of the same chord in each planet's sorted column: one per chord that occurs there
+    columns = np.sort(ids.T, axis=1)
+    run_start = np.ones((planets, n), dtype=bool)
+    np.not_equal(columns[:, 1:], columns[:, :-1], out=run_start[:, 1:])
+    starts = np.flatnonzero(run_start)
+    counts = np.empty_like(starts)
+    counts[:-1] = starts[1:]
+    counts[-1] = planets * n
+    counts -= starts
+    planet = starts // n
+    # Entropy is log2(n) - sum(count * log2(count)) / n
+    entropy = (np.log2(n) - np.bincount(planet, weights=counts * np.log2(counts), minlength=planets) / n)
+    entropy = (entropy / np.log2(max(2, min(n, symbols)))).tolist()
+    same = np.bincount(planet, weights=counts * counts, minlength=planets).sum()
+    pairs = max(1, n * (n - 1) // 2)
+    return {"Entropy": sum(entropy) / planets,
+            "Planet entropy": entropy,
+            "Hamming": float(planets * n * n - same) / (2 * pairs * planets),
+            "Unique": unique_rows(ids)}
+
+def unique_rows(ids: np.ndarray) -> int:
+    """Number of distinct rows; each row is compared as one opaque value, which is much faster than axis=0."""
+    rows = np.ascontiguousarray(ids).view(np.dtype((np.void, ids.dtype.itemsize * ids.shape[1]))).ravel()
+    rows.sort()
+    return 1 + int(np.count_nonzero(rows[1:] != rows[:-1])) if len(rows) else 0
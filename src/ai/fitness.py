@@ -1,19 +1,61 @@
-from ai.utils import SolarSystemChromosome
-from music.harmony import ScaleData
+from typing import Dict, Sequence
+
+import numpy as np
+
+from ai.utils import SolarSystemChromosome, chromosome_ids
+from music.harmony import CHORDS, POPCOUNT_ARRAY, ScaleData, chord_arrays, voice_leading_table
 
 class FitnessEvaluator:
     """
-    Evaluates the musical fitness of a chromosome based on harmonic consonance.
+    Evaluates the musical fitness of a chromosome based on harmonic consonance
+    and on the voice leading between consecutive planets' chords.
+
+    Each chord's score against a scale depends only on the two of them, so the
+    scores of the whole chord vocabulary are computed at once, from the chords'
+    pitch-class masks, the first time a scale is seen. Voice-leading scores of
+    every pair of chord types at every root interval are precomputed when the
+    evaluator is created (see voice_leading_table). Evaluating a chromosome is
+    then one lookup per gene and one per pair of neighbouring genes, however
+    large the vocabulary.
     """
 
     ROOT_WEIGHT = 0.4
     TRIAD_WEIGHT = 0.5
     EXTENSION_WEIGHT = 0.1
+    # Share of the fitness given to voice leading, the rest to consonance with the scale
+    VOICE_LEADING_WEIGHT = 0.2
+    # Voice-leading score that counts as fully smooth; only rougher moves are penalised
+    VOICE_LEADING_TARGET = 0.6
+
+    def __init__(self) -> None:
+        self._scores: Dict[int, np.ndarray] = {}  # Chord scores by chord id, per scale id
+        self.voice_leading = np.minimum(voice_leading_table() / self.VOICE_LEADING_TARGET, 1.0)
+
+    def chord_scores(self, scale: ScaleData) -> np.ndarray:
+        """Every chord's score against the scale, indexed by chord id."""
+        scores = self._scores.get(scale.id)
+        if scores is None or len(scores) != len(CHORDS):
+            roots, triad_masks, extension_masks, extensions = chord_arrays()
+            scale_mask = scale.mask
+            # 1. Εvaluate the root note
+            root_score = (scale_mask >> roots) & 1
+            # 2. Evaluate the Triad (3rd and 5th)
+            triad_score = POPCOUNT_ARRAY[triad_masks & scale_mask] / 2
+            # 3. Evaluate Extensions (7ths, 9ths, etc.); a plain triad has none to clash
+            extensions_score = np.where(extensions > 0,
+                                        POPCOUNT_ARRAY[extension_masks & scale_mask] / np.maximum(extensions, 1),
+                                        1.0)
+            #Weights fitness so that more dissonance is allowed in the extensions
+            scores = ((root_score * self.ROOT_WEIGHT) + (triad_score * self.TRIAD_WEIGHT) +
+                      (extensions_score * self.EXTENSION_WEIGHT))
+            self._scores[scale.id] = scores
+        return scores
 
     def evaluate(self, chromosome: SolarSystemChromosome,
                 current_scale: ScaleData) -> float:
         """
-        Evaluate how consonant a sequence of chords is with the current scale.
+        Evaluate how consonant a sequence of chords is with the current scale,
+        and how smoothly each chord leads to the next.
 
         Args:
             chromosome (SolarSystemChromosome): The individual to be evaluated.
@@ -22,26 +64,38 @@ class FitnessEvaluator:
         Returns:
             float: A fitness score between 0.0 and 1.0.
         """
-
-        scale_intervals = [(interval + current_scale.root)%12 for interval in current_scale.intervals]
-        chord_scores = []
-        
+        scores = self.chord_scores(current_scale)
+        chords = [gene.chord for gene in chromosome.planet_genes]
         #Each gene represents a chord
-        for gene in chromosome.planet_genes:
-            # 1. Εvaluate the root note
-            root_score = int(gene.chord.root in scale_intervals)
-            notes = [(interval + gene.chord.root) % 12 for interval in gene.chord.intervals]
+        consonance = sum([float(scores[chord.id]) for chord in chords]) / len(chords)
+        if len(chords) < 2:
+            return consonance
 
-            # 2. Evaluate the Triad (3rd and 5th)
-            triad_score = sum([(note in scale_intervals) for note in notes[1:3]])/2
-            
-            # 3. Evaluate Extensions (7ths, 9ths, etc.)
-            extensions_score = sum([(note in scale_intervals) for note in notes[3:]])/len(notes[3:])
+        #Voice leading from each planet's chord to the next
+        leading = sum([float(self.voice_leading[a.type_id, b.type_id, (b.root - a.root) % 12])
+                       for a, b in zip(chords, chords[1:])]) / (len(chords) - 1)
+        return ((1.0 - self.VOICE_LEADING_WEIGHT) * consonance +
+                self.VOICE_LEADING_WEIGHT * leading)
 
-            #Weights fitness so that more dissonance is allowed in the extensions
-            chord_scores.append((root_score * self.ROOT_WEIGHT) + (triad_score * self.TRIAD_WEIGHT) +
-            (extensions_score * self.EXTENSION_WEIGHT))
-        
-        score = sum(chord_scores)/len(chromosome.planet_genes)
-        return score
-        
+    def evaluate_batch(self, chromosomes: Sequence[SolarSystemChromosome],
+                       current_scale: ScaleData) -> np.ndarray:
+        """
+        Evaluates many chromosomes with the same number of genes at once.
+
+        Returns:
+            np.ndarray: One fitness score between 0.0 and 1.0 per chromosome.
+        """
+        return self.evaluate_ids(chromosome_ids(chromosomes), current_scale)
+
+    def evaluate_ids(self, ids: np.ndarray, current_scale: ScaleData) -> np.ndarray:
+        """evaluate_batch() of the chromosomes whose chord ids are ids, [chromosome, planet]."""
+        #Each gene represents a chord
+        consonance = self.chord_scores(current_scale)[ids].mean(axis=1)
+        if ids.shape[1] < 2:
+            return consonance
+
+        #Voice leading from each planet's chord to the next
+        types, roots = np.divmod(ids, 12)
+        leading = self.voice_leading[types[:, :-1], types[:, 1:], (roots[:, 1:] - roots[:, :-1]) % 12]
+        return ((1.0 - self.VOICE_LEADING_WEIGHT) * consonance +
+                self.VOICE_LEADING_WEIGHT * leading.mean(axis=1, dtype=np.float64))
@@ -0,0 +1,327 @@
+"""
+Neural melody engine: a small chord-conditioned interval predictor, played
+alongside the Markov model.
+
+The network (Config.INPUT_SIZE -> HIDDEN_SIZE -> OUTPUT_SIZE) predicts the
+next melody interval, -12 to +12 semitones, from:
+
+    12  which pitch classes, counted up from the current melody pitch, are chord tones
+     3  the last Config.SEQ_LEN intervals, in octaves
+     1  the chord's root relative to the scale's, in octaves
+     1  velocity, 0-1
+
+It is trained on melodies sampled from the chord-biased Markov model over
+random chords and scales, so it learns how the Markov melodies move against
+a chord, and its weights are kept in the startup cache.
+
+Inference runs on the CPU in a background worker. For each voice it predicts
+the next Config.NEURAL_HORIZON notes ahead of time, one batched forward pass
+over all voices per note, so a note normally finds its interval ready. When
+the chord or scale changes the predictions are discarded. A note whose
+prediction isn't ready gets the Markov model's interval instead, and the
+network predicts on from there. By default (Config.NEURAL_BUDGET = 0) a note
+never waits for the network at all; a positive budget lets it wait that long,
+at best, for a prediction.
+
+torch is optional (requirements-dev.txt); without it the melody stays with
+the Markov model.
+"""
+import importlib.util
+import threading
+import time
+from collections import deque
+from typing import Callable, Deque, Dict, List, Optional, Tuple
+
+import numpy as np
+
+from cache import cache_key, cached_arrays
+from config import Config
+from music.harmony import CHORDS, MASK_BITS, SCALES, ChordData, ScaleData
+from music.sequencer import fold_melody_pitch
+
+# Interval of each network output
+INTERVALS = np.arange(Config.OUTPUT_SIZE) - Config.OUTPUT_SIZE // 2
+_PITCH_CLASSES = np.arange(12)
+# Weight of each predicted pitch by whether it's in the scale, as the Markov model weights them
+IN_SCALE_WEIGHT = 1.0
+OUT_OF_SCALE_WEIGHT = 0.025
+
+
+def melody_features(pitch: int, history, chord: ChordData, scale: ScaleData, velocity: int) -> np.ndarray:
+    """The network's input for the note after pitch, given the previous intervals in history."""
+    features = np.empty(Config.INPUT_SIZE, dtype=np.float32)
+    features[:12] = MASK_BITS[chord.mask][(pitch + _PITCH_CLASSES) % 12]
+    features[12:12 + Config.SEQ_LEN] = np.asarray(history, dtype=np.float32) / 12.0
+    features[-2] = ((chord.root - scale.root) % 12) / 12.0
+    features[-1] = velocity / 127.0
+    return features
+
+
+def training_data(markov, samples: int, rng: np.random.Generator) -> Tuple[np.ndarray, np.ndarray]:
+    """
+    Features and target outputs from a melody sampled from the Markov model,
+    under a random chord, scale and velocity every 8 notes.
+    """
+    if Config.INPUT_SIZE != 12 + Config.SEQ_LEN + 2:
+        raise ValueError(f"Config.INPUT_SIZE should be {12 + Config.SEQ_LEN + 2} for SEQ_LEN {Config.SEQ_LEN}")
+    chords = CHORDS[:Config.CHORD_VOCABULARY * 12] or CHORDS
+    features = np.empty((samples, Config.INPUT_SIZE), dtype=np.float32)
+    targets = np.empty(samples, dtype=np.int64)
+    states = len(markov.states)
+    state = rng.choice(states, p=markov.initial_probabilities)
+    pitch = 72
+    history: Deque[int] = deque([0] * Config.SEQ_LEN, maxlen=Config.SEQ_LEN)
+    for i in range(samples):
+        if i % 8 == 0:
+            chord, scale = chords[rng.integers(len(chords))], SCALES[rng.integers(len(SCALES))]
+            velocity = int(rng.integers(20, 128))
+        features[i] = melody_features(pitch, history, chord, scale, velocity)
+        probs = markov.transition_matrix[state]
+        if probs.sum() > 0:
+            probs = markov._apply_chord_bias(probs, pitch, 60 + chord.root, scale.interval_mask, chord.interval_mask)
+        else:
+            probs = markov.initial_probabilities
+        state = rng.choice(states, p=probs)
+        interval = int(np.clip(markov.states[state][0], INTERVALS[0], INTERVALS[-1]))
+        targets[i] = interval - INTERVALS[0]
+        history.append(interval)
+        pitch = fold_melody_pitch(pitch + interval)
+    return features, targets
+
+
+def build_network():
+    import torch
+    return torch.nn.Sequential(torch.nn.Linear(Config.INPUT_SIZE, Config.HIDDEN_SIZE), torch.nn.ReLU(),
+                               torch.nn.Linear(Config.HIDDEN_SIZE, Config.OUTPUT_SIZE))
+
+
+def train_interval_model(markov, epochs: int = Config.EPOCHS, learning_rate: float = Config.LEARNING_RATE,
+                         samples: int = Config.NEURAL_TRAINING_SAMPLES, seed: int = 0) -> Dict[str, np.ndarray]:
+    """Trains the network on the Markov model's melodies; returns its weights as arrays."""
+    import torch
+
+    features, targets = training_data(markov, samples, np.random.default_rng(seed))
+    torch.manual_seed(seed)
+    model = build_network()
+    optimizer = torch.optim.Adam(model.parameters(), lr=learning_rate)
+    loss_function = torch.nn.CrossEntropyLoss()
+    x, y = torch.from_numpy(features), torch.from_numpy(targets)
+    order = torch.Generator().manual_seed(seed)
+    for _ in range(epochs):
+        for batch in torch.randperm(len(x), generator=order).split(256):
+            optimizer.zero_grad()
+            loss = loss_function(model(x[batch]), y[batch])
+            loss.backward()
+            optimizer.step()
+    return {name: tensor.detach().numpy().copy() for name, tensor in model.state_dict().items()}
+
+
+def torch_predictor(weights: Dict[str, np.ndarray], quantize: bool = Config.NEURAL_QUANTIZE,
+                    torchscript: bool = Config.NEURAL_TORCHSCRIPT) -> Callable[[np.ndarray], np.ndarray]:
+    """
+    Returns predict(features) -> logits for a batch, running the network on one CPU thread.
+
+    Args:
+        weights (dict): From train_interval_model().
+        quantize (bool): Use int8 weights (dynamic quantization of the linear layers).
+        torchscript (bool): Compile the network with TorchScript.
+    """
+    import torch
+
+    # Batches are a handful of rows; more threads only add synchronisation
+    torch.set_num_threads(1)
+    model = build_network()
+    model.load_state_dict({name: torch.from_numpy(array) for name, array in weights.items()})
+    model.eval()
+    if quantize:
+        model = torch.ao.quantization.quantize_dynamic(model, {torch.nn.Linear}, dtype=torch.qint8)
+    if torchscript:
+        with torch.no_grad():
+            model = torch.jit.trace(model, torch.zeros(1, Config.INPUT_SIZE))
+
+    def predict(features: np.ndarray) -> np.ndarray:
+        with torch.inference_mode():
+            return model(torch.from_numpy(features)).numpy()
+    return predict
+
+
+class _Voice:
+    """Predictions for one voice, and what they were made for."""
+
+    def __init__(self) -> None:
+        self.context: Optional[Tuple[int, int]] = None  # (chord id, scale id)
+        self.predicted: Deque[Tuple[int, int]] = deque()  # (pitch before, interval)
+        self.history: Deque[int] = deque([0] * Config.SEQ_LEN, maxlen=Config.SEQ_LEN)  # Intervals played
+        self.request = 0  # Counts requests; notes predicted for an older one are dropped
+        self.pending = False  # The latest request is still being predicted
+        # Where the predictions end: the pitch after the last one and the intervals up to it
+        self.tail_pitch = 0
+        self.tail_history: Tuple[int, ...] = ()
+
+
+class NeuralMelodyEngine:
+    """Picks melody intervals with a network running in a background worker, within a deadline."""
+
+    def __init__(self, predict: Callable[[np.ndarray], np.ndarray], budget: float = Config.NEURAL_BUDGET,
+                 horizon: int = Config.NEURAL_HORIZON, seed: Optional[int] = None) -> None:
+        """
+        Args:
+            predict (callable): Maps a batch of features, [voice, INPUT_SIZE], to logits, [voice, OUTPUT_SIZE].
+            budget (float): Seconds a note may wait for its prediction; 0 takes only a prediction
+                that is already there.
+            horizon (int): Notes predicted ahead for each voice.
+            seed (int): Seed for sampling the intervals.
+        """
+        self.predict = predict
+        self.budget = budget
+        self.horizon = horizon
+        self.rng = np.random.default_rng(seed)
+        self.notes = 0
+        self.fallbacks = 0  # Notes the Markov model played because no prediction was ready
+        self.step_times: Deque[float] = deque(maxlen=1024)  # Seconds per batched note, for every voice
+        self._voices: Dict[int, _Voice] = {}
+        self._requests: Dict[int, tuple] = {}  # voice -> (request, chord, scale, pitch, history, velocity)
+        self._condition = threading.Condition()
+        self._running = False
+        self._thread: Optional[threading.Thread] = None
+
+    def start(self) -> None:
+        self._running = True
+        self._thread = threading.Thread(target=self._run, name="neural-melody", daemon=True)
+        self._thread.start()
+
+    def stop(self) -> None:
+        with self._condition:
+            self._running = False
+            self._condition.notify_all()
+        if self._thread is not None:
+            self._thread.join()
+            self._thread = None
+        if self.notes:
+            within = f" within {self.budget * 1000:.1f} ms" if self.budget > 0 else ""
+            print(f"Neural melody: {self.notes} notes, {self.fallbacks} played by the Markov model "
+                  f"because no prediction was ready{within}")
+
+    def next_interval(self, fallback: int, pitch: int, chord: ChordData, scale: ScaleData,
+                      velocity: int, voice: int = 0) -> int:
+        """
+        The interval from pitch to the voice's next note: the network's, or
+        fallback if none is ready within the budget. With a budget of 0 this
+        never waits, so it takes no longer than a lock and a deque pop; a
+        positive budget is best-effort, as waking up again can take longer
+        than the budget when other threads hold the GIL.
+        """
+        deadline = time.perf_counter() + self.budget
+        context = (chord.id, scale.id)
+        with self._condition:
+            state = self._voices.get(voice)
+            if state is None:
+                state = self._voices[voice] = _Voice()
+            interval = None
+            while True:
+                if state.context != context or (state.predicted and state.predicted[0][0] != pitch):
+                    # Made for another chord or scale, or after a note the network didn't pick
+                    state.context = context
+                    state.predicted.clear()
+                    state.request += 1
+                    state.pending = False
+                if state.predicted:
+                    interval = state.predicted.popleft()[1]
+                    break
+                remaining = deadline - time.perf_counter()
+                if remaining <= 0 or not self._running:
+                    break
+                if not state.pending:
+                    self._request(voice, state, chord, scale, pitch, tuple(state.history), velocity)
+                self._condition.wait(remaining)
+
+            self.notes += 1
+            if interval is None:
+                # Predict on from the Markov model's note instead, replacing the request for this one
+                self.fallbacks += 1
+                interval = fallback
+                state.history.append(interval)
+                self._request(voice, state, chord, scale, fold_melody_pitch(pitch + interval),
+                              tuple(state.history), velocity)
+            else:
+                state.history.append(interval)
+                # Keep the next notes' predictions coming before they're needed
+                if len(state.predicted) <= self.horizon // 2 and not state.pending:
+                    self._request(voice, state, chord, scale, state.tail_pitch, state.tail_history, velocity)
+        return interval
+
+    def _request(self, voice: int, state: _Voice, chord: ChordData, scale: ScaleData, pitch: int,
+                 history: Tuple[int, ...], velocity: int) -> None:
+        """Asks the worker for `horizon` notes from pitch on, superseding earlier requests. Call with the condition held."""
+        state.request += 1
+        state.pending = True
+        self._requests[voice] = (state.request, chord, scale, pitch, history, velocity)
+        self._condition.notify_all()
+
+    def _run(self) -> None:
+        # voice -> [request, chord, scale, velocity, pitch, history, notes left]
+        work: Dict[int, list] = {}
+        while True:
+            with self._condition:
+                while self._running and not self._requests and not work:
+                    self._condition.wait()
+                if not self._running:
+                    return
+                # Requests join the batch between notes, replacing any older one for their voice
+                for voice, (request, chord, scale, pitch, history, velocity) in self._requests.items():
+                    work[voice] = [request, chord, scale, velocity, pitch,
+                                   deque(history, maxlen=Config.SEQ_LEN), self.horizon]
+                self._requests.clear()
+
+            start = time.perf_counter()
+            intervals = self._sample(list(work.values()))
+            self.step_times.append(time.perf_counter() - start)
+
+            # Each note is published as soon as it's predicted
+            with self._condition:
+                for (voice, item), interval in zip(list(work.items()), intervals):
+                    request, _, _, _, pitch, history, left = item
+                    state = self._voices[voice]
+                    if state.request != request:
+                        del work[voice]
+                        continue
+                    state.predicted.append((pitch, interval))
+                    history.append(interval)
+                    item[4] = state.tail_pitch = fold_melody_pitch(pitch + interval)
+                    state.tail_history = tuple(history)
+                    item[6] = left - 1
+                    if item[6] == 0:
+                        state.pending = False
+                        del work[voice]
+                self._condition.notify_all()
+
+    def _sample(self, work: List[list]) -> List[int]:
+        """One interval for each voice's next note, from one batched forward pass."""
+        features = np.stack([melody_features(pitch, history, chord, scale, velocity)
+                             for _, chord, scale, velocity, pitch, history, _ in work])
+        logits = self.predict(features).astype(np.float64)
+        probs = np.exp(logits - logits.max(axis=1, keepdims=True))
+        # Pitch classes the intervals lead to, weighted by whether they're in the scale
+        targets = (np.array([item[4] for item in work])[:, None] + INTERVALS) % 12
+        in_scale = np.array([MASK_BITS[item[2].mask] for item in work])
+        probs *= np.where(in_scale[np.arange(len(work))[:, None], targets], IN_SCALE_WEIGHT, OUT_OF_SCALE_WEIGHT)
+        cumulative = probs.cumsum(axis=1)
+        choices = (cumulative < self.rng.random(len(work))[:, None] * cumulative[:, -1:]).sum(axis=1)
+        return INTERVALS[np.minimum(choices, len(INTERVALS) - 1)].tolist()
+
+
+def load_neural_melody_engine(markov) -> Optional[NeuralMelodyEngine]:
+    """
+    Trains (or loads from the cache) the network for the Markov model and
+    starts an engine running it, or returns None if torch isn't installed.
+    """
+    if importlib.util.find_spec("torch") is None:
+        print("torch isn't installed; the melody stays with the Markov model.")
+        return None
+    key = cache_key("neural-melody-1", markov.transition_matrix.tobytes(), Config.INPUT_SIZE,
+                    Config.HIDDEN_SIZE, Config.OUTPUT_SIZE, Config.SEQ_LEN, Config.EPOCHS,
+                    Config.LEARNING_RATE, Config.NEURAL_TRAINING_SAMPLES, Config.CHORD_VOCABULARY)
+    weights = cached_arrays("neural_melody", key, lambda: train_interval_model(markov))
+    engine = NeuralMelodyEngine(torch_predictor(weights))
+    engine.start()
+    return engine
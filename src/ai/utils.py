@@ -1,5 +1,8 @@
 from dataclasses import dataclass
-from typing import Tuple
+from typing import Sequence, Tuple
+
+import numpy as np
+
 from music.harmony import ChordData
 
 @dataclass
@@ -15,3 +18,7 @@ class PlanetGene:
 @dataclass
 class SolarSystemChromosome():
     planet_genes: Tuple[PlanetGene, ...]
+
+def chromosome_ids(chromosomes: Sequence[SolarSystemChromosome]) -> np.ndarray:
+    """Chord ids of a population, [chromosome, planet], for chromosomes with the same number of genes."""
+    return np.array([[gene.chord.id for gene in chromosome.planet_genes] for chromosome in chromosomes])
@@ -0,0 +1,111 @@
+"""
+Shows that GA generations and melody sampling cost the same however large
+the chord and scale vocabulary is.
+
+For growing numbers of chord types it times whole GA generations (the GA
+drawing from that many types), chromosome fitness evaluation, and Markov
+melody steps over random chords from that vocabulary and random scales of
+every type. It also compares scoring a whole population one chromosome at
+a time on consonance alone with the batched score that adds voice leading.
+Run from src/:
+
+    python -m benchmarks.harmony_scaling
+"""
+import argparse
+import random
+import time
+from typing import Tuple
+
+import numpy as np
+
+from genetic_engine import GeneticSolarSystemGenerator
+from main import get_markov_model
+from music.harmony import CHORD_TYPES, SCALES, get_chord
+
+
+def bench_generations(chord_types: int, generations: int) -> float:
+    """Mean ms per GA generation."""
+    generator = GeneticSolarSystemGenerator(chord_vocabulary=chord_types)
+    scales = random.sample(SCALES, generations)
+    start = time.perf_counter()
+    for scale in scales:
+        generator.run(scale)
+    return (time.perf_counter() - start) / generations * 1000.0
+
+
+def bench_fitness(chord_types: int, evaluations: int) -> float:
+    """Mean µs per chromosome evaluation."""
+    generator = GeneticSolarSystemGenerator(population_size=64, chord_vocabulary=chord_types)
+    evaluator = generator.fitness_evaluator
+    for scale in SCALES:
+        evaluator.chord_scores(scale)  # Build every scale's table up front
+    pairs = [(random.choice(generator.population), random.choice(SCALES)) for _ in range(evaluations)]
+    start = time.perf_counter()
+    for chromosome, scale in pairs:
+        evaluator.evaluate(chromosome, scale)
+    return (time.perf_counter() - start) / evaluations * 1e6
+
+
+def bench_population(chord_types: int, rounds: int) -> Tuple[float, float]:
+    """
+    Mean ms to score a 150-chromosome population: consonance only, one
+    chromosome at a time, against the batched consonance and voice-leading score.
+    """
+    generator = GeneticSolarSystemGenerator(chord_vocabulary=chord_types)
+    evaluator = generator.fitness_evaluator
+    population = generator.population
+    scales = [random.choice(SCALES) for _ in range(rounds)]
+    start = time.perf_counter()
+    for scale in scales:
+        scores = evaluator.chord_scores(scale).tolist()
+        [sum(scores[gene.chord.id] for gene in chromosome.planet_genes) / len(chromosome.planet_genes)
+         for chromosome in population]
+    single = (time.perf_counter() - start) / rounds * 1000.0
+    start = time.perf_counter()
+    for scale in scales:
+        evaluator.evaluate_batch(population, scale)
+    batched = (time.perf_counter() - start) / rounds * 1000.0
+    return single, batched
+
+
+def bench_melody(model, chord_types: int, steps: int) -> float:
+    """Mean µs per Markov melody step."""
+    contexts = [(get_chord(random.randrange(12), random.randrange(chord_types)), random.choice(SCALES))
+                for _ in range(steps)]
+    state = model._generate_starting_state()
+    pitch = 72
+    start = time.perf_counter()
+    for chord, scale in contexts:
+        state = model._generate_next_state(state, pitch, 60 + chord.root, scale.interval_mask,
+                                           chord.interval_mask)
+        pitch = 60 + (pitch + state[0]) % 24
+    return (time.perf_counter() - start) / steps * 1e6
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Time the GA and melody sampling against vocabulary size.")
+    parser.add_argument("--generations", type=int, default=20)
+    parser.add_argument("--evaluations", type=int, default=50_000)
+    parser.add_argument("--steps", type=int, default=20_000)
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args()
+
+    random.seed(args.seed)
+    np.random.seed(args.seed)
+    model = get_markov_model()
+    print(f"{len(CHORD_TYPES)} chord types, {len(SCALES) // 12} scale types")
+    print(f"{'Chord types':>12s}{'GA gen (ms)':>14s}{'Fitness (µs)':>14s}{'Melody (µs)':>14s}")
+    for chord_types in sorted({8, 32, 128, len(CHORD_TYPES)}):
+        print(f"{chord_types:12d}"
+              f"{bench_generations(chord_types, args.generations):14.2f}"
+              f"{bench_fitness(chord_types, args.evaluations):14.2f}"
+              f"{bench_melody(model, chord_types, args.steps):14.2f}")
+
+    print(f"\n{'Chord types':>12s}{'Consonance, per chromosome (ms)':>34s}{'Batched with voice leading (ms)':>34s}")
+    for chord_types in sorted({8, len(CHORD_TYPES)}):
+        single, batched = bench_population(chord_types, args.generations * 10)
+        print(f"{chord_types:12d}{single:34.3f}{batched:34.3f}")
+
+
+if __name__ == "__main__":
+    main()
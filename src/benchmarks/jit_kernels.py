@@ -0,0 +1,73 @@
+"""
+Times the numba kernels against the NumPy reference path, case by case, and
+checks that both give identical results.
+
+It runs the suite's cases that have a kernel, at the same sizes and from the
+same seeds, once on each backend. Any case whose results differ between the
+two is reported and the exit status is 1. Needs numba. Run from src/:
+
+    python -m benchmarks.jit_kernels
+    python -m benchmarks.jit_kernels --repeats 9 --min-time 0.2
+"""
+import argparse
+import random
+import sys
+from typing import Callable
+
+import numpy as np
+
+import kernels
+from benchmarks.suite import CASES, measure
+
+KERNEL_CASES = ("gravity.calculate_gravity", "gravity.calculate_gravity_batch", "simulation.step",
+                "orbital.predict_path", "markov.apply_chord_bias")
+
+
+def setup(name: str, size: int, seed: int) -> Callable[[], object]:
+    random.seed(seed)
+    np.random.seed(seed)
+    return CASES[name][2](size)
+
+
+def same_results(name: str, size: int, seed: int, compiled, calls: int = 32) -> bool:
+    """Whether the first `calls` calls of a case give the same results on both backends."""
+    outputs = []
+    for backend in (None, compiled):
+        kernels.jit = backend
+        fn = setup(name, size, seed)
+        outputs.append([np.array(fn()) for _ in range(calls)])
+    return all(np.array_equal(a, b) for a, b in zip(*outputs))
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Time the numba kernels against NumPy.")
+    parser.add_argument("--repeats", type=int, default=5)
+    parser.add_argument("--min-time", type=float, default=0.05, help="Seconds per repeat.")
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args()
+
+    if kernels.select("numba") != "numba":
+        sys.exit(1)
+    compiled = kernels.jit
+
+    mismatches = 0
+    print(f"{'':52s}{'NumPy (µs)':>12s}{'numba (µs)':>12s}{'Speedup':>10s}")
+    for name in KERNEL_CASES:
+        parameter, sizes, _ = CASES[name]
+        for size in sizes:
+            key = f"{name}[{parameter}={size}]"
+            kernels.jit = None
+            reference = measure(setup(name, size, args.seed), args.repeats, args.min_time)["median_us"]
+            kernels.jit = compiled
+            jit = measure(setup(name, size, args.seed), args.repeats, args.min_time)["median_us"]
+            flag = ""
+            if not same_results(name, size, args.seed, compiled):
+                flag = "  RESULTS DIFFER"
+                mismatches += 1
+            print(f"{key:52s}{reference:12.2f}{jit:12.2f}{reference / jit:9.1f}x{flag}")
+    if mismatches:
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,142 @@
+"""
+Measures MIDI output timing without a DAW or MIDI device.
+
+Plays a steady stream of notes through the threaded MIDIHandler into the
+in-process loopback sink, optionally while other threads load the CPU, and
+reports note-on jitter, note-off lateness and message rate, and with --clock
+the jitter of MIDI clock pulses. Run from src/:
+
+    python -m benchmarks.midi_latency --seconds 10 --load 2 --clock --out midi_timing.json
+
+By default notes are timed by the wall clock. With --timebase physics they
+are timed by a PhysicsSimulation's clock, as in live play, with the
+simulation stepping on its own thread; --render-ms then adds a stand-in for
+the render loop, holding the GIL for that long every frame. Since the
+simulation's clock can itself stall, jitter is also reported in wall-clock
+time, from the sink's arrival stamps. --physics-in-render steps the
+simulation from the render loop instead of its own thread, to show what that
+does to the music:
+
+    python -m benchmarks.midi_latency --timebase physics --render-ms 25
+    python -m benchmarks.midi_latency --timebase physics --render-ms 25 --physics-in-render
+"""
+import argparse
+import json
+import sys
+import threading
+import time
+
+import numpy as np
+
+from config import Config
+from music.midi_output import MIDIHandler
+from music.sequencer import MusicalClock
+
+
+def busy(stop: threading.Event) -> None:
+    """Simulates render/GA work: numpy in short bursts, holding and releasing the GIL."""
+    x = np.random.rand(200, 200)
+    while not stop.is_set():
+        x = x @ x.T
+        x /= np.abs(x).max()
+        sum(range(20_000))
+
+
+def render_loop(stop: threading.Event, frame_ms: float, simulation=None) -> None:
+    """
+    Stands in for the render loop: busy in Python for frame_ms of every frame at
+    Config.FPS. With a simulation, also steps it between frames, as a loop that
+    drives physics and rendering together would.
+    """
+    period = 1.0 / Config.FPS
+    previous = time.perf_counter()
+    while not stop.is_set():
+        start = time.perf_counter()
+        if simulation is not None:
+            simulation.advance(start - previous)
+            previous = start
+        while time.perf_counter() - start < frame_ms / 1000.0:
+            pass
+        time.sleep(max(0.0, period - (time.perf_counter() - start)))
+
+
+def make_simulation():
+    """A PhysicsSimulation of the live game's starting solar system."""
+    from main import initialize_planets
+    from physics.gravity import Satellite
+    from physics.simulation import PhysicsSimulation
+
+    center = np.array([Config.WINDOW_WIDTH // 2, Config.WINDOW_HEIGHT // 2])
+    return PhysicsSimulation(initialize_planets(center), Satellite(np.array([100, 100])))
+
+
+def summary(values: np.ndarray) -> dict:
+    return {"p50": float(np.percentile(values, 50)), "p99": float(np.percentile(values, 99)),
+            "max": float(values.max())}
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Measure MIDI send timing into a loopback sink.")
+    parser.add_argument("--seconds", type=float, default=5.0)
+    parser.add_argument("--rate", type=float, default=32.0, help="Notes per second.")
+    parser.add_argument("--load", type=int, default=0, help="Number of CPU load threads.")
+    parser.add_argument("--clock", action="store_true", help="Also send MIDI clock at the default tempo.")
+    parser.add_argument("--timebase", choices=("wall", "physics"), default="wall",
+                        help="Time notes by the wall clock or, as live, by a PhysicsSimulation's clock.")
+    parser.add_argument("--render-ms", type=float, default=0.0,
+                        help="Milliseconds of render work per frame at Config.FPS (0 for none).")
+    parser.add_argument("--physics-in-render", action="store_true",
+                        help="With --timebase physics, step the simulation from the render loop "
+                             "instead of its own thread.")
+    parser.add_argument("--switch-interval", type=float, default=Config.GIL_SWITCH_INTERVAL,
+                        help="Python thread switch interval in seconds, as set by main.py.")
+    parser.add_argument("--out", default=None, help="Write stats and histograms to this JSON file.")
+    args = parser.parse_args()
+
+    sys.setswitchinterval(args.switch_interval)
+    simulation = make_simulation() if args.timebase == "physics" else None
+    if simulation is not None and not args.physics_in_render:
+        simulation.start()
+    clock = simulation.clock if simulation is not None else time.perf_counter
+    midi = MIDIHandler("Loopback", clock=clock, backend="loopback", monitor_timing=True)
+    if args.clock:
+        midi.start_transport(MusicalClock(midi.clock, Config.DEFAULT_BPM))
+    stop = threading.Event()
+    workers = [threading.Thread(target=busy, args=(stop,), daemon=True) for _ in range(args.load)]
+    if args.render_ms > 0 or args.physics_in_render:
+        stepped = simulation if args.physics_in_render else None
+        workers.append(threading.Thread(target=render_loop, args=(stop, args.render_ms, stepped), daemon=True))
+    for worker in workers:
+        worker.start()
+
+    # Enqueue in small chunks ahead of time, as the sequencer does
+    start = midi.clock() + 0.1
+    interval = 1.0 / args.rate
+    total = int(args.seconds * args.rate)
+    for i in range(total):
+        t = start + i * interval
+        while midi.clock() < t - 0.1:
+            time.sleep(0.01)
+        midi.send_note(60 + i % 12, 64, duration=interval * 0.8, current_time=t, channel=i % 2)
+    time.sleep(0.2)
+    stop.set()
+    midi.stop_transport()
+    if simulation is not None:
+        simulation.stop()
+
+    # Arrival times at the sink (wall clock) against the intended grid
+    arrivals = np.array([t for t, message in midi.out_port.drain() if message[0] & 0xF0 == 0x90])
+    stats = midi.timing.stats()
+    if simulation is None:
+        intended = start + np.arange(len(arrivals)) * interval
+        stats["Loopback arrival lateness (ms)"] = summary((arrivals - intended) * 1000.0)
+    # Spacing of arrivals against the intended spacing, which holds whatever the timebase
+    stats["Loopback wall-clock jitter (ms)"] = summary(np.abs(np.diff(arrivals) - interval) * 1000.0)
+    print(json.dumps(stats, indent=2))
+    print(midi.timing.hud_text())
+    if args.out:
+        midi.timing.write(args.out)
+
+
+if __name__ == "__main__":
+    main()
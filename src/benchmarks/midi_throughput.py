@@ -0,0 +1,81 @@
+"""
+Microbenchmark of the MIDI output path, in messages per second.
+
+Compares the original per-message path (a new mido.Message for every note-on
+and note-off, sent one by one) with the pre-encoded, batched path, both into
+ports that discard their output. Run from src/:
+
+    python -m benchmarks.midi_throughput
+"""
+import random
+import time
+
+import mido
+
+from music.midi_backends import MidoBackend, NullBackend, encode_note_off, encode_note_on
+from music.scheduler import MIDIScheduler
+
+
+class NullPort(mido.ports.BaseOutput):
+    """A mido output port that discards messages."""
+
+    def _send(self, msg):
+        pass
+
+
+def make_notes(count: int, seed: int = 0):
+    rng = random.Random(seed)
+    return [(rng.randrange(48, 96), rng.randrange(20, 60), rng.randrange(2)) for _ in range(count)]
+
+
+def bench_mido_messages(notes) -> float:
+    """The original path: build and send a mido.Message per event."""
+    port = NullPort()
+    start = time.perf_counter()
+    for note, velocity, channel in notes:
+        port.send(mido.Message('note_on', note=note, velocity=velocity, channel=channel))
+        port.send(mido.Message('note_off', note=note, velocity=0, channel=channel))
+    return 2 * len(notes) / (time.perf_counter() - start)
+
+
+def bench_encoded(notes, backend, batch_size: int = 8) -> float:
+    """Pre-encoded messages, flushed in batches as the scheduler does."""
+    batch = []
+    start = time.perf_counter()
+    for note, velocity, channel in notes:
+        batch.append(encode_note_on(channel, note, velocity))
+        batch.append(encode_note_off(channel, note))
+        if len(batch) >= batch_size:
+            backend.send_batch(batch)
+            batch.clear()
+    backend.send_batch(batch)
+    return 2 * len(notes) / (time.perf_counter() - start)
+
+
+def bench_scheduler(notes) -> float:
+    """The whole scheduling path: heap insertion, reference counting, encoding and batching."""
+    backend = NullBackend()
+    scheduler = MIDIScheduler(backend.send_batch)
+    start = time.perf_counter()
+    for i, (note, velocity, channel) in enumerate(notes):
+        scheduler.schedule_note(i * 0.01, note, velocity, 0.05, channel)
+        if i % 8 == 7:
+            scheduler.dispatch_due(i * 0.01)
+    scheduler.dispatch_due(float('inf'))
+    return backend.sent / (time.perf_counter() - start)
+
+
+def main():
+    notes = make_notes(100_000)
+    results = {
+        "mido.Message per event": bench_mido_messages(notes),
+        "Pre-encoded, mido fallback": bench_encoded(notes, MidoBackend(NullPort())),
+        "Pre-encoded, raw": bench_encoded(notes, NullBackend()),
+        "Scheduler (heap + refcount + batch)": bench_scheduler(notes),
+    }
+    for name, rate in results.items():
+        print(f"{name:40s}{rate:14,.0f} msg/s")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,292 @@
+"""
+Microbenchmark suite for the hot paths, with JSON baselines.
+
+Each case is timed at several problem sizes, from fixed random seeds. A case
+is called enough times per repeat to fill --min-time, and the suite reports
+the median and the fastest time per call over --repeats repeats. Save a run as
+a baseline, then compare a later run (e.g. on another commit) against it;
+cases slower than the baseline by more than --tolerance are flagged, and the
+exit status is 1. Run from src/:
+
+    python -m benchmarks.suite --out baseline.json
+    python -m benchmarks.suite --compare baseline.json
+    python -m benchmarks.suite --filter gravity --repeats 9
+    python -m benchmarks.suite --kernels numpy
+
+benchmarks/jit_kernels.py times the numba kernels against the NumPy path side by side.
+"""
+import argparse
+import json
+import platform
+import random
+import subprocess
+import sys
+import time
+from typing import Callable, Dict, List, Sequence, Tuple
+
+import numpy as np
+
+import kernels
+from ai.diversity import population_diversity
+from ai.utils import chromosome_ids
+from config import Config
+from genetic_engine import GeneticSolarSystemGenerator
+from main import get_markov_model
+from music.harmony import CHORD_TYPES, CHORDS, SCALES, get_chord, get_scale
+from music.midi_output import MIDIHandler
+from physics.gravity import (Planet, Satellite, calculate_gravity, calculate_gravity_batch,
+                             get_dominant_planet, get_dominant_planets, planet_arrays)
+from physics.orbital_mechanics import predict_path
+from physics.simulation import PhysicsSimulation
+
+# name -> (parameter name, sizes, setup); setup(size) returns the function to time
+CASES: Dict[str, Tuple[str, Sequence[int], Callable[[int], Callable[[], object]]]] = {}
+
+
+def case(name: str, parameter: str, sizes: Sequence[int]):
+    """Registers a benchmark case. The decorated function does the setup and returns what to time."""
+    def register(setup):
+        CASES[name] = (parameter, sizes, setup)
+        return setup
+    return register
+
+
+def make_planets(count: int) -> List[Planet]:
+    center = np.array([Config.WINDOW_WIDTH / 2, Config.WINDOW_HEIGHT / 2])
+    return [Planet(pos=center + np.random.uniform(-300, 300, 2), mass=10,
+                   chord=get_chord(random.randrange(12), random.randrange(len(CHORD_TYPES))),
+                   orbit_center=center, orbit_radius=float(np.random.uniform(70, 300)),
+                   angular_speed=float(np.random.uniform(-0.5, 0.5)))
+            for _ in range(count)]
+
+
+def make_points(count: int) -> np.ndarray:
+    return np.random.uniform(0, [Config.WINDOW_WIDTH, Config.WINDOW_HEIGHT], (count, 2))
+
+
+# Physics
+@case("gravity.calculate_gravity", "planets", (5, 20, 100))
+def bench_calculate_gravity(planets: int):
+    sat, bodies = Satellite(make_points(1)[0]), make_planets(planets)
+    return lambda: calculate_gravity(sat, bodies)
+
+
+@case("gravity.get_dominant_planet", "planets", (5, 20, 100))
+def bench_get_dominant_planet(planets: int):
+    sat, bodies = Satellite(make_points(1)[0]), make_planets(planets)
+    return lambda: get_dominant_planet(sat, bodies)
+
+
+@case("gravity.calculate_gravity_batch", "satellites", (10, 100, Config.SWARM_CAPACITY))
+def bench_calculate_gravity_batch(satellites: int):
+    points, (planet_pos, planet_mass) = make_points(satellites), planet_arrays(make_planets(5))
+    return lambda: calculate_gravity_batch(points, planet_pos, planet_mass)
+
+
+@case("gravity.get_dominant_planets", "satellites", (10, 100, Config.SWARM_CAPACITY))
+def bench_get_dominant_planets(satellites: int):
+    points, (planet_pos, planet_mass) = make_points(satellites), planet_arrays(make_planets(5))
+    return lambda: get_dominant_planets(points, planet_pos, planet_mass)
+
+
+@case("orbital.predict_path", "steps", (30, 120, 480))
+def bench_predict_path(steps: int):
+    start, bodies = make_points(1)[0], make_planets(5)
+    velocity = np.array([4.0, -1.0])
+    return lambda: predict_path(start, velocity, bodies, steps=steps)
+
+
+@case("simulation.step", "satellites", (0, 100, Config.SWARM_CAPACITY))
+def bench_simulation_step(satellites: int):
+    simulation = PhysicsSimulation(make_planets(5), Satellite(make_points(1)[0]))
+    simulation.launch(np.array([4.0, -1.0]))
+    if satellites:
+        simulation.launch_swarm(make_points(1)[0], np.random.normal(0, 3, (satellites, 2)))
+
+    def step():
+        simulation.step(publish=False)
+        return np.concatenate((simulation.sat.pos, simulation.swarm.pos.ravel()))
+    return step
+
+
+# Genetic algorithm
+@case("ga.step", "population", (50, 150, 500))
+def bench_ga_step(population: int):
+    generator = GeneticSolarSystemGenerator(population_size=population, subpop_size=min(40, population // 4))
+    scale = get_scale("GMajor")
+    return lambda: generator._step(scale)
+
+
+@case("ga.diversity", "population", (150, 500, 1000))
+def bench_ga_diversity(population: int):
+    """The per-generation diversity metrics, to compare with ga.step."""
+    generator = GeneticSolarSystemGenerator(population_size=population)
+    ids = chromosome_ids(generator.population)
+    return lambda: population_diversity(ids, len(CHORDS))
+
+
+@case("fitness.evaluate", "planets", (5, 20))
+def bench_fitness_evaluate(planets: int):
+    generator = GeneticSolarSystemGenerator(number_of_planets=planets, population_size=64)
+    chromosomes, scale = generator.population, get_scale("GMajor")
+    evaluate = generator.fitness_evaluator.evaluate
+    index = iter(range(sys.maxsize))
+    return lambda: evaluate(chromosomes[next(index) % len(chromosomes)], scale)
+
+
+@case("fitness.evaluate_batch", "population", (150, 1000))
+def bench_fitness_evaluate_batch(population: int):
+    generator = GeneticSolarSystemGenerator(population_size=population)
+    chromosomes, scale = generator.population, get_scale("GMajor")
+    return lambda: generator.fitness_evaluator.evaluate_batch(chromosomes, scale)
+
+
+# Melody
+def melody_contexts(count: int = 256):
+    return [(get_chord(random.randrange(12), random.randrange(len(CHORD_TYPES))), random.choice(SCALES))
+            for _ in range(count)]
+
+
+@case("markov.generate_next_state", "contexts", (256,))
+def bench_generate_next_state(contexts: int):
+    model, chords = get_markov_model(), melody_contexts(contexts)
+    state = [model._generate_starting_state(), 0]
+
+    def step():
+        chord, scale = chords[state[1] % contexts]
+        state[0] = model._generate_next_state(state[0], 72, 60 + chord.root, scale.interval_mask,
+                                              chord.interval_mask)
+        state[1] += 1
+    return step
+
+
+@case("markov.apply_chord_bias", "contexts", (256,))
+def bench_apply_chord_bias(contexts: int):
+    model, chords = get_markov_model(), melody_contexts(contexts)
+    probs = model.transition_matrix[0].copy()
+    index = iter(range(sys.maxsize))
+
+    def bias():
+        chord, scale = chords[next(index) % contexts]
+        return model._apply_chord_bias(probs, 72, 60 + chord.root, scale.interval_mask, chord.interval_mask)
+    return bias
+
+
+# MIDI
+@case("midi.send_note_update", "notes", (1, 16, 128))
+def bench_midi_send_note_update(notes: int):
+    """Schedules a burst of notes on the null backend and dispatches them all."""
+    now = [0.0]
+    midi = MIDIHandler(Config.MIDI_PORT_NAME, clock=lambda: now[0], threaded=False, backend="null",
+                       monitor_timing=False)
+    pitches = [random.randrange(48, 96) for _ in range(notes)]
+
+    def burst():
+        t = now[0]
+        for i, pitch in enumerate(pitches):
+            midi.send_note(pitch, 64, duration=0.05, current_time=t + i * 0.001, channel=i % 2)
+        now[0] = t + 1.0
+        midi.update(now[0])
+    return burst
+
+
+def measure(fn: Callable[[], object], repeats: int, min_time: float) -> Dict[str, float]:
+    """Per-call time in µs: the median and minimum over repeats of enough calls to fill min_time."""
+    loops = 1
+    while True:
+        start = time.perf_counter()
+        for _ in range(loops):
+            fn()
+        elapsed = time.perf_counter() - start
+        if elapsed >= min_time:
+            break
+        loops *= 2 if elapsed == 0 else max(2, min(10, int(min_time / elapsed) + 1))
+    times = [elapsed / loops]
+    for _ in range(repeats - 1):
+        start = time.perf_counter()
+        for _ in range(loops):
+            fn()
+        times.append((time.perf_counter() - start) / loops)
+    return {"median_us": float(np.median(times)) * 1e6, "min_us": min(times) * 1e6, "loops": loops}
+
+
+def run(names: List[str], repeats: int, min_time: float, seed: int) -> Dict[str, dict]:
+    results = {}
+    for name in names:
+        parameter, sizes, setup = CASES[name]
+        for size in sizes:
+            random.seed(seed)
+            np.random.seed(seed)
+            key = f"{name}[{parameter}={size}]"
+            results[key] = measure(setup(size), repeats, min_time)
+            print(f"{key:52s}{results[key]['median_us']:12.2f} µs  (min {results[key]['min_us']:.2f})")
+    return results
+
+
+def metadata(seed: int, backend: str) -> dict:
+    try:
+        commit = subprocess.run(["git", "rev-parse", "--short", "HEAD"], capture_output=True,
+                                text=True, check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        commit = None
+    return {"commit": commit, "python": platform.python_version(), "numpy": np.__version__,
+            "platform": platform.platform(), "machine": platform.machine(), "seed": seed,
+            "kernels": backend, "time": time.strftime("%Y-%m-%dT%H:%M:%S")}
+
+
+def compare(results: Dict[str, dict], baseline: dict, tolerance: float) -> int:
+    """Prints each case against the baseline; returns how many are slower beyond tolerance."""
+    print(f"\nAgainst {baseline['meta'].get('commit')} ({baseline['meta'].get('time')}):")
+    regressions = 0
+    for key, result in results.items():
+        old = baseline["results"].get(key)
+        if old is None:
+            print(f"{key:52s}{'new':>12s}")
+            continue
+        ratio = result["median_us"] / old["median_us"]
+        flag = ""
+        if ratio > 1.0 + tolerance:
+            flag = "  SLOWER"
+            regressions += 1
+        elif ratio < 1.0 / (1.0 + tolerance):
+            flag = "  faster"
+        print(f"{key:52s}{old['median_us']:12.2f} -> {result['median_us']:.2f} µs  x{ratio:.2f}{flag}")
+    return regressions
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Time Blastov's hot paths.")
+    parser.add_argument("--filter", default="", help="Only run cases whose name contains this.")
+    parser.add_argument("--repeats", type=int, default=5)
+    parser.add_argument("--min-time", type=float, default=0.05, help="Seconds per repeat.")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--out", help="Write the results to this JSON file, e.g. to use as a baseline.")
+    parser.add_argument("--compare", help="Baseline JSON file to compare against.")
+    parser.add_argument("--tolerance", type=float, default=0.15,
+                        help="Relative slowdown of the median beyond which a case counts as slower.")
+    parser.add_argument("--kernels", choices=("numba", "numpy"), default=Config.KERNELS,
+                        help="Kernel backend for the cases that have one.")
+    parser.add_argument("--list", action="store_true", help="List the cases and exit.")
+    args = parser.parse_args()
+
+    names = [name for name in CASES if args.filter in name]
+    if args.list:
+        for name in names:
+            parameter, sizes, _ = CASES[name]
+            print(f"{name} ({parameter}: {', '.join(map(str, sizes))})")
+        return
+
+    backend = kernels.select(args.kernels)
+    results = run(names, args.repeats, args.min_time, args.seed)
+    if args.out:
+        with open(args.out, "w") as f:
+            json.dump({"meta": metadata(args.seed, backend), "results": results}, f, indent=2)
+    if args.compare:
+        with open(args.compare) as f:
+            baseline = json.load(f)
+        if compare(results, baseline, args.tolerance):
+            sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,65 @@
+"""
+On-disk cache for artifacts that are built at startup: the trained Markov
+model and the voice-leading table.
+
+Each artifact is a set of numpy arrays saved as an .npz in Config.CACHE_DIR,
+named after the artifact and a hash of everything it was built from, so
+changing the training data or the chord vocabulary builds it afresh instead
+of loading a stale copy. Files are written to a temporary name and renamed,
+so a crash mid-write never leaves a truncated artifact behind.
+"""
+import hashlib
+import os
+import zipfile
+from typing import Callable, Dict
+
+import numpy as np
+
+from config import Config
+
+
+def cache_key(*parts) -> str:
+    """A short hash of the repr of parts, which must be deterministic."""
+    return hashlib.sha1(repr(parts).encode()).hexdigest()[:16]
+
+
+def cached_arrays(name: str, key: str, build: Callable[[], Dict[str, np.ndarray]],
+                  directory: str = Config.CACHE_DIR, enabled: bool = Config.CACHE) -> Dict[str, np.ndarray]:
+    """
+    Loads the arrays called name built from key, or builds and saves them.
+
+    Args:
+        name (str): Artifact name, used in the file name.
+        key (str): cache_key() of the artifact's inputs.
+        build (callable): Returns the arrays, by name, when they aren't cached.
+        directory (str): Where artifacts are kept.
+        enabled (bool): If False, always build and never touch the disk.
+    """
+    if not enabled:
+        return build()
+    path = os.path.join(directory, f"{name}-{key}.npz")
+    try:
+        with np.load(path) as data:
+            return {array: data[array] for array in data.files}
+    except (OSError, ValueError, EOFError, zipfile.BadZipFile):
+        pass  # Missing or damaged: rebuilt and overwritten below
+
+    arrays = build()
+    try:
+        os.makedirs(directory, exist_ok=True)
+        save_arrays(path, arrays)
+    except OSError as e:
+        print(f"Could not cache {name}: {e}")
+    return arrays
+
+
+def save_arrays(path: str, arrays: Dict[str, np.ndarray]) -> None:
+    """Saves arrays as an .npz at path, atomically: readers see the old file or the new one."""
+    temp = f"{path}.{os.getpid()}.tmp"
+    try:
+        with open(temp, "wb") as f:
+            np.savez(f, **arrays)
+        os.replace(temp, path)
+    finally:
+        if os.path.exists(temp):
+            os.remove(temp)
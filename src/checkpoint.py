@@ -0,0 +1,86 @@
+"""
+GA checkpoints, so a restarted installation carries on evolving from where it
+was instead of from random chromosomes.
+
+The generator's state (see GeneticSolarSystemGenerator.to_arrays) is a few
+kilobytes of arrays. It's copied on the engine's thread between generations,
+which takes microseconds, and written as an .npz by a background thread, to a
+temporary file that then replaces the checkpoint, so a crash mid-write leaves
+the previous checkpoint intact. If a write is still in progress when the next
+state comes in, only the newest state is written after it.
+"""
+import threading
+import time
+import zipfile
+from concurrent.futures import ThreadPoolExecutor
+from typing import Dict, Optional
+
+import numpy as np
+
+from cache import save_arrays
+from config import Config
+
+
+class GACheckpoint:
+    """Saves the GA's state at most every `interval` seconds, and restores it at startup."""
+
+    def __init__(self, path: str = Config.GA_CHECKPOINT_PATH,
+                 interval: float = Config.GA_CHECKPOINT_INTERVAL) -> None:
+        """
+        Args:
+            path (str): The checkpoint file.
+            interval (float): Least seconds between saves while the GA is running.
+        """
+        self.path = path
+        self.interval = interval
+        self.saves = 0
+        self._last_save = -float("inf")
+        self._lock = threading.Lock()
+        self._pending: Optional[Dict[str, np.ndarray]] = None
+        self._writing = False
+        self._executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix="checkpoint")
+
+    def load(self, generator) -> bool:
+        """Restores the generator from the checkpoint; False if there is none it can use."""
+        try:
+            with np.load(self.path) as data:
+                generator.load_arrays({name: data[name] for name in data.files})
+        except FileNotFoundError:
+            return False
+        except (OSError, ValueError, KeyError, EOFError, zipfile.BadZipFile) as e:
+            print(f"Ignoring GA checkpoint {self.path}: {e}")
+            return False
+        return True
+
+    def update(self, generator, force: bool = False) -> None:
+        """
+        Call between generations. Saves the generator's state in the background
+        if `interval` has passed since the last save, or if force is set.
+        """
+        now = time.monotonic()
+        if not force and now - self._last_save < self.interval:
+            return
+        self._last_save = now
+        with self._lock:
+            self._pending = generator.to_arrays()
+            if not self._writing:
+                self._writing = True
+                self._executor.submit(self._write_pending)
+
+    def _write_pending(self) -> None:
+        while True:
+            with self._lock:
+                arrays, self._pending = self._pending, None
+                if arrays is None:
+                    self._writing = False
+                    return
+            try:
+                save_arrays(self.path, arrays)
+                self.saves += 1
+            except OSError as e:
+                print(f"Could not save GA checkpoint to {self.path}: {e}")
+
+    def close(self, generator) -> None:
+        """Saves the final state and waits for it to be written."""
+        self.update(generator, force=True)
+        self._executor.shutdown(wait=True)
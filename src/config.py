@@ -6,6 +6,26 @@ class Config:
     WINDOW_WIDTH: int = 720
     WINDOW_HEIGHT: int = 720
     FPS: int = 30
+    TEXT_CACHE_SIZE: int = 512  # Rendered text surfaces kept by the renderer
+
+    # Simulation
+    PHYSICS_RATE: int = 240  # Fixed physics steps per second
+    MAX_FRAME_TIME: float = 0.25  # Longest stall the simulation will catch up on
+
+    # Swarm
+    SWARM_CAPACITY: int = 512
+    SWARM_TRAIL_LENGTH: int = 50
+    SWARM_BURST_SIZE: int = 10  # Satellites launched per right-click drag
+    SWARM_CHANNELS: tuple = (2, 3, 4, 5)  # MIDI channels shared by swarm voices
+    SWARM_POLYPHONY: int = 6  # Sounding notes per swarm channel
+    SWARM_MAX_NOTES_PER_SECOND: float = 40.0
+
+    # Influence field cache
+    FIELD_CACHE: bool = False  # Start with the cache (and its overlay) enabled
+    FIELD_CELL_SIZE: float = 20.0  # Grid spacing in pixels
+    FIELD_MOVE_TOLERANCE: float = 2.0  # Planet movement before its layer is re-rasterized
+    FIELD_FALLBACK_RADIUS: float = 80.0  # Exact evaluation this close to a planet
+    FIELD_ERROR_PROBES: int = 16  # Exact comparisons per field update
 
     # Physics
     G: float = 200.0  # Gravitational constant
@@ -13,17 +33,77 @@ class Config:
     MAX_SPEED: float = 15.0
     MIN_DISTANCE: float = 50.0  # Collision threshold
 
+    # Kernels
+    KERNELS: str = "numba"  # "numba" for JIT-compiled physics and melody kernels (NumPy if numba isn't installed), or "numpy"
+
     # Music
     MIDI_PORT_NAME: str = "HarmonicGravity_Out"
+    MIDI_BACKEND: str = "rtmidi"  # "rtmidi" (raw, falls back to mido), "mido" or "null"
     DEFAULT_BPM: int = 75
     BASE_OCTAVE: int = 5  # MIDI 60 (C4)
+    MIDI_SPIN_MARGIN: float = 0.002  # Seconds before an event the scheduler stops sleeping and spins
+    MIDI_CLOCK: bool = False  # Send MIDI clock (24 PPQN) and transport, so a DAW can sync to DEFAULT_BPM
+    GIL_SWITCH_INTERVAL: float = 0.0005  # Seconds; shorter than Python's 5 ms default so the MIDI thread gets the GIL promptly
+    MIDI_TIMING: bool = False  # Record MIDI send timing, shown on the HUD and written on exit
+    MIDI_TIMING_CAPACITY: int = 65536  # Most recent events kept for timing stats
+    MIDI_TIMING_LOG: str = "midi_timing.json"
+    LOOKAHEAD: float = 0.1  # Seconds of arpeggio and melody scheduled ahead of time
     KEY: int = 0  # 0=C, 1=C#, 2=D, etc.
+    CHORD_VOCABULARY: int = 8  # Chord types, from the start of CHORD_TYPES, the GA draws from; 0 for all
+    USER_SCALES: tuple = ()  # Extra scale types as (name, intervals), e.g. (("Hirajoshi", (0, 2, 3, 7, 8)),)
+
+    # Session log
+    SESSION_LOG: bool = False  # Append every musical and control event to a binary log
+    SESSION_LOG_PATH: str = "blastov_session.blog"
+    SESSION_LOG_CHUNK: int = 65536  # Records the log file grows by when it fills up
+
+    # Startup
+    CACHE: bool = True  # Keep the trained Markov model and voice-leading table on disk between runs
+    CACHE_DIR: str = ".blastov_cache"
+
+    # GA checkpoint
+    GA_CHECKPOINT: bool = False  # Save the evolving population in the background and resume from it at startup
+    GA_CHECKPOINT_PATH: str = "blastov_ga.npz"
+    GA_CHECKPOINT_INTERVAL: float = 30.0  # Least seconds between saves while the GA runs; always saved on resolving
+
+    # Profiling
+    PROFILE: bool = False  # Start with the frame profiler on; 'p' toggles it and its overlay
+    PROFILE_FRAMES: int = 3600  # Frames kept for the trace written on exit
+    PROFILE_WINDOW: int = 120  # Frames the overlay's percentiles cover
+    PROFILE_TRACE: str = "frame_trace.json"
+
+    # Memory telemetry
+    MEMORY_TELEMETRY: bool = False  # Sample memory in the background and warn on sustained growth
+    TELEMETRY_INTERVAL: float = 60.0  # Seconds between samples
+    TELEMETRY_WINDOW: int = 60  # Samples the growth check covers
+    TELEMETRY_GROWTH: float = 0.1  # Growth over the window that triggers a warning
+    TELEMETRY_TRACEMALLOC: bool = True  # Also trace Python allocations, to name the top allocators
+    TELEMETRY_LOG: str = "blastov_memory.jsonl"
+    TELEMETRY_LOG_MAX_BYTES: int = 16 * 2**20  # The log rolls over to .1 at this size
+
+    # Engine task rates, per second; rendering runs at FPS
+    ENGINE_INPUT_RATE: float = 120.0
+    ENGINE_PHYSICS_RATE: float = 120.0  # Snapshots published; the simulation still steps at PHYSICS_RATE
+    ENGINE_MUSIC_RATE: float = 100.0
+
+    # Quality governor
+    GOVERNOR: bool = True  # Shed optional visual work when frames run over budget
+    GOVERNOR_WINDOW: int = 30  # Frames per decision
+    GOVERNOR_SHED: float = 0.9  # Drop a level when frame work p90 exceeds this fraction of the budget
+    GOVERNOR_RESTORE: float = 0.6  # Restore a level when it stays below this fraction...
+    GOVERNOR_RESTORE_WINDOWS: int = 3  # ...for this many windows in a row
     
     # AI
-    INPUT_SIZE: int = 17 # 12 (chord (12 notes)) + 3 (history) + 1 (planet) + 1 (velocity)
+    INPUT_SIZE: int = 17 # 12 (chord (12 notes)) + 3 (history) + 1 (chord degree) + 1 (velocity)
     HIDDEN_SIZE: int = 32
     SEQ_LEN: int = 3
     OUTPUT_SIZE: int = 25 # Intervals -12 to +12 
     LEARNING_RATE: float = 0.001
     EPOCHS: int = 20
+    NEURAL_MELODY: bool = False  # Melody intervals from a network trained on the Markov model (needs torch)
+    NEURAL_BUDGET: float = 0.0  # Seconds a melody note may wait for a prediction (best-effort) before the Markov model plays it; 0 never waits
+    NEURAL_HORIZON: int = 8  # Notes predicted ahead per voice
+    NEURAL_TRAINING_SAMPLES: int = 20000
+    NEURAL_QUANTIZE: bool = False  # int8 weights
+    NEURAL_TORCHSCRIPT: bool = False  # Compile the network with TorchScript
     
\ No newline at end of file
@@ -0,0 +1,412 @@
+"""
+asyncio engine core for live play.
+
+Each subsystem is its own task with an explicit rate instead of one step of
+a shared loop:
+
+    input    pumps pygame events and held keys into simulation commands
+    physics  publishes WorldSnapshots of the simulation, which steps on its own thread
+    music    runs the sequencer and swarm voices from the latest world and harmony
+    ga       runs GA generations in an executor while a key change resolves
+    render   draws the latest state and flips the display
+
+Tasks share state only through SnapshotChannels, which hold the latest value
+of one typed snapshot, so a slow task never makes another one wait or read a
+backlog. The fixed-step physics runs on PhysicsSimulation's own thread, not
+on the event loop: its clock is the timebase for MIDI, so it must keep moving
+while a frame renders. Every periodic task has a RateTimer, so its work time and how late
+it wakes up can be measured, and its rate tuned, independently of the others; so do the
+simulation thread and GA generations. The profiler's trace shows all of them on one timeline.
+"""
+import asyncio
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from dataclasses import dataclass
+from typing import Awaitable, Callable, Dict, Generic, Optional, Tuple, TypeVar, Union
+
+import numpy as np
+import pygame
+
+from config import Config
+from governor import QualityGovernor
+from music.harmony import SCALE_FLAVOURS, ScaleData, get_scale, int_to_note, minor_flavour, note_to_int
+from physics.field import InfluenceField
+from physics.orbital_mechanics import predict_path
+from physics.simulation import WorldSnapshot
+from profiler import FrameProfiler, RateTimer
+
+T = TypeVar("T")
+
+
+class SnapshotChannel(Generic[T]):
+    """Holds the latest published value; readers never see a backlog."""
+
+    def __init__(self, initial: T) -> None:
+        self._value = initial
+        self.version = 0
+
+    def publish(self, value: T) -> None:
+        self._value = value
+        self.version += 1
+
+    def latest(self) -> T:
+        return self._value
+
+
+@dataclass(frozen=True)
+class InputState:
+    is_dragging: bool = False
+    is_swarm_drag: bool = False
+    drag_start: Tuple[int, int] = (0, 0)
+    mouse_pos: Tuple[int, int] = (0, 0)
+
+
+@dataclass(frozen=True)
+class HarmonyState:
+    scale: ScaleData
+    ga_active: bool = False
+    ga_key_label: str = ''
+    ga_status: str = ''
+    ga_diversity: str = ''
+
+
+@dataclass(frozen=True)
+class MusicState:
+    current_note: Optional[int] = None
+    source_planet: object = None
+    speed: float = 0.0
+
+
+class Engine:
+    """Runs Blastov's subsystems as asyncio tasks. Call run() from the main thread."""
+
+    def __init__(self, screen: pygame.Surface, renderer, simulation, midi, sequencer,
+                 swarm_arp, generator, field: Optional[InfluenceField] = None,
+                 session_log=None, start_scale: str = "CMajor", checkpoint=None) -> None:
+        self.screen = screen
+        self.renderer = renderer
+        self.simulation = simulation
+        self.midi = midi
+        self.sequencer = sequencer
+        self.swarm_arp = swarm_arp
+        self.generator = generator
+        self.field = field
+        self.session_log = session_log
+        self.checkpoint = checkpoint
+        self.running = False
+        self.mode = 0  # Index into SCALE_FLAVOURS of the scale type letter keys select
+
+        self.world: SnapshotChannel[WorldSnapshot] = SnapshotChannel(simulation.snapshot())
+        self.input: SnapshotChannel[InputState] = SnapshotChannel(InputState())
+        self.harmony: SnapshotChannel[HarmonyState] = SnapshotChannel(HarmonyState(get_scale(start_scale)))
+        self.music: SnapshotChannel[MusicState] = SnapshotChannel(MusicState())
+        self._ga_wakeup: Optional[asyncio.Event] = None
+
+        # GA generations run off the event loop, so they never hold up input or music
+        self.ga_executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix="ga")
+
+        self.timers: Dict[str, RateTimer] = {
+            "Input": RateTimer("Input", Config.ENGINE_INPUT_RATE),
+            "Physics": RateTimer("Physics", Config.ENGINE_PHYSICS_RATE),
+            "Music": RateTimer("Music", Config.ENGINE_MUSIC_RATE),
+            "Render": RateTimer("Render", Config.FPS),
+        }
+        self.profiler = FrameProfiler()
+        self.governor = QualityGovernor()
+        # Not periodic tasks of the loop, but timed the same way: the simulation
+        # thread's steps, and GA generations from entering the executor
+        self.timers["Physics steps"] = simulation.timer = RateTimer("Physics steps", round(1.0 / simulation.dt))
+        self.timers["GA"] = RateTimer("GA", self.governor.quality.ga_rate)
+        self._logged_thrust = None
+        self._loop: Optional[asyncio.AbstractEventLoop] = None
+        self._render_time = None
+        # Set once the first frame is on screen, when the game can be played
+        self.first_frame = threading.Event()
+
+    async def run(self) -> None:
+        """Runs every task until the window is closed."""
+        self.running = True
+        self._loop = asyncio.get_running_loop()
+        self._ga_wakeup = asyncio.Event()
+        self.simulation.start()
+        if self.session_log is not None:
+            self.session_log.key(self.simulation.clock(), self.harmony.latest().scale)
+        try:
+            await asyncio.gather(
+                self._every(self.timers["Input"], self._input_tick),
+                self._every(self.timers["Physics"], self._physics_tick),
+                self._every(self.timers["Music"], self._music_tick),
+                self._every(self.timers["Render"], self._render_tick),
+                self._ga_task(),
+            )
+        finally:
+            self.simulation.stop()
+            self.ga_executor.shutdown(cancel_futures=True)
+
+    def stop(self) -> None:
+        """Stops every task, e.g. on quit. Safe to call from any thread."""
+        self.running = False
+        # The GA task may be waiting for a key change
+        if self._loop is not None and self._ga_wakeup is not None:
+            self._loop.call_soon_threadsafe(self._ga_wakeup.set)
+
+    async def _every(self, timer: RateTimer,
+                     tick: Union[Callable[[], None], Callable[[], Awaitable[None]]]) -> None:
+        """Calls tick at the timer's rate until the engine stops, without bursting to catch up."""
+        period = 1.0 / timer.rate
+        due = time.perf_counter()
+        while self.running:
+            start = time.perf_counter()
+            result = tick()
+            if asyncio.iscoroutine(result):
+                await result
+            end = time.perf_counter()
+            timer.record(start - due, end - start, start)
+            due = max(due + period, end)
+            await asyncio.sleep(due - end)
+
+    # Input
+    def _input_tick(self) -> None:
+        state = self.input.latest()
+        simulation = self.simulation
+        log = self.session_log
+        for event in pygame.event.get():
+            if event.type == pygame.QUIT:
+                self.stop()
+
+            elif event.type == pygame.MOUSEBUTTONDOWN:
+                # Right button aims a swarm burst from the cursor instead of the satellite
+                state = InputState(True, event.button == 3, pygame.mouse.get_pos(), pygame.mouse.get_pos())
+                if not state.is_swarm_drag:
+                    simulation.freeze()
+                    if log is not None:
+                        log.freeze(simulation.clock())
+
+            elif event.type == pygame.MOUSEBUTTONUP:
+                drag_end = pygame.mouse.get_pos()
+                launch_vector = (np.array(state.drag_start) - np.array(drag_end)) * 0.1
+                if state.is_swarm_drag:
+                    # Fan the burst out slightly so the satellites separate
+                    spread = np.random.normal(0, 0.3, size=(Config.SWARM_BURST_SIZE, 2))
+                    simulation.launch_swarm(np.array(state.drag_start, dtype=float), launch_vector + spread)
+                    if log is not None:
+                        log.swarm(simulation.clock(), state.drag_start, Config.SWARM_BURST_SIZE)
+                else:
+                    simulation.launch(launch_vector)
+                    if log is not None:
+                        log.launch(simulation.clock(), launch_vector)
+                state = InputState(False, state.is_swarm_drag, state.drag_start, drag_end)
+
+            elif event.type == pygame.KEYDOWN:
+                self._key_down(event)
+
+        if state.is_dragging:
+            state = InputState(True, state.is_swarm_drag, state.drag_start, pygame.mouse.get_pos())
+        self.input.publish(state)
+        self._held_keys()
+
+    def _key_down(self, event) -> None:
+        simulation = self.simulation
+        keys = pygame.key.get_pressed()
+        ## Change key based on letter pressed
+        if event.unicode in ['a', 'b', 'c', 'd', 'e', 'f', 'g']:
+            previous_scale = self.harmony.latest().scale.name
+            root = event.unicode.upper()
+            flavour = SCALE_FLAVOURS[self.mode]
+
+            # Modifiers: Sharp/Flat (Up/Down), the scale type's minor version (Left)
+            if keys[pygame.K_UP]:
+                root = int_to_note[(note_to_int[root] + 1) % 12]
+            if keys[pygame.K_DOWN]:
+                root = int_to_note[(note_to_int[root] - 1) % 12]
+            if keys[pygame.K_LEFT]:
+                flavour = minor_flavour(flavour)
+
+            new_scale = get_scale(root + flavour)
+            self.harmony.publish(HarmonyState(new_scale, True, f"{previous_scale}->{new_scale.name}", ''))
+            self._ga_wakeup.set()
+            if self.session_log is not None:
+                self.session_log.key(simulation.clock(), new_scale)
+
+        ## Toggle the influence field cache and its harmonic-territory overlay
+        if event.unicode == 'h':
+            self.field = None if self.field is not None else InfluenceField()
+            simulation.set_field(self.field)
+
+        ## Clear the swarm
+        if event.unicode == 'x':
+            simulation.clear_swarm()
+
+        ## Cycle the scale type (Major, Minor, the modes, ...) used by the letter keys
+        if event.unicode == 'm':
+            self.mode = (self.mode + 1) % len(SCALE_FLAVOURS)
+            print(f"Scale type: {SCALE_FLAVOURS[self.mode]}")
+
+        ## Toggle the frame profiler and its overlay
+        if event.unicode == 'p':
+            self.profiler.toggle()
+
+        ## Direction keys for manual control
+        if keys[pygame.K_LEFT]:
+            simulation.apply_impulse(np.array([-0.5, 0]))
+        if keys[pygame.K_RIGHT]:
+            simulation.apply_impulse(np.array([0.5, 0]))
+        if keys[pygame.K_UP]:
+            simulation.apply_impulse(np.array([0, -0.5]))
+        if keys[pygame.K_DOWN]:
+            simulation.apply_impulse(np.array([0, 0.5]))
+
+    def _held_keys(self) -> None:
+        keys = pygame.key.get_pressed()
+        thrust = None
+        thrust_angle = 0.0
+
+        vel = self.world.latest().sat.vel
+        rocket_angle = np.arctan2(vel[1], vel[0]) if np.linalg.norm(vel) > 0 else 0
+        if keys[pygame.K_SPACE]:
+            if keys[pygame.K_LEFT]:
+                rocket_angle -= np.radians(90)
+                thrust_angle = -np.radians(30)
+            elif keys[pygame.K_RIGHT]:
+                rocket_angle += np.radians(90)
+                thrust_angle = np.radians(30)
+
+            # Project into worldspace
+            force_direction = np.array([np.cos(rocket_angle), np.sin(rocket_angle)])
+            thrust = force_direction * 0.5
+
+        # Reverse thrust with down key
+        if keys[pygame.K_DOWN]:
+            rocket_angle += np.radians(180)
+            thrust_angle = 0.0
+            force_direction = np.array([np.cos(rocket_angle), np.sin(rocket_angle)])
+            thrust = force_direction * 0.3 if thrust is None else thrust + force_direction * 0.3
+
+        self.simulation.set_thrust(thrust, thrust_angle)
+        # Only changes of thrust are logged, not every tick it is held
+        thrust_key = None if thrust is None else tuple(thrust)
+        if self.session_log is not None and thrust_key != self._logged_thrust:
+            self.session_log.thrust(self.simulation.clock(), thrust)
+        self._logged_thrust = thrust_key
+
+    # Physics
+    def _physics_tick(self) -> None:
+        self.world.publish(self.simulation.snapshot())
+
+    # Music
+    def _music_tick(self) -> None:
+        world = self.world.latest()
+        harmony = self.harmony.latest()
+        current_time = self.simulation.clock()
+        speed = np.linalg.norm(world.sat.vel)
+        dominant_planet = world.dominant_planet
+
+        # Arpeggio (Channel 0) and Markov melody (Channel 1), timestamped at exact
+        # beat positions within the lookahead window
+        self.sequencer.lookahead = self.governor.lookahead
+        self.sequencer.set_context(dominant_planet.chord, harmony.scale, speed, world.sat.frozen)
+        self.sequencer.tick(current_time)
+
+        # Swarm voices (channels from Config.SWARM_CHANNELS)
+        self.swarm_arp.update(world.swarm, [p.chord for p in world.planets], current_time,
+                              self.sequencer.clock.tempo_bpm, self.midi, self.governor.lookahead)
+        self.music.publish(MusicState(self.sequencer.current_note(current_time), dominant_planet, speed))
+
+    # Genetic algorithm
+    async def _ga_task(self) -> None:
+        loop = asyncio.get_running_loop()
+        generator = self.generator
+        while self.running:
+            harmony = self.harmony.latest()
+            if not harmony.ga_active:
+                self._ga_wakeup.clear()
+                # Also re-checks running now and then, in case it was cleared without stop()
+                try:
+                    await asyncio.wait_for(self._ga_wakeup.wait(), timeout=0.5)
+                except asyncio.TimeoutError:
+                    pass
+                continue
+
+            start = time.perf_counter()
+            queen, resolved = await loop.run_in_executor(self.ga_executor, self._timed_generation,
+                                                         harmony.scale, start)
+            chords = [gene.chord for gene in queen.planet_genes]
+            self.simulation.set_chords(chords)
+            if self.session_log is not None:
+                self.session_log.queen(self.simulation.clock(), chords)
+
+            # A key pressed while the generation ran starts over on the new scale
+            latest = self.harmony.latest()
+            if latest.scale is harmony.scale:
+                if generator.current_scale_steps >= generator.max_gens:
+                    status, active = "Didn't resolve", False
+                elif resolved:
+                    status, active = 'Resolved', False
+                else:
+                    status, active = f"{generator.current_scale_steps} steps", True
+                stats = generator.last_stats
+                diversity = (f"Entropy {stats['Entropy']:.2f}  Hamming {stats['Hamming']:.2f}  "
+                             f"Unique {stats['Unique']}/{generator.population_size}  "
+                             f"Subpop age {stats['Subpop age']}")
+                self.harmony.publish(HarmonyState(latest.scale, active, latest.ga_key_label, status, diversity))
+            if self.checkpoint is not None:
+                self.checkpoint.update(generator, force=resolved)
+
+            # Generations are paced by the governor's GA rate
+            await asyncio.sleep(max(0.0, 1.0 / self.governor.quality.ga_rate - (time.perf_counter() - start)))
+
+    def _timed_generation(self, scale: ScaleData, submitted: float):
+        """Runs one GA generation on the executor, timing it and its wait for the executor."""
+        start = time.perf_counter()
+        result = self.generator.run(scale)
+        self.timers["GA"].record(start - submitted, time.perf_counter() - start, start)
+        return result
+
+    # Rendering
+    def _render_tick(self) -> None:
+        profiler = self.profiler
+        renderer = self.renderer
+        profiler.begin_frame()
+        start = time.perf_counter()
+        frame_time = start - self._render_time if self._render_time is not None else 1.0 / Config.FPS
+        self._render_time = start
+
+        # Optional work follows the governor's quality level; music is never shed
+        quality = self.governor.quality
+        renderer.trail_step = quality.trail_step
+        renderer.hud_interval = quality.hud_interval
+
+        # Interpolated between the last two physics steps
+        view = self.simulation.snapshot(interpolate=True)
+        renderer.draw_world(view.sat, view.planets)
+        if self.field is not None:
+            renderer.draw_field(self.field, view.planets)
+        renderer.draw_swarm(view.swarm, view.planets)
+        profiler.mark("Render")
+
+        music = self.music.latest()
+        harmony = self.harmony.latest()
+        midi_timing = self.midi.timing.hud_text() if self.midi.timing is not None else ''
+        profile = ()
+        if profiler.enabled:
+            profile = profiler.hud_lines() + [timer.hud_line() for timer in self.timers.values()]
+            if self.field is not None:
+                profile.append(self.field.hud_text())
+        renderer.draw_hud(view.sat, view.planets, music.current_note, music.source_planet, music.speed,
+                          harmony.ga_key_label, harmony.ga_status, midi_timing, profile,
+                          harmony.ga_diversity)
+        profiler.mark("HUD")
+
+        state = self.input.latest()
+        if state.is_dragging:
+            potential_vel = (np.array(state.drag_start) - np.array(state.mouse_pos)) * 0.1
+            path_start = np.array(state.drag_start, dtype=float) if state.is_swarm_drag else view.sat.pos
+            path = predict_path(path_start, potential_vel, view.planets, steps=quality.path_steps)
+            renderer.draw_trajectory(path)
+            profiler.mark("Predict path")
+
+        pygame.display.flip()
+        profiler.mark("Flip")
+        self.first_frame.set()
+        self.governor.update(time.perf_counter() - start, frame_time)
@@ -1,12 +1,15 @@
 import math
+from typing import Callable, Dict, Optional
 from random import randrange, choice, random
 
-from matplotlib import pyplot as plt
 import numpy as np
 
-from music.harmony import CHORD_TYPES, ChordData, ScaleData
-from ai.utils import PlanetGene, SolarSystemChromosome
+from cache import cache_key
+from config import Config
+from music.harmony import CHORD_TYPES, CHORDS, SCALE_FLAVOURS, ScaleData, get_chord, get_scale
+from ai.utils import PlanetGene, SolarSystemChromosome, chromosome_ids
 from ai.fitness import FitnessEvaluator
+from ai.diversity import population_diversity
 
 
 class GeneticSolarSystemGenerator:
@@ -21,9 +24,13 @@ class GeneticSolarSystemGenerator:
                  threshold = 0.95,
                  mutation_rate=0.05,
                  random_immigration_prop = 0.05,
-                 subpop_size = 40):
+                 subpop_size = 40,
+                 chord_vocabulary = Config.CHORD_VOCABULARY,
+                 stats_callback: Optional[Callable[[dict], None]] = None):
         
         self.number_of_planets = number_of_planets
+        # Chord types are drawn from the first `chord_vocabulary` entries of CHORD_TYPES
+        self.chord_types = min(chord_vocabulary, len(CHORD_TYPES)) or len(CHORD_TYPES)
         self.max_gens = max_gens
         self.population_size = population_size
         self.threshold = threshold
@@ -31,6 +38,9 @@ class GeneticSolarSystemGenerator:
         self.random_immigration_prop = random_immigration_prop
         self.subpop_size = subpop_size
         self.subpop = []
+        self.subpop_age = 0  # Generations since the current subpopulation was formed
+        # Called with each generation's stats, on the thread running the GA
+        self.stats_callback = stats_callback
 
         #Initialise random population
         self.population = []
@@ -44,6 +54,7 @@ class GeneticSolarSystemGenerator:
         self.fitness_evaluator = FitnessEvaluator()
         self.current_scale_steps = 0
         self.previous_scale = None
+        self.last_stats = {"Best fit": 0.0, "Avg fit": 0.0}
     
     def run(self, current_scale: ScaleData) -> SolarSystemChromosome:
         """
@@ -55,6 +66,7 @@ class GeneticSolarSystemGenerator:
         """
         resolved = False
         queen, stats = self._step(current_scale)
+        self.last_stats = stats
         
         #Keep track of how many consecutive steps towards this particular scale. 
         if self.previous_scale and current_scale.name == self.previous_scale.name:
@@ -99,6 +111,8 @@ class GeneticSolarSystemGenerator:
             self.subpop = [x % self.population_size for x in self.subpop]
             for i in self.subpop:
                 self.population[i] = self.create_random_chromosome()
+            self.subpop_age = 0
+        self.subpop_age += 1
 
         fitnesses = np.argsort([x[1] for x in self.population_with_fitness])
 
@@ -143,7 +157,9 @@ class GeneticSolarSystemGenerator:
         self.population = self._random_immigration(self.population)
 
         #5. Fitness evaluation
-        self.population_with_fitness = [(chrom, self._evaluate_fitness(chrom, current_scale)) for chrom in self.population]
+        ids = chromosome_ids(self.population)
+        self.population_with_fitness = list(zip(self.population,
+                                                self.fitness_evaluator.evaluate_ids(ids, current_scale).tolist()))
         self.population = [chrom for chrom, _ in self.population_with_fitness]
         fitnesses = [x[1] for x in self.population_with_fitness]
 
@@ -157,7 +173,12 @@ class GeneticSolarSystemGenerator:
 
         avg_fit = sum(fitnesses) / len(fitnesses)
 
-        return self.population[queen_idx], {"Best fit": best_fit, "Avg fit": avg_fit}
+        #7. Diversity, from the same chord ids, to see why a modulation stalls
+        stats = {"Best fit": best_fit, "Avg fit": avg_fit, **population_diversity(ids, len(CHORDS)),
+                 "Subpop age": self.subpop_age}
+        if self.stats_callback is not None:
+            self.stats_callback(stats)
+        return self.population[queen_idx], stats
     
     def create_random_chromosome(self) -> SolarSystemChromosome:
         """Generates a new random SolarSystemChromosome."""
@@ -165,8 +186,7 @@ class GeneticSolarSystemGenerator:
         planet_genes = []        
         for _ in range(self.number_of_planets):
             root = randrange(12)
-            chord_type = choice(CHORD_TYPES)
-            chord = ChordData(root, chord_type)
+            chord = get_chord(root, randrange(self.chord_types))
             planet_genes.append(PlanetGene(chord))
         
         return SolarSystemChromosome(planet_genes)
@@ -191,11 +211,64 @@ class GeneticSolarSystemGenerator:
             new_population.append(chrom)
         return new_population
 
-    def _evaluate_fitness(self, chrom: SolarSystemChromosome,
-                          current_scale: ScaleData) -> float:
-        """Calculates fitness score for a given chromosome."""
-
-        return self.fitness_evaluator.evaluate(chrom, current_scale)
+    def to_arrays(self) -> Dict[str, np.ndarray]:
+        """
+        The evolving state as arrays, e.g. for a checkpoint: the population as
+        chord ids (the queen first), its fitness, the SORIGA subpopulation and
+        progress towards the current scale.
+        """
+        genes = [[gene.chord.id for gene in chrom.planet_genes] for chrom in self.population]
+        previous = self.previous_scale.name if self.previous_scale else ""
+        return {"genes": np.array(genes, dtype=np.int32),
+                "fitness": np.array([fit for _, fit in self.population_with_fitness], dtype=np.float64),
+                "subpop": np.array(self.subpop, dtype=np.int64),
+                "subpop_age": np.array(self.subpop_age),
+                "scale_steps": np.array(self.current_scale_steps),
+                "previous_scale": np.array(previous),
+                "stats": np.array([self.last_stats["Best fit"], self.last_stats["Avg fit"]]),
+                "vocabulary": np.array(vocabulary_key())}
+
+    def load_arrays(self, arrays: Dict[str, np.ndarray]) -> None:
+        """
+        Restores the state saved by to_arrays(). Raises ValueError if it was
+        saved with a different population size, number of planets, chord
+        vocabulary or set of scales, leaving the generator as it was.
+        """
+        genes = arrays["genes"]
+        if genes.shape != (self.population_size, self.number_of_planets):
+            raise ValueError(f"Population of shape {genes.shape}, expected "
+                             f"{(self.population_size, self.number_of_planets)}")
+        if str(arrays["vocabulary"]) != vocabulary_key():
+            raise ValueError("Saved with a different chord vocabulary or set of scales")
+
+        # Everything that can fail comes first, so a rejected checkpoint changes nothing
+        fitness = arrays["fitness"].tolist()
+        if len(fitness) != self.population_size:
+            raise ValueError(f"{len(fitness)} fitness values for a population of {self.population_size}")
+        subpop = arrays["subpop"].tolist()
+        subpop_age = int(arrays["subpop_age"]) if "subpop_age" in arrays else 0
+        scale_steps = int(arrays["scale_steps"])
+        previous = str(arrays["previous_scale"])
+        previous_scale = get_scale(previous) if previous else None
+        best, avg = arrays["stats"].tolist()
+        population = [SolarSystemChromosome([PlanetGene(CHORDS[chord_id]) for chord_id in row])
+                      for row in genes.tolist()]
+
+        self.population = population
+        self.population_with_fitness = list(zip(population, fitness))
+        self.subpop = subpop
+        self.subpop_age = subpop_age
+        self.current_scale_steps = scale_steps
+        self.previous_scale = previous_scale
+        self.last_stats = {"Best fit": best, "Avg fit": avg}
+
+
+def vocabulary_key() -> str:
+    """
+    Identifies the chord and scale registries, so chord ids saved with a
+    different one aren't misread and the saved scale is still there.
+    """
+    return cache_key([chord.intervals for chord in CHORDS[::12]], SCALE_FLAVOURS)
 
 def stats():
     """
@@ -206,10 +279,10 @@ def stats():
     #First key change is from random to C, which is much easier than the 
     #others. Once the population converges on a scale it is much harder to 
     #shift. 
-    scales = [ScaleData("CMajor"),
-              ScaleData("GMajor"),
-              ScaleData("FMinor"),
-              ScaleData("BMajor")]
+    scales = [get_scale("CMajor"),
+              get_scale("GMajor"),
+              get_scale("FMinor"),
+              get_scale("BMajor")]
     max_runs = 100
     stats = []
 
@@ -239,11 +312,14 @@ def stats():
             
             resolved = False if gen == generator.max_gens else True
             new_stats = {"Length": gen, "Resolved": resolved, 
-                    "Trends": {"Avg": avg_fit_trend, "Best": best_fit_trend}}
+                    "Trends": {"Avg": avg_fit_trend, "Best": best_fit_trend},
+                    "Diversity": {key: step_stats[key] for key in ("Entropy", "Hamming", "Unique")}}
             run_stats.append(new_stats)
         stats.append(run_stats)
 
-    #Visualization
+    #Visualization (matplotlib is only needed here, so it isn't imported at startup)
+    from matplotlib import pyplot as plt
+
     plt.figure(1, figsize=(12, 6))
     previous_scale = None
     for i, current_scale in enumerate(scales):
@@ -251,6 +327,7 @@ def stats():
         avg_len = 0
         max_len = 0
         unresolved = 0
+        diversity = {key: 0.0 for key in scale_stats[0]["Diversity"]}
         
         # Plot first 4 runs as samples
         for j, entry in enumerate(scale_stats):
@@ -267,6 +344,8 @@ def stats():
             avg_len += entry["Length"]
             if entry["Length"] > max_len: max_len = entry["Length"]
             unresolved += (entry["Resolved"] != True)
+            for key, value in entry["Diversity"].items():
+                diversity[key] += value / max_runs
 
         # Print Summary Stats
         avg_len /= max_runs
@@ -274,6 +353,7 @@ def stats():
         print(f"{previous_scale}->{current_scale.name}")
         print(f"Avg length: {avg_len}, max len: {max_len}.")
         print(f"{unresolved} didn't resolve in {generator.max_gens} gens.")
+        print("Avg diversity at the end: " + ", ".join(f"{key} {value:.2f}" for key, value in diversity.items()))
         previous_scale = current_scale.name
     
     plt.tight_layout()
@@ -0,0 +1,106 @@
+"""
+Adaptive quality governor, holding the main loop to its frame budget.
+
+Optional work is shed a level at a time, cheapest to lose first: trail
+detail, then how often HUD text is re-rendered, then predict_path length,
+then the GA generation rate. The arpeggio, melody and swarm voices are never
+shed; instead the sequencer's lookahead grows with the longest recent frame,
+so a slow frame delays the visuals but never the music.
+"""
+from collections import deque
+from dataclasses import dataclass
+from typing import Deque, Tuple
+
+import numpy as np
+
+from config import Config
+
+
+@dataclass(frozen=True)
+class Quality:
+    trail_step: int  # Draw every nth trail point
+    hud_interval: int  # Re-render HUD text every n frames
+    path_steps: int  # predict_path steps while aiming
+    ga_rate: float  # GA generations per second while modulating
+
+
+# From full quality down; each level sheds one more piece of optional work
+LEVELS = (
+    Quality(trail_step=1, hud_interval=1, path_steps=120, ga_rate=8.0),
+    Quality(trail_step=2, hud_interval=1, path_steps=120, ga_rate=8.0),
+    Quality(trail_step=2, hud_interval=3, path_steps=120, ga_rate=8.0),
+    Quality(trail_step=2, hud_interval=3, path_steps=60, ga_rate=8.0),
+    Quality(trail_step=4, hud_interval=6, path_steps=30, ga_rate=4.0),
+    Quality(trail_step=4, hud_interval=6, path_steps=30, ga_rate=2.0),
+)
+
+
+class QualityGovernor:
+    """
+    Watches how long each frame's work takes against the Config.FPS budget and
+    picks a quality level.
+
+    Every `window` frames it looks at the 90th percentile of the work time: above
+    `shed` of the budget it drops a level, and after `restore_windows` windows in
+    a row below `restore` of the budget it brings one back. Every change is
+    printed and kept in `decisions`.
+    """
+
+    def __init__(self, fps: int = Config.FPS, window: int = Config.GOVERNOR_WINDOW,
+                 shed: float = Config.GOVERNOR_SHED, restore: float = Config.GOVERNOR_RESTORE,
+                 restore_windows: int = Config.GOVERNOR_RESTORE_WINDOWS,
+                 enabled: bool = Config.GOVERNOR) -> None:
+        self.budget = 1.0 / fps
+        self.window = window
+        self.shed = shed
+        self.restore = restore
+        self.restore_windows = restore_windows
+        self.enabled = enabled
+        self.level = 0
+        self.lookahead = Config.LOOKAHEAD
+        self.decisions: Deque[Tuple[int, int, int, str]] = deque(maxlen=256)  # (frame, from, to, reason)
+        self._work = np.zeros(window)
+        self._intervals = np.zeros(window)
+        self._frames = 0
+        self._good_windows = 0
+
+    @property
+    def quality(self) -> Quality:
+        return LEVELS[self.level]
+
+    def update(self, work_time: float, frame_time: float) -> None:
+        """
+        Records one frame.
+
+        Args:
+            work_time (float): Seconds the frame spent working, excluding the wait for the next frame.
+            frame_time (float): Seconds since the previous frame started.
+        """
+        i = self._frames % self.window
+        self._work[i] = work_time
+        self._intervals[i] = frame_time
+        self._frames += 1
+        if i == self.window - 1:
+            self._evaluate()
+
+    def _evaluate(self) -> None:
+        # Keep twice the longest recent frame scheduled, so the music outlasts any stall
+        self.lookahead = max(Config.LOOKAHEAD, 2.0 * float(self._intervals.max()))
+        if not self.enabled:
+            return
+        load = float(np.percentile(self._work, 90)) / self.budget
+        if load > self.shed and self.level < len(LEVELS) - 1:
+            self._set_level(self.level + 1, f"frame work p90 at {load:.0%} of budget")
+            self._good_windows = 0
+        elif load < self.restore and self.level > 0:
+            self._good_windows += 1
+            if self._good_windows >= self.restore_windows:
+                self._set_level(self.level - 1, f"frame work p90 at {load:.0%} of budget")
+                self._good_windows = 0
+        else:
+            self._good_windows = 0
+
+    def _set_level(self, level: int, reason: str) -> None:
+        self.decisions.append((self._frames, self.level, level, reason))
+        print(f"Quality level {self.level} -> {level}: {reason}, now {LEVELS[level]}")
+        self.level = level
@@ -1,7 +1,11 @@
 from importlib.resources import path
+from functools import lru_cache
 import pygame
 from typing import List, Tuple
+from config import Config
 from physics.gravity import Planet, Satellite
+from physics.field import InfluenceField
+from physics.swarm import SwarmState
 import numpy as np
 
 class Renderer:
@@ -10,25 +14,47 @@ class Renderer:
         self.screen = screen
         self.font = pygame.font.SysFont("Arial", 18)
         self.sat_angle = 0
+        # Rendered text by (string, colour); labels and most HUD lines repeat frame to frame
+        self.text = lru_cache(maxsize=Config.TEXT_CACHE_SIZE)(self._render_text)
+        # Background with the orbit rings, redrawn only when the orbits change
+        self._background = None
+        self._background_key = None
+        # Detail settings, lowered by the quality governor under load
+        self.trail_step = 1  # Draw every nth trail point
+        self.hud_interval = 1  # Re-render HUD text every n frames
+        self._hud_frame = 0
+        self._hud_blits = []
+
+    def _render_text(self, text: str, color: Tuple[int, int, int]) -> pygame.Surface:
+        return self.font.render(text, True, color)
+
+    def _orbit_background(self, planets: List[Planet]) -> pygame.Surface:
+        """The space background with every orbit ring, cached until an orbit or the window changes."""
+        orbits = tuple((tuple(p.orbit_center), p.orbit_radius) for p in planets
+                       if getattr(p, "orbit_center", None) is not None and getattr(p, "orbit_radius", 0) > 1)
+        key = (self.screen.get_size(), orbits)
+        if key != self._background_key:
+            self._background = pygame.Surface(self.screen.get_size()).convert()
+            self._background.fill((10, 10, 25)) # Deep space blue
+            for center, radius in set(orbits):
+                pygame.draw.circle(self._background, (40, 40, 60), np.array(center).astype(int), int(radius), 1)
+            self._background_key = key
+        return self._background
 
     def draw_world(self, sat: Satellite, planets: List[Planet]) -> None:
         """Renders the space background, planets, orbits, and the satellite."""
-        self.screen.fill((10, 10, 25)) # Deep space blue
+        self.screen.blit(self._orbit_background(planets), (0, 0))
 
         # Draw Trail
         if len(sat.history) > 2:
-            pygame.draw.lines(self.screen, (100, 100, 255), False, [p for p in sat.history], 2)
+            pygame.draw.lines(self.screen, (100, 100, 255), False, sat.history[::self.trail_step], 2)
 
         # Draw Planets
         for p in planets:
-            # draw orbit (if any)
-            if getattr(p, "orbit_center", None) is not None and getattr(p, "orbit_radius", 0) > 1:
-                pygame.draw.circle(self.screen, (40, 40, 60), p.orbit_center.astype(int), int(p.orbit_radius), 1)
-
             color = p.color
             pygame.draw.circle(self.screen, color, p.pos.astype(int), int(p.radius))
             # Label
-            label = self.font.render(p.chord.name, True, (255, 255, 255))
+            label = self.text(p.chord.name, (255, 255, 255))
             self.screen.blit(label, (p.pos[0] - 20, p.pos[1] + p.radius + 5))
 
         # Draw Satellite as triangle pointing in velocity direction
@@ -80,6 +106,29 @@ class Renderer:
 
     
 
+    def draw_swarm(self, swarm: SwarmState, planets: List[Planet]) -> None:
+        """Renders the swarm satellites and their trails, tinted by their dominant planet."""
+        for i in np.flatnonzero(swarm.active):
+            color = planets[swarm.dominant[i]].color
+            if swarm.trails is not None and swarm.trail_counts[i] > 2:
+                trail = swarm.trails[i, -swarm.trail_counts[i]::self.trail_step]
+                if len(trail) > 1:
+                    pygame.draw.lines(self.screen, color, False, trail, 1)
+            pygame.draw.circle(self.screen, (255, 255, 255), swarm.pos[i].astype(int), 3)
+
+    def draw_field(self, field: InfluenceField, planets: List[Planet]) -> None:
+        """Overlays each planet's harmonic territory, as cached in the influence field."""
+        colors = np.array([p.color for p in planets], dtype=np.uint8)
+        dominant = field.dominant
+        if dominant.max() >= len(colors):
+            return
+        # One pixel per grid node, scaled up to the window; surfarray wants (x, y) order
+        grid = pygame.surfarray.make_surface(colors[dominant].transpose(1, 0, 2))
+        size = (int((field.cols - 1) * field.cell_size), int((field.rows - 1) * field.cell_size))
+        overlay = pygame.transform.smoothscale(grid, size)
+        overlay.set_alpha(50)
+        self.screen.blit(overlay, (0, 0))
+
     def draw_trajectory(self, path: List[Tuple[int, int]]):
         """Draws the predicted path as a series of small dots."""
         for point in path[::3]:  # Draw every 3rd point
@@ -87,15 +136,23 @@ class Renderer:
     
     def draw_hud(self, sat: Satellite, planets: List[Planet], current_note: int = None, 
                  source_planet: Planet = None, speed: float = 0.0, ga_key_label: str = '', 
-                 ga_status: str = ''):
+                 ga_status: str = '', midi_timing: str = '', profile: List[str] = (),
+                 ga_diversity: str = ''):
         """Draws HUD with MIDI output info and planet distances."""
 
+        # Between re-renders, the previous frame's text is drawn again
+        self._hud_frame += 1
+        if self._hud_frame % self.hud_interval and self._hud_blits:
+            self.screen.blits(self._hud_blits)
+            return
+        blits = self._hud_blits = []
+
         y_offset = 10
         line_height = 25
         
         # Speed
-        speed_text = self.font.render(f"Speed: {speed:.2f}", True, (255, 255, 255))
-        self.screen.blit(speed_text, (10, y_offset))
+        speed_text = self.text(f"Speed: {speed:.2f}", (255, 255, 255))
+        blits.append((speed_text, (10, y_offset)))
         y_offset += line_height
         
         # Current MIDI output
@@ -104,26 +161,44 @@ class Renderer:
             note_name = note_names[current_note % 12]
             octave = (current_note // 12) - 1
             
-            midi_text = self.font.render(f"Playing: {note_name}{octave} (MIDI {current_note})", True, (100, 255, 100))
-            self.screen.blit(midi_text, (10, y_offset))
+            midi_text = self.text(f"Playing: {note_name}{octave} (MIDI {current_note})", (100, 255, 100))
+            blits.append((midi_text, (10, y_offset)))
             y_offset += line_height
             
-            chord_text = self.font.render(f"From: {source_planet.chord.name}", True, (100, 255, 100))
-            self.screen.blit(chord_text, (10, y_offset))
+            chord_text = self.text(f"From: {source_planet.chord.name}", (100, 255, 100))
+            blits.append((chord_text, (10, y_offset)))
             y_offset += line_height
         
         # Distances to planets
         y_offset += 10
-        dist_header = self.font.render("Distances:", True, (200, 200, 255))
-        self.screen.blit(dist_header, (10, y_offset))
+        dist_header = self.text("Distances:", (200, 200, 255))
+        blits.append((dist_header, (10, y_offset)))
         y_offset += line_height
         
         for i, p in enumerate(planets):
+            # Stop above the status lines rather than render text nobody can read
+            if y_offset > 620:
+                break
             dist = np.linalg.norm(p.pos - sat.pos)
-            dist_text = self.font.render(f"  {p.chord.name}: {dist:.1f}px", True, (180, 180, 180))
-            self.screen.blit(dist_text, (10, y_offset))
+            dist_text = self.text(f"  {p.chord.name}: {dist:.1f}px", (180, 180, 180))
+            blits.append((dist_text, (10, y_offset)))
             y_offset += line_height
 
         # Displays genetic algorithm status
-        dist_text = self.font.render(f"{ga_key_label}: {ga_status}", True, (180, 180, 180))
-        self.screen.blit(dist_text, (10, 670))
\ No newline at end of file
+        dist_text = self.text(f"{ga_key_label}: {ga_status}", (180, 180, 180))
+        blits.append((dist_text, (10, 670)))
+        if ga_diversity:
+            diversity_text = self.text(ga_diversity, (180, 180, 180))
+            blits.append((diversity_text, (10, 695)))
+
+        # MIDI timing instrumentation, when enabled
+        if midi_timing:
+            timing_text = self.text(midi_timing, (180, 180, 180))
+            blits.append((timing_text, (10, 645)))
+
+        # Frame profiler overlay, p50 / p99 per stage, top right
+        for i, line in enumerate(profile):
+            profile_text = self.text(line, (255, 220, 120))
+            blits.append((profile_text, (self.screen.get_width() - 250, 10 + i * 20)))
+
+        self.screen.blits(blits)
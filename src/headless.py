@@ -0,0 +1,203 @@
+"""
+Headless, scripted end-to-end run of Blastov, for reproducible performance tests.
+
+Runs the same pipeline as offline.py, with no window, input devices or MIDI
+device, driven by a timeline of control input instead of a player. It reports
+throughput per subsystem alongside GA fitness, melody and MIDI statistics, so
+comparing reports between commits shows both speed and musical regressions.
+
+The timeline is a JSON list of events, with times in simulated seconds:
+
+    [{"t": 0, "event": "launch", "velocity": [4, -1]},
+     {"t": 10, "event": "key", "scale": "GMajor"},
+     {"t": 20, "event": "thrust", "force": [0.5, 0]},
+     {"t": 22, "event": "thrust", "force": null},
+     {"t": 30, "event": "swarm", "pos": [360, 200], "velocity": [2, 1], "count": 10},
+     {"t": 40, "event": "freeze"}]
+
+Example:
+    python headless.py --timeline session.json --duration 300 --report report.json
+"""
+import argparse
+import bisect
+import json
+import random
+import time
+from typing import List
+
+import numpy as np
+
+from config import Config
+from music.harmony import get_scale
+from music.midi_backends import NOTE_ON_STATUS
+from music.midi_file import MIDIFileWriter
+from offline import OfflineSession
+
+DEFAULT_TIMELINE = [
+    {"t": 0, "event": "launch", "velocity": [4, -1]},
+    {"t": 20, "event": "key", "scale": "GMajor"},
+    {"t": 40, "event": "thrust", "force": [0.3, 0]},
+    {"t": 41, "event": "thrust", "force": None},
+    {"t": 60, "event": "swarm", "pos": [360, 200], "velocity": [2, 1], "count": Config.SWARM_BURST_SIZE},
+    {"t": 80, "event": "key", "scale": "FMinor"},
+    {"t": 100, "event": "freeze"},
+    {"t": 101, "event": "launch", "velocity": [-3, 2]},
+    {"t": 120, "event": "key", "scale": "BMajor"},
+]
+
+EVENTS = ("launch", "key", "thrust", "swarm", "freeze")
+
+
+class HeadlessSession(OfflineSession):
+    """OfflineSession driven by a timeline of launches, thrust, swarm bursts and key changes."""
+
+    def __init__(self, midi, timeline: List[dict], physics_rate: int = Config.PHYSICS_RATE,
+                 start_scale: str = "CMajor") -> None:
+        for entry in timeline:
+            if entry["event"] not in EVENTS:
+                raise ValueError(f"Unknown timeline event '{entry['event']}' at t={entry['t']}")
+        timeline = sorted(timeline, key=lambda entry: entry["t"])
+        # Key changes go through OfflineSession's own key script
+        key_script = [(entry["t"], entry["scale"]) for entry in timeline if entry["event"] == "key"]
+        super().__init__(midi, None, key_script, start_scale=start_scale, physics_rate=physics_rate)
+        self.timeline = [entry for entry in timeline if entry["event"] != "key"]
+        self.key_changes = [(0.0, start_scale)] + key_script
+
+    def _apply_script(self) -> None:
+        super()._apply_script()
+        while self.timeline and self.timeline[0]["t"] <= self.now:
+            entry = self.timeline.pop(0)
+            event = entry["event"]
+            if event == "launch":
+                self.simulation.launch(np.array(entry["velocity"], dtype=float))
+            elif event == "freeze":
+                self.simulation.freeze()
+            elif event == "thrust":
+                force = entry.get("force")
+                self.simulation.set_thrust(None if force is None else np.array(force, dtype=float))
+            elif event == "swarm":
+                count = entry.get("count", Config.SWARM_BURST_SIZE)
+                spread = np.random.normal(0, 0.3, size=(count, 2))
+                self.simulation.launch_swarm(np.array(entry["pos"], dtype=float),
+                                             np.array(entry["velocity"], dtype=float) + spread)
+
+
+def midi_stats(events, duration: float) -> dict:
+    """Note counts per channel, peak polyphony and message rates of a recording."""
+    notes_per_channel = {}
+    sounding = set()  # (channel, note); re-triggered notes only sound once
+    peak_polyphony = 0
+    for _, message in events:
+        channel = message[0] & 0x0F
+        if message[0] & 0xF0 == NOTE_ON_STATUS:
+            notes_per_channel[channel] = notes_per_channel.get(channel, 0) + 1
+            sounding.add((channel, message[1]))
+            peak_polyphony = max(peak_polyphony, len(sounding))
+        else:
+            sounding.discard((channel, message[1]))
+    times = np.array([t for t, _ in events])
+    per_second = np.bincount(times.astype(int)) if len(times) else np.zeros(1)
+    return {"Messages": len(events),
+            "Notes per channel": {str(channel): count for channel, count in sorted(notes_per_channel.items())},
+            "Peak polyphony": peak_polyphony,
+            "Mean message rate (msg/s)": len(events) / duration,
+            "Peak message rate (msg/s)": int(per_second.max())}
+
+
+def melody_stats(events, key_changes, channel: int = 1) -> dict:
+    """Range, motion and scale fit of the notes played on one channel."""
+    notes = [(t, message[1]) for t, message in events
+             if message[0] == NOTE_ON_STATUS | channel]
+    if not notes:
+        return {"Notes": 0}
+    change_times = [t for t, _ in key_changes]
+    scales = [get_scale(name) for _, name in key_changes]
+    in_scale = 0
+    for t, pitch in notes:
+        scale = scales[bisect.bisect_right(change_times, t) - 1]
+        in_scale += (scale.mask >> (pitch % 12)) & 1
+    pitches = np.array([pitch for _, pitch in notes])
+    intervals = np.abs(np.diff(pitches))
+    return {"Notes": len(notes),
+            "Distinct pitches": int(len(np.unique(pitches))),
+            "Range": [int(pitches.min()), int(pitches.max())],
+            "Mean interval": float(intervals.mean()) if len(intervals) else 0.0,
+            "Repeated notes": float(np.mean(intervals == 0)) if len(intervals) else 0.0,
+            "In scale": in_scale / len(notes)}
+
+
+def fitness_stats(session: OfflineSession) -> dict:
+    """GA generations run and the fitness they reached."""
+    if not session.fitness_trend:
+        return {"Generations": 0}
+    _, best, average = np.array(session.fitness_trend).T
+    return {"Generations": len(session.fitness_trend),
+            "Final best fit": float(best[-1]),
+            "Final avg fit": float(average[-1]),
+            "Mean avg fit": float(average.mean())}
+
+
+def throughput_stats(session: OfflineSession, events, duration: float, elapsed: float) -> dict:
+    """Wall-clock time per subsystem and the work each got through."""
+    timings = session.timings
+    steps = int(round(session.simulation.sim_time / session.simulation.dt))
+
+    def per_second(count, seconds):
+        return count / seconds if seconds > 0 else 0.0
+
+    return {"Real-time factor": duration / elapsed,
+            "Frames per second": session.frames / elapsed,
+            "Seconds": {name: seconds for name, seconds in timings.items()},
+            "Physics steps per second": per_second(steps, timings["Physics"]),
+            "GA generations per second": per_second(session.ga_generations, timings["GA"]),
+            "Music frames per second": per_second(session.frames, timings["Music"]),
+            "MIDI messages per second": per_second(len(events), timings["MIDI"])}
+
+
+def run(timeline: List[dict], duration: float, physics_rate: int = Config.PHYSICS_RATE,
+        seed: int = 0) -> dict:
+    """Runs a timeline for duration simulated seconds and returns the report."""
+    random.seed(seed)
+    np.random.seed(seed)
+    writer = MIDIFileWriter()
+    session = HeadlessSession(writer, timeline, physics_rate=physics_rate)
+    start = time.perf_counter()
+    session.run(duration)
+    elapsed = time.perf_counter() - start
+    return {"Duration": duration,
+            "Elapsed": elapsed,
+            "Throughput": throughput_stats(session, writer.events, duration, elapsed),
+            "Fitness": fitness_stats(session),
+            "Melody": melody_stats(writer.events, session.key_changes),
+            "MIDI": midi_stats(writer.events, duration)}
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Run Blastov headless from a scripted timeline.")
+    parser.add_argument("--timeline", help="JSON timeline of input events; a built-in one if omitted.")
+    parser.add_argument("--duration", type=float, default=180.0, help="Simulated seconds to run.")
+    parser.add_argument("--physics-rate", type=int, default=Config.PHYSICS_RATE, help="Physics steps per second.")
+    parser.add_argument("--seed", type=int, default=0, help="Random seed, for reproducible runs.")
+    parser.add_argument("--report", help="Write the report to this JSON file.")
+    args = parser.parse_args()
+
+    timeline = DEFAULT_TIMELINE
+    if args.timeline:
+        with open(args.timeline) as f:
+            timeline = json.load(f)
+
+    report = run(timeline, args.duration, args.physics_rate, args.seed)
+    throughput = report["Throughput"]
+    print(f"Ran {args.duration:.0f}s in {report['Elapsed']:.2f}s ({throughput['Real-time factor']:.0f}x real time).")
+    for name, seconds in throughput["Seconds"].items():
+        print(f"  {name:8s} {seconds:7.3f}s")
+    print(f"Fitness: {report['Fitness']}")
+    print(f"Melody:  {report['Melody']}")
+    print(f"MIDI:    {report['MIDI']}")
+    if args.report:
+        with open(args.report, "w") as f:
+            json.dump(report, f, indent=2)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,65 @@
+"""
+Kernel backend selection.
+
+calculate_gravity, predict_path and the Markov model's chord bias are small
+numeric loops whose time goes on interpreter and NumPy call overhead. Each
+has a NumPy reference implementation and an optional Numba kernel (see
+kernels.numba_kernels) that does the same floating-point operations in the
+same order, so both give identical results. select() picks one at startup;
+the functions check `kernels.jit` on every call.
+
+Because the results are identical, the kernels can also be switched in
+mid-run: with background=True, select() leaves the NumPy path in use and
+compiles the kernels on a thread, which takes about 0.6 s with numba's cache
+warm and several seconds cold, so that work doesn't delay the window and
+the first note.
+"""
+import threading
+
+from config import Config
+
+# The compiled kernels module, or None for the NumPy reference path
+jit = None
+# Bumped by every select(), so a background warm-up from an earlier one doesn't install its kernels
+_selection = 0
+
+
+def select(backend: str = Config.KERNELS, background: bool = False) -> str:
+    """
+    Selects the kernels the physics and melody functions use.
+
+    Args:
+        backend (str): "numba" for the JIT-compiled kernels, falling back to
+            "numpy" when numba isn't installed, or "numpy".
+        background (bool): Compile the numba kernels on a daemon thread and
+            switch to them once they're ready, using NumPy until then.
+
+    Returns:
+        str: The backend in use, or that will be once the warm-up is done.
+    """
+    global jit, _selection
+    if backend not in ("numba", "numpy"):
+        raise ValueError(f"Unknown kernel backend '{backend}'")
+    jit = None
+    _selection += 1
+    if backend == "numba":
+        if background:
+            threading.Thread(target=_load_numba, args=(_selection,), name="kernels", daemon=True).start()
+        elif not _load_numba(_selection):
+            return "numpy"
+    return backend
+
+
+def _load_numba(selection: int) -> bool:
+    """Loads and warms up the numba kernels, then installs them unless select() was called since."""
+    global jit
+    try:
+        from kernels import numba_kernels
+    except ImportError as e:
+        print(f"Could not load the numba kernels: {e}. Using NumPy.")
+        return False
+    # Compiles the kernels, or loads them from numba's cache, before they're needed
+    numba_kernels.warm_up()
+    if selection == _selection:
+        jit = numba_kernels
+    return True
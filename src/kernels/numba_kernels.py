@@ -0,0 +1,189 @@
+"""
+Numba kernels, compiled on first use and cached on disk by numba.
+
+Each does the same floating-point operations, in the same order, as the
+NumPy function it stands in for, and nothing numba could reassociate
+(no fastmath), so its results are bit for bit the same:
+
+    gravity        physics.gravity.calculate_gravity
+    gravity_batch  physics.gravity.calculate_gravity_batch
+    predict_path   physics.orbital_mechanics.predict_path
+    chord_bias     MarkovChainMelodyGenerator._apply_chord_bias
+
+Only imported by kernels.select(), as importing numba takes a while.
+"""
+import math
+
+import numpy as np
+from numba import njit
+
+
+@njit(cache=True)
+def _block_sum(values, start, n):
+    """np.sum's sum of a block of at most 128 values: sequential below 8, else 8 accumulators."""
+    if n < 8:
+        total = 0.0
+        for i in range(start, start + n):
+            total += values[i]
+        return total
+    r0, r1, r2, r3 = values[start], values[start + 1], values[start + 2], values[start + 3]
+    r4, r5, r6, r7 = values[start + 4], values[start + 5], values[start + 6], values[start + 7]
+    i = 8
+    while i < n - n % 8:
+        j = start + i
+        r0 += values[j]
+        r1 += values[j + 1]
+        r2 += values[j + 2]
+        r3 += values[j + 3]
+        r4 += values[j + 4]
+        r5 += values[j + 5]
+        r6 += values[j + 6]
+        r7 += values[j + 7]
+        i += 8
+    total = ((r0 + r1) + (r2 + r3)) + ((r4 + r5) + (r6 + r7))
+    while i < n:
+        total += values[start + i]
+        i += 1
+    return total
+
+
+@njit(cache=True)
+def pairwise_sum(values):
+    """
+    Sum of values in np.sum's order, so totals match it exactly: halves (of a
+    multiple of 8), split down to blocks of at most 128, each added up by
+    _block_sum, then combined pairwise. The halving is walked with explicit
+    stacks, not recursion, which numba can't load back from its cache.
+    """
+    n = len(values)
+    if n <= 128:
+        return _block_sum(values, 0, n)
+    # Pending halves, as (start, size, whether both of its halves are summed)
+    starts = np.empty(192, dtype=np.int64)
+    sizes = np.empty(192, dtype=np.int64)
+    split = np.zeros(192, dtype=np.bool_)
+    sums = np.empty(128)
+    starts[0], sizes[0] = 0, n
+    top, summed = 1, 0
+    while top:
+        top -= 1
+        start, size = starts[top], sizes[top]
+        if size <= 128:
+            sums[summed] = _block_sum(values, start, size)
+            summed += 1
+        elif split[top]:
+            summed -= 1
+            sums[summed - 1] = sums[summed - 1] + sums[summed]
+        else:
+            half = size // 2
+            half -= half % 8
+            # Revisited once both halves are summed; the first half is summed first
+            split[top] = True
+            starts[top + 1], sizes[top + 1], split[top + 1] = start + half, size - half, False
+            starts[top + 2], sizes[top + 2], split[top + 2] = start, half, False
+            top += 3
+    return sums[0]
+
+
+@njit(cache=True)
+def _gravity_xy(x, y, planet_pos, planet_mass, g, min_distance):
+    fx = 0.0
+    fy = 0.0
+    for i in range(len(planet_mass)):
+        dx = planet_pos[i, 0] - x
+        dy = planet_pos[i, 1] - y
+        dist = max(math.sqrt(dx * dx + dy * dy), min_distance)
+        force = (g * planet_mass[i]) / (dist * dist)
+        fx += (dx / dist) * force
+        fy += (dy / dist) * force
+    return fx, fy
+
+
+@njit(cache=True)
+def gravity(pos, planet_pos, planet_mass, g, min_distance):
+    """Total pull of the planets, (P, 2) positions and (P,) masses, on a point."""
+    force = np.empty(2)
+    force[0], force[1] = _gravity_xy(pos[0], pos[1], planet_pos, planet_mass, g, min_distance)
+    return force
+
+
+@njit(cache=True)
+def gravity_batch(positions, planet_pos, planet_mass, g, min_distance):
+    """Total pull of the planets on each of many points, (N, 2)."""
+    force = np.empty((len(positions), 2))
+    for n in range(len(positions)):
+        fx = 0.0
+        fy = 0.0
+        for i in range(len(planet_mass)):
+            dx = planet_pos[i, 0] - positions[n, 0]
+            dy = planet_pos[i, 1] - positions[n, 1]
+            dist = max(math.sqrt(dx * dx + dy * dy), min_distance)
+            scale = (g * planet_mass[i]) / (dist * dist * dist)
+            fx += dx * scale
+            fy += dy * scale
+        force[n, 0] = fx
+        force[n, 1] = fy
+    return force
+
+
+@njit(cache=True)
+def predict_path(pos, vel, planet_pos, planet_mass, centers, radii, speeds, angles, orbiting,
+                 steps, dt, g, min_distance, max_speed, damping):
+    """Integer positions of a satellite over `steps` steps, with the planets moving along their orbits."""
+    planet_pos = planet_pos.copy()
+    angles = angles.copy()
+    x, y = pos[0], pos[1]
+    vx, vy = vel[0], vel[1]
+    path = np.empty((steps, 2), dtype=np.int64)
+    for step in range(steps):
+        for i in range(len(planet_mass)):
+            if orbiting[i]:
+                angles[i] += speeds[i] * dt
+                planet_pos[i, 0] = centers[i, 0] + math.cos(angles[i]) * radii[i]
+                planet_pos[i, 1] = centers[i, 1] + math.sin(angles[i]) * radii[i]
+        fx, fy = _gravity_xy(x, y, planet_pos, planet_mass, g, min_distance)
+        vx += fx
+        vy += fy
+        speed = math.sqrt(vx * vx + vy * vy)
+        if speed > max_speed:
+            vx = (vx / speed) * max_speed
+            vy = (vy / speed) * max_speed
+        x += vx
+        y += vy
+        vx *= damping
+        vy *= damping
+        path[step, 0] = int(x)
+        path[step, 1] = int(y)
+    return path
+
+
+@njit(cache=True)
+def chord_bias(probs, relative, chord_bits, scale_bits, epsilon, chord_weight, scale_weight, other_weight):
+    """Transition probabilities weighted by each state's pitch class relative to the chord root, renormalised."""
+    weighted = np.empty(len(probs))
+    for i in range(len(probs)):
+        pitch_class = relative[i]
+        if chord_bits[pitch_class]:
+            weight = chord_weight
+        elif scale_bits[pitch_class]:
+            weight = scale_weight
+        else:
+            weight = other_weight
+        weighted[i] = (probs[i] + epsilon) * weight
+    total = pairwise_sum(weighted)
+    if total > 0:
+        for i in range(len(weighted)):
+            weighted[i] /= total
+    return weighted
+
+
+def warm_up() -> None:
+    """Compiles every kernel (or loads it from the cache) with the argument types it's called with."""
+    planets = np.zeros((1, 2))
+    ones = np.ones(1)
+    gravity(np.zeros(2), planets, ones, 1.0, 1.0)
+    gravity_batch(planets, planets, ones, 1.0, 1.0)
+    predict_path(np.zeros(2), np.zeros(2), planets, ones, planets, ones, ones, ones,
+                 np.ones(1, dtype=np.bool_), 1, 1.0, 1.0, 1.0, 1.0, 1.0)
+    bits = np.zeros(12, dtype=np.bool_)
+    chord_bias(ones, np.zeros(1, dtype=np.int64), bits, bits, 0.0, 1.0, 1.0, 1.0)
@@ -1,333 +1,216 @@
-import pygame
-import numpy as np
-import time
+import argparse
+import sys
 import threading
-from queue import Queue
-from typing import List, Any
+from typing import TYPE_CHECKING, List
 
 #Local imports
 from config import Config
-from physics.gravity import Planet, Satellite, calculate_gravity, get_dominant_planet
-from physics.orbital_mechanics import predict_path
-from gui.renderer import Renderer
-from music.midi_output import MIDIHandler
-from music.harmony import CHORD_TYPES, int_to_note, note_to_int, ChordData, ScaleData
-from genetic_engine import GeneticSolarSystemGenerator
-from markov import train_examples
-from markov.MarkovChainMelodyGenerator import MarkovChainMelodyGenerator 
+from profiler import StartupReport
 
+if TYPE_CHECKING:
+    from markov.MarkovChainMelodyGenerator import MarkovChainMelodyGenerator
+    from physics.gravity import Planet
 
+# Everything heavier is imported inside the functions that need it, so that
+# main() can time each phase of startup and tools importing this module only
+# pay for what they use.
 
-def initialize_planets(system_center: np.ndarray) -> List["Planet"]:
+
+def initialize_planets(system_center) -> List["Planet"]:
     """
     Returns the initial list of planets with predefined orbits.
-    
+
     Args:
         system_center: A numpy array representing the [x, y] center of the system.
     Returns:
         A list of Planet objects.
     """
+    import numpy as np
+    from music.harmony import get_chord
+    from physics.gravity import Planet
+
     # Use E major 7 (root=E -> 4) for all initial planet chords
     return [
-        Planet(pos=np.array([400, 360]), mass=10, chord=ChordData(4, CHORD_TYPES[0]),
+        Planet(pos=np.array([400, 360]), mass=10, chord=get_chord(4, 0),
                orbit_center=system_center, orbit_radius=130.0, angular_speed=0.18, angle=3.14),
-        Planet(pos=np.array([880, 360]), mass=10, chord=ChordData(4, CHORD_TYPES[0]),
+        Planet(pos=np.array([880, 360]), mass=10, chord=get_chord(4, 0),
                orbit_center=system_center, orbit_radius=240.0, angular_speed=-0.12, angle=0.0),
-        Planet(pos=np.array([640, 150]), mass=10, chord=ChordData(4, CHORD_TYPES[0]),
+        Planet(pos=np.array([640, 150]), mass=10, chord=get_chord(4, 0),
                orbit_center=system_center, orbit_radius=210.0, angular_speed=0.4, angle=1.5),
-        Planet(pos=np.array([640, 150]), mass=10, chord=ChordData(4, CHORD_TYPES[0]),
+        Planet(pos=np.array([640, 150]), mass=10, chord=get_chord(4, 0),
                orbit_center=system_center, orbit_radius=100.0, angular_speed=0.22, angle=2),
-        Planet(pos=np.array([640, 150]), mass=10, chord=ChordData(4, CHORD_TYPES[0]),
+        Planet(pos=np.array([640, 150]), mass=10, chord=get_chord(4, 0),
                orbit_center=system_center, orbit_radius=70.0, angular_speed=0.42, angle=0.7),
     ]
 
 def get_markov_model() -> "MarkovChainMelodyGenerator":
     """
-    Initializes and trains the Markov model for melody generation.
-    
+    Initializes and trains the Markov model for melody generation, or loads
+    it from the startup cache if it was trained on the same data before.
+
     Returns:
         The trained MarkovChainMelodyGenerator instance.
     """
-    
+    from cache import cache_key, cached_arrays
+    from markov import train_examples
+    from markov.MarkovChainMelodyGenerator import MarkovChainMelodyGenerator
+
     training_data = (
         train_examples.track_1() + train_examples.track_2() +
         train_examples.track_3() + train_examples.track_4() +
         train_examples.track_5() + train_examples.track_6() +
         train_examples.track_7() + train_examples.track_8()
     )
-    states = list(set(training_data))
-    model = MarkovChainMelodyGenerator(states)
-    model.train(training_data)
-    return model
 
-def run_ga_thread(generator: Any, current_scale: "ScaleData", queue: Queue) -> None:
+    def train():
+        states = list(set(training_data))
+        model = MarkovChainMelodyGenerator(states)
+        model.train(training_data)
+        return model.to_arrays()
 
-    """Worker function for the genetic algorithm thread."""
+    arrays = cached_arrays("markov", cache_key("markov-1", training_data), train)
+    return MarkovChainMelodyGenerator.from_arrays(arrays)
 
-    chrom, resolved = generator.run(current_scale)
-    steps = generator.current_scale_steps
-    queue.put({'chromosome': chrom, 'resolved': resolved, 'steps': steps})
-    time.sleep(0.1)
+def report_when_ready(engine, report: StartupReport, timeout: float = 10.0) -> None:
+    """Waits for the engine's first frame, then prints the startup report."""
+    if engine.first_frame.wait(timeout):
+        report.mark("First frame")
+    report.print()
 
 def main():
+    parser = argparse.ArgumentParser(description="Blastov: a generative music solar system.")
+    parser.add_argument("--startup-report", action="store_true",
+                        help="Print how long each phase of startup takes, up to the first frame.")
+    parser.add_argument("--memory-telemetry", action="store_true", default=Config.MEMORY_TELEMETRY,
+                        help=f"Sample memory every {Config.TELEMETRY_INTERVAL:g}s into {Config.TELEMETRY_LOG} "
+                             "and warn on sustained growth.")
+    parser.add_argument("--ga-checkpoint", action="store_true", default=Config.GA_CHECKPOINT,
+                        help=f"Resume the GA from {Config.GA_CHECKPOINT_PATH} and keep saving it there.")
+    parser.add_argument("--neural-melody", action="store_true", default=Config.NEURAL_MELODY,
+                        help="Pick melody intervals with a small network (needs torch), falling back to "
+                             "the Markov model when a prediction is late.")
+    parser.add_argument("--kernels", choices=("numba", "numpy"), default=Config.KERNELS,
+                        help="Run path prediction, gravity and melody bias on numba JIT kernels, or on NumPy.")
+    args = parser.parse_args()
+    report = StartupReport(enabled=args.startup_report)
+
+    import asyncio
+    import numpy as np
+    import pygame
+    report.mark("Import pygame, numpy")
+    from physics.gravity import Satellite
+    from physics.field import InfluenceField
+    from physics.simulation import PhysicsSimulation
+    from gui.renderer import Renderer
+    report.mark("Import physics, renderer")
+    from music.midi_output import MIDIHandler
+    from music.sequencer import MusicalClock, Sequencer
+    from music.voices import SwarmArpeggiator
+    from music.harmony import get_scale
+    report.mark("Import music, harmony")
+    from genetic_engine import GeneticSolarSystemGenerator
+    from checkpoint import GACheckpoint
+    from session_log import SessionLog
+    from engine import Engine
+    report.mark("Import GA, engine")
+    import kernels
+    # The NumPy path runs until the kernels have compiled in the background
+    kernels.select(args.kernels, background=True)
 
     #Framework initialization
     pygame.init()
-    dt = 1.0 / Config.FPS
+    # Let the MIDI scheduler thread preempt rendering and the GA sooner
+    sys.setswitchinterval(Config.GIL_SWITCH_INTERVAL)
     screen = pygame.display.set_mode((Config.WINDOW_WIDTH, Config.WINDOW_HEIGHT))
-    clock = pygame.time.Clock()
     renderer = Renderer(screen)
+    report.mark("Window")
 
-    
-    # MIDI & Audio Setup
-    midi = MIDIHandler(Config.MIDI_PORT_NAME)
-    arp_index = 0
-    last_arp_time = time.time()
-    current_note = None
-    source_planet = None
-    # Tempo (BPM) - arpeggio will be tempo-synced; speed will control subdivisions
+    # Tempo (BPM) - arpeggio is tempo-synced; speed controls subdivisions
     tempo_bpm = Config.DEFAULT_BPM
 
     # Solar system initialization
     system_center = np.array([Config.WINDOW_WIDTH // 2, Config.WINDOW_HEIGHT // 2])
     planets = initialize_planets(system_center)
     sat = Satellite(np.array([100, 100]))
+    # Physics steps at a fixed rate on its own thread, started and stopped by the engine
+    field = InfluenceField() if Config.FIELD_CACHE else None
+    simulation = PhysicsSimulation(planets, sat, field=field)
+    swarm_arp = SwarmArpeggiator()
+    report.mark("Physics")
 
-    # Genetic algorithm and thread state
-    ga_timer = 0
-    ga_rate = 8.0
-    ga_delta = 1 / ga_rate
-    ga_queue = Queue()
-    ga_active = False
-    ga_thread = None
-    ga_key_label = ''
-    ga_status = ''
-    current_scale = ScaleData("CMajor")
-    previous_scale = None
-    generator = GeneticSolarSystemGenerator(number_of_planets=len(planets))
-
-    #Initialize Markov model for melody
-    markov_model = get_markov_model()
-    melody_state = markov_model._generate_starting_state() 
-    last_melody_time = time.time()
-    note_duration = 0
-    last_melody_pitch = 72 + current_scale.root
-    
-    #Input State
-    is_dragging = False
-    drag_start = (0,0)
-    running = True
-
-    while running:
-        current_time = time.time()
-        ga_timer += dt
-        
-        #1. Event Handling
-        for event in pygame.event.get():
-            if event.type == pygame.QUIT:
-                running = False
-
-            elif event.type == pygame.MOUSEBUTTONDOWN:
-                is_dragging = True
-                drag_start = pygame.mouse.get_pos()
-                sat.freeze()
-
-            elif event.type == pygame.MOUSEBUTTONUP:
-                is_dragging = False
-                sat.frozen = False
-                drag_end = pygame.mouse.get_pos()
-                launch_vector = (np.array(drag_start) - np.array(drag_end)) * 0.1
-                sat.acc = np.zeros(2)
-                sat.vel = launch_vector
-
-            elif event.type == pygame.KEYDOWN:
-                keys = pygame.key.get_pressed()
-                ## Change key based on letter pressed
-                if event.unicode in ['a','b', 'c', 'd', 'e', 'f', 'g']:
-                    previous_scale = current_scale.name
-                    root = event.unicode.upper()
-                    flavour = 'Major'
-                    
-                    # Modifiers: Sharp/Flat (Up/Down), Minor (Left) 
-                    if keys[pygame.K_UP]:
-                        root = int_to_note[(note_to_int[root]+1)%12]
-                    if keys[pygame.K_DOWN]:
-                        root = int_to_note[(note_to_int[root]-1)%12]
-                    if keys[pygame.K_LEFT]:
-                        flavour = 'Minor'
-
-                    new_scale = root + flavour
-                    ga_key_label = f"{previous_scale}->{new_scale}"
-                    current_scale = ScaleData(new_scale)
-                    ga_active = True
-
-                ## Direction keys for manual control
-                if keys[pygame.K_LEFT]:
-                    sat.apply_force(np.array([-0.5, 0]))
-                    sat.show_booster = True
-                if keys[pygame.K_RIGHT]:
-                    sat.apply_force(np.array([0.5, 0]))
-                    sat.show_booster = True
-                if keys[pygame.K_UP]:
-                    sat.apply_force(np.array([0, -0.5]))
-                    sat.show_booster = True
-                if keys[pygame.K_DOWN]:
-                    sat.apply_force(np.array([0, 0.5]))
-                    sat.show_booster = True
-
-
-        ### Held keys check
-        keys = pygame.key.get_pressed()
-        ## Direction keys for manual control
-        sat.show_booster = False
-
-        rocket_angle = np.arctan2(sat.vel[1], sat.vel[0]) if np.linalg.norm(sat.vel) > 0 else 0
-        if keys[pygame.K_SPACE]:
-            if keys[pygame.K_LEFT]:
-                rocket_angle -= np.radians(90)
-                sat.thrust_angle = -np.radians(30)
-            elif keys[pygame.K_RIGHT]:
-                rocket_angle += np.radians(90)
-                sat.thrust_angle = np.radians(30)
-            else:
-                sat.thrust_angle = 0.0
-
-            # Project into worldspace
-            force_direction = np.array([np.cos(rocket_angle), np.sin(rocket_angle)])
-            sat.apply_force(force_direction * 0.5)
-            sat.show_booster = True
-
-        # Reverse thrust with down key
-        if keys[pygame.K_DOWN]:
-            rocket_angle += np.radians(180)
-            sat.thrust_angle = 0.0
-            force_direction = np.array([np.cos(rocket_angle), np.sin(rocket_angle)])
+    # Every note and control input can be logged for replay.py, on the same timebase
+    session_log = SessionLog() if Config.SESSION_LOG else None
 
-            sat.apply_force(force_direction * 0.3)
-            sat.show_booster = True
-            
+    # Note events are sent from the MIDI scheduler's thread, timed by simulated time
+    midi = MIDIHandler(Config.MIDI_PORT_NAME, clock=simulation.clock, log=session_log)
+    report.mark("MIDI output")
 
+    current_scale = get_scale("CMajor")
+    generator = GeneticSolarSystemGenerator(number_of_planets=len(planets))
+    report.mark("GA population")
 
-        #2. Genetic Algorithm Management
-        if ga_active and ga_timer >= ga_delta:
-            ga_thread = threading.Thread(
-                target=run_ga_thread,
-                args=(generator, current_scale,ga_queue),
-                daemon=True
-            )
-            ga_thread.start()
-            ga_active = True
-            ga_timer = 0
-
-        #Process GA results
-        if ga_active and not ga_queue.empty():
-            ga_result = ga_queue.get()
-
-            for i, gene in enumerate(ga_result["chromosome"].planet_genes):
-                planets[i].chord = gene.chord
-
-            if generator.current_scale_steps >= generator.max_gens:
-                ga_status = "Didn't resolve"
-                ga_active = False
-            elif ga_result['resolved']:
-                ga_status = 'Resolved'
-                ga_active = False
-            else:
-                ga_status = f"{ga_result['steps']} steps"
-       
-        #3. Physics updates
-        for p in planets:
-            p.update(dt)
-
-        force = calculate_gravity(sat, planets)
-        sat.apply_force(force)
-        sat.update()
-
-        #4. Music Logic (Harmonic Context & MIDI Arpeggio)
-        dominant_planet = get_dominant_planet(sat, planets)
-        chord_notes = sorted([interval + dominant_planet.chord.root + (Config.BASE_OCTAVE * 12) for interval in dominant_planet.chord.intervals])
-        source_planet = dominant_planet
-
-        # Arpeggio rate based on satellite speed and global tempo
-        speed = np.linalg.norm(sat.vel)
-        # Seconds per quarter note (beat)
-        beat_duration = 60.0 / float(tempo_bpm)
-
-        # Map speed -> subdivision multiplier (1..max_subdivisions)
-        max_subdivisions = 8.0
-        subdivision_factor = 1.0 + (speed / Config.MAX_SPEED) * (max_subdivisions - 1.0)
-
-        # Arpeggio interval is a subdivision of the beat (tempo synced)
-        arp_interval = max(0.02, beat_duration / subdivision_factor)
-        
-        #Trigger Arpeggio (Channel 0) 
-        if not sat.frozen and len(chord_notes) > 0 and (current_time - last_arp_time) > arp_interval:
-            note = chord_notes[arp_index % len(chord_notes)]
-            velocity = min(127, int(20 + speed * 2)) 
-    
-            midi.send_note(note, velocity, duration=arp_interval * 0.8, current_time=current_time, channel=0)
-            current_note = note
-            arp_index += 1
-            last_arp_time = current_time
-        
-        # Clear current note if enough time has passed since last note
-        if current_time - last_arp_time > arp_interval:
-            current_note = None
-
-        #5. Markov Melody Logic (Channel 1)
-        if not sat.frozen and len(chord_notes) > 0:
-            # Check if the previous note's time is up
-           if (current_time - last_melody_time) >= note_duration: #rhythm timer/ waits until the time of the previous note is over
-
-               # Prepare data for Markov state generation
-               root_midi = 60 + dominant_planet.chord.root #rooth of the current chord
-               chord_intervals = dominant_planet.chord.intervals #intervals of the chords
-               scale_intervals = current_scale.intervals #current scale information
-
-               melody_state = markov_model._generate_next_state(melody_state,
-                    last_melody_pitch,    
-                    root_midi,
-                    scale_intervals,
-                    chord_intervals)
-            
-               interval, duration = melody_state
-               melody_midi = last_melody_pitch + interval 
-            
-               # Keep melody in playable range
-               while melody_midi < 60:
-                    melody_midi += 12
-               while melody_midi > 96:
-                    melody_midi -= 12
-
-               #Timing and Velocity
-               note_duration = duration * (arp_interval * 2.0)
-               velocity = min(127, int(20 + speed * 2)) 
-
-               midi.send_note(melody_midi, velocity, duration=note_duration,
-                   current_time=current_time, channel=1)
-               last_melody_pitch = melody_midi #keep current pitch for the next step generation
-               last_melody_time = current_time
-
-        
-        # Update MIDI (note-off handling)
-        midi.update(current_time)
-        
-        # Rendering
-        renderer.draw_world(sat, planets)
-        renderer.draw_hud(sat, planets, current_note, source_planet, speed, ga_key_label, ga_status)
-
-        if is_dragging:
-            current_mouse = pygame.mouse.get_pos()
-            potential_vel = (np.array(drag_start) - np.array(current_mouse)) * 0.1
-            path = predict_path(sat.pos, potential_vel, planets, dt=dt)
-            renderer.draw_trajectory(path)
-
-        pygame.display.flip()
-        clock.tick(Config.FPS)
+    # A restored GA picks up its last scale, and the planets its queen's chords
+    checkpoint = GACheckpoint() if args.ga_checkpoint else None
+    if checkpoint is not None and checkpoint.load(generator):
+        current_scale = generator.previous_scale or current_scale
+        simulation.set_chords([gene.chord for gene in generator.population[0].planet_genes])
+        print(f"Resumed the GA from {checkpoint.path}, in {current_scale.name}")
+        report.mark("GA checkpoint")
 
+    #Initialize Markov model for melody
+    markov_model = get_markov_model()
+    report.mark("Markov model")
+    melody_engine = None
+    if args.neural_melody:
+        from ai.neural_melody import load_neural_melody_engine
+        melody_engine = load_neural_melody_engine(markov_model)
+        report.mark("Neural melody")
+
+    # Arpeggio and melody are scheduled ahead on a musical clock sharing the MIDI timebase
+    musical_clock = MusicalClock(simulation.clock, tempo_bpm)
+    sequencer = Sequencer(midi, markov_model, musical_clock, start_pitch=72 + current_scale.root,
+                          melody_engine=melody_engine)
+    if Config.MIDI_CLOCK:
+        midi.start_transport(musical_clock)
+
+    # Input, physics, music, GA and rendering run as separate tasks at their own rates
+    engine = Engine(screen, renderer, simulation, midi, sequencer, swarm_arp, generator,
+                    field=field, session_log=session_log, start_scale=current_scale.name,
+                    checkpoint=checkpoint)
+    report.mark("Engine")
+
+    telemetry = None
+    if args.memory_telemetry:
+        from telemetry import MemoryTelemetry
+        telemetry = MemoryTelemetry()
+        telemetry.watch("Active notes", lambda: len(midi.active_notes))
+        telemetry.watch("Scheduled events", lambda: midi.scheduler.queued)
+        telemetry.watch("GA population", lambda: len(generator.population))
+        telemetry.watch("Satellite trail", lambda: len(simulation.sat.history))
+        if session_log is not None:
+            telemetry.watch("Session log records", lambda: session_log.count)
+        telemetry.start()
+    if report.enabled:
+        threading.Thread(target=report_when_ready, args=(engine, report), daemon=True).start()
+    asyncio.run(engine.run())
+
+    if telemetry is not None:
+        telemetry.stop()
+    if checkpoint is not None:
+        checkpoint.close(generator)
+    if melody_engine is not None:
+        melody_engine.stop()
     midi.panic()
+    if midi.timing is not None:
+        midi.timing.write(Config.MIDI_TIMING_LOG)
+    if session_log is not None:
+        session_log.close()
+    if engine.profiler.frames:
+        engine.profiler.write_trace(Config.PROFILE_TRACE, list(engine.timers.values()))
+    if engine.field is not None:
+        print(f"Influence field: {engine.field.hud_text()}, {engine.field.layer_updates} layer updates")
     pygame.quit()
 
 
 if __name__ == "__main__":
-    main()
\ No newline at end of file
+    main()
@@ -1,5 +1,8 @@
 import numpy as np
-from typing import List, Tuple
+from typing import Dict, List, Tuple
+
+import kernels
+from music.harmony import MASK_BITS
 
 
 class MarkovChainMelodyGenerator:
@@ -8,6 +11,13 @@ class MarkovChainMelodyGenerator:
     with real-time harmonic biasing for chords and scales.
     """
 
+    # Weight of each next pitch class relative to the chord root:
+    # chord tone bias, scale tone bias, out-of-key penalty
+    CHORD_TONE_WEIGHT = 15.0
+    SCALE_TONE_WEIGHT = 2.0
+    OUT_OF_KEY_WEIGHT = 0.05
+    EPSILON = 0.001  # Prevents absolute zero
+
     def __init__(self, states: List[Tuple[int, float]]):
         """
         Initializes the MarkovChain with the given states.
@@ -19,6 +29,31 @@ class MarkovChainMelodyGenerator:
         self.initial_probabilities = np.zeros(len(states))
         self.transition_matrix = np.zeros((len(states), len(states)))
         self._state_indexes = {state: i for (i, state) in enumerate(states)}
+        # Each state's pitch class relative to the chord root, for every offset
+        # of the current pitch from the root: [offset, state]
+        intervals = np.array([interval for interval, _ in states], dtype=np.int64)
+        self._state_rel = (np.arange(12)[:, None] + intervals) % 12
+
+    @classmethod
+    def from_arrays(cls, arrays: Dict[str, np.ndarray]) -> "MarkovChainMelodyGenerator":
+        """
+        Rebuilds a trained model from the arrays returned by to_arrays().
+        """
+        states = [(int(interval), float(duration))
+                  for interval, duration in zip(arrays["intervals"], arrays["durations"])]
+        model = cls(states)
+        model.initial_probabilities = arrays["initial_probabilities"]
+        model.transition_matrix = arrays["transition_matrix"]
+        return model
+
+    def to_arrays(self) -> Dict[str, np.ndarray]:
+        """
+        The trained model as arrays, e.g. for the startup cache.
+        """
+        return {"intervals": np.array([interval for interval, _ in self.states], dtype=np.int64),
+                "durations": np.array([duration for _, duration in self.states], dtype=np.float64),
+                "initial_probabilities": self.initial_probabilities,
+                "transition_matrix": self.transition_matrix}
 
     def train(self, notes: List[Tuple[int, float]]) -> None:
         """
@@ -104,15 +139,15 @@ class MarkovChainMelodyGenerator:
             states. 
         """
         initial_index = np.random.choice(
-            list(self._state_indexes.values()),
+            len(self.states),
             p=self.initial_probabilities
         )
         return self.states[initial_index]
     
     def _apply_chord_bias(self, probs: np.ndarray, current_pitch : int,
         root_midi: int,
-        scale_intervals: List[int],
-        chord_intervals: List[int]) -> np.ndarray:
+        scale_mask: int,
+        chord_mask: int) -> np.ndarray:
         """
         Applies harmonic weights to transition probabilities based on the current 
         musical context (chord and scale).
@@ -122,31 +157,29 @@ class MarkovChainMelodyGenerator:
             current state.
             current_pitch (int): The absolute MIDI pitch of the last played note.
             root_midi (int): The absolute MIDI pitch of the current chord's root.
-            scale_intervals (list): Semitone offsets from the root representing the current scale.
-            chord_intervals (list): Semitone offsets from the root representing the current chord.
+            scale_mask (int): Pitch-class bitmask of the scale's intervals from its root
+            (ScaleData.interval_mask).
+            chord_mask (int): Pitch-class bitmask of the chord's intervals from its root
+            (ChordData.interval_mask).
 
         Returns:
             np.array: A new 1D array of normalized probabilities adjusted for harmonic correctness.
         
         """
-        weighted = probs.copy()
-        weighted += 0.001  #epsilon to prevent absolute zero
+        relative = self._state_rel[(current_pitch - root_midi) % 12]
+        if kernels.jit is not None:
+            return kernels.jit.chord_bias(probs, relative, MASK_BITS[chord_mask], MASK_BITS[scale_mask],
+                                          self.EPSILON, self.CHORD_TONE_WEIGHT,
+                                          self.SCALE_TONE_WEIGHT, self.OUT_OF_KEY_WEIGHT)
 
-        root_pc = root_midi % 12
-
-        for i, (interval, _) in enumerate(self.states):
+        weighted = probs.copy()
+        weighted += self.EPSILON
 
-            predicted_pitch = current_pitch + interval
-            note_pc = predicted_pitch % 12
-            rel = (note_pc - root_pc) % 12
+        weights = np.where(MASK_BITS[chord_mask], self.CHORD_TONE_WEIGHT,
+                           np.where(MASK_BITS[scale_mask], self.SCALE_TONE_WEIGHT, self.OUT_OF_KEY_WEIGHT))
 
-            # Apply weights
-            if rel in chord_intervals:
-               weighted[i] *= 15.0  # Chord tone bias
-            elif rel in scale_intervals: 
-               weighted[i] *= 2.0  # Scale tone bias
-            else:
-                weighted[i] *= 0.05 #Out-of-key penalty
+        # Apply weights
+        weighted *= weights[relative]
 
         # Renormalize
         total = np.sum(weighted)
@@ -160,8 +193,8 @@ class MarkovChainMelodyGenerator:
         current_state: Tuple[int, float], 
         current_pitch: int, 
         root_midi: int, 
-        scale_intervals: List[int], 
-        chord_intervals: List[int]
+        scale_mask: int, 
+        chord_mask: int
         ) -> Tuple[int, float]:
         """
         Generate the next state based on the transition matrix and the current state.
@@ -170,8 +203,8 @@ class MarkovChainMelodyGenerator:
             current_state (tuple): The current state in the Markov Chain.
             current_pitch (int): The absolute MIDI pitch of the last played note.
             root_midi (int): The absolute MIDI pitch of the current chord's root.
-            scale_intervals (list): Semitone offsets representing the current scale.
-            chord_intervals (list): Semitone offsets representing the current chord.
+            scale_mask (int): Pitch-class bitmask of the current scale's intervals.
+            chord_mask (int): Pitch-class bitmask of the current chord's intervals.
 
         Returns:
             tuple: The next generated state (interval, duration).
@@ -182,9 +215,9 @@ class MarkovChainMelodyGenerator:
             self._state_indexes[current_state]].copy()
 
             weighted_probs = self._apply_chord_bias(
-            base_probs, current_pitch, root_midi,scale_intervals, chord_intervals) #apply weights based on chord and scale information
+            base_probs, current_pitch, root_midi, scale_mask, chord_mask) #apply weights based on chord and scale information
             index = np.random.choice(
-                list(self._state_indexes.values()),
+                len(self.states),
                 p= weighted_probs,
             )
             return self.states[index]
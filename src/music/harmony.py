@@ -1,4 +1,10 @@
-from typing import Dict, Tuple
+from itertools import combinations
+from typing import Dict, List, Sequence, Tuple
+
+import numpy as np
+
+from cache import cache_key, cached_arrays
+from config import Config
 
 # Constants and Mappings
 CHORD_TYPES = [
@@ -13,59 +19,320 @@ CHORD_TYPES = [
 ]
 
 SCALE_TYPES = {"Major": [0, 2, 4, 5, 7, 9, 11],
-               "Minor": [0, 2, 3, 5, 7, 8, 10]}
+               "Minor": [0, 2, 3, 5, 7, 8, 10],
+               # Modes of the major scale (Ionian and Aeolian are Major and Minor)
+               "Dorian":     [0, 2, 3, 5, 7, 9, 10],
+               "Phrygian":   [0, 1, 3, 5, 7, 8, 10],
+               "Lydian":     [0, 2, 4, 6, 7, 9, 11],
+               "Mixolydian": [0, 2, 4, 5, 7, 9, 10],
+               "Locrian":    [0, 1, 3, 5, 6, 8, 10],
+               "HarmonicMinor": [0, 2, 3, 5, 7, 8, 11],
+               "MelodicMinor":  [0, 2, 3, 5, 7, 9, 11],
+               "MajorPentatonic": [0, 2, 4, 7, 9],
+               "MinorPentatonic": [0, 3, 5, 7, 10],
+               "Blues":     [0, 3, 5, 6, 7, 10],
+               "WholeTone": [0, 2, 4, 6, 8, 10]}
 
 note_to_int={'C': 0, 'C#': 1, 'D': 2, 'D#': 3, 'E': 4, 'F': 5, 'F#': 6, 
              'G': 7, 'G#': 8, 'A': 9, 'A#': 10, 'B': 11}
 int_to_note={0: 'C', 1: 'C#', 2: 'D', 3: 'D#', 4: 'E', 5: 'F', 6: 'F#',
              7: 'G', 8: 'G#', 9: 'A', 10: 'A#', 11: 'B'}
 
+# Chord quality by flavour, e.g. for colouring planets; each is one of QUALITIES
+QUALITIES = ("major", "minor", "diminished", "other")
+CHORD_QUALITIES = {"maj": "major", "maj7": "major", "7": "major", "maj9": "major", "maj7#11": "major",
+                   "min": "minor", "minmaj7": "minor", "min7": "minor", "min7add4": "minor",
+                   "dim": "diminished", "dim7": "diminished"}
+
+# Generated chord vocabulary: a triad, an optional 6th or 7th, and up to two tensions
+TRIADS = {"maj": ((4, 7), "major"), "min": ((3, 7), "minor"), "dim": ((3, 6), "diminished"),
+          "aug": ((4, 8), "other"), "sus2": ((2, 7), "other"), "sus4": ((5, 7), "other")}
+SEVENTHS = (None, 9, 10, 11)
+SEVENTH_NAMES = {"maj":  ("maj", "6", "7", "maj7"),
+                 "min":  ("min", "min6", "min7", "minmaj7"),
+                 "dim":  ("dim", "dim7", "min7b5", "dimmaj7"),
+                 "aug":  ("aug", "aug6", "aug7", "augmaj7"),
+                 "sus2": ("sus2", "6sus2", "7sus2", "maj7sus2"),
+                 "sus4": ("sus4", "6sus4", "7sus4", "maj7sus4")}
+TENSIONS = {"b9": 1, "9": 2, "#9": 3, "11": 5, "#11": 6, "b13": 8, "13": 9}
+MAX_TENSIONS = 2
+
+OCTAVES = 11  # MIDI octaves -1..9; each chord caches a voicing per octave
+
+# Number of set bits of every 12-bit pitch-class mask
+POPCOUNT = bytes(bin(mask).count("1") for mask in range(1 << 12))
+POPCOUNT_ARRAY = np.frombuffer(POPCOUNT, dtype=np.uint8)
+# The 12 membership flags of every pitch-class mask, indexed [mask, pitch class]
+MASK_BITS = ((np.arange(1 << 12)[:, None] >> np.arange(12)) & 1).astype(bool)
+# Semitones from each pitch class to the nearest one in every mask, either way round
+# the circle, indexed [mask, pitch class]
+_STEPS = (np.arange(12)[:, None] - np.arange(12)) % 12
+_CIRCLE = np.minimum(_STEPS, 12 - _STEPS)
+NEAREST = np.where(MASK_BITS[:, None, :], _CIRCLE, 6).min(axis=2)
+
+
+def pitch_class_mask(pitch_classes) -> int:
+    """12-bit mask with bit n set for each pitch class n."""
+    mask = 0
+    for pc in pitch_classes:
+        mask |= 1 << (pc % 12)
+    return mask
+
+
+def generated_chord_types() -> List[Tuple[str, Tuple[int, ...], str]]:
+    """
+    (flavour, intervals, quality) for the generated vocabulary, skipping any
+    interval set that CHORD_TYPES already has. Intervals are ordered root,
+    3rd (or suspension), 5th, then the 6th/7th and tensions, so everything
+    after the triad counts as an extension.
+    """
+    seen = {pitch_class_mask(list(chord_type.values())[0]) for chord_type in CHORD_TYPES}
+    types = []
+    for triad, (triad_intervals, quality) in TRIADS.items():
+        for seventh, base in zip(SEVENTHS, SEVENTH_NAMES[triad]):
+            chord = (0,) + triad_intervals + (() if seventh is None else (seventh,))
+            free = [name for name, pc in TENSIONS.items() if pc not in chord]
+            for count in range(MAX_TENSIONS + 1):
+                for tensions in combinations(free, count):
+                    intervals = chord + tuple(TENSIONS[name] for name in tensions)
+                    mask = pitch_class_mask(intervals)
+                    if mask in seen:
+                        continue
+                    seen.add(mask)
+                    flavour = base + (f"({','.join(tensions)})" if tensions else "")
+                    types.append((flavour, intervals, quality))
+    return types
+
 
 # Classes initialization
 class ChordData:
     """
     Represents a musical chord with a root and interval structure.
+
+    Chords are immutable and interned: every (root, type) pair exists exactly
+    once, in CHORDS, so get them with get_chord() rather than constructing them.
+    Everything derived from the chord is computed only once.
     """
-    def __init__(self, root: int, chord_type: Dict[str, Tuple[int, ...]]) -> None:
-        """
-        Initializes the ChordData object.
+    __slots__ = ("id", "type_id", "root", "flavour", "intervals", "name", "quality",
+                 "interval_mask", "mask", "triad_mask", "extension_mask", "extensions", "voicings")
 
+    def __init__(self, root: int, type_id: int) -> None:
+        """
         Args:
             root (int): The MIDI root note (0-11) representing the chord base.
-            chord_type (dict): A single-entry dictionary from CHORD_TYPES containing 
-                               the name and interval tuple.
-        
-        Returns:
-            None
-        """  
-        self.root = root
-        self.intervals = list(list(chord_type.values())[0])
-        self.flavour = list(chord_type.keys())[0]
-        self.name = int_to_note[self.root] + self.flavour
-
-    def update_name(self) -> None:
+            type_id (int): Index of the chord type in CHORD_TYPES.
         """
-        Updates the name string based on the current root and flavour.
-        Used if the root is modified through mutation.
-        """
-        self.name = int_to_note[self.root] + self.flavour
+        intervals = tuple(CHORD_TYPES[type_id][CHORD_FLAVOURS[type_id]])
+        notes = [(interval + root) % 12 for interval in intervals]
+        set_ = object.__setattr__
+        set_(self, "id", type_id * 12 + root)
+        set_(self, "type_id", type_id)
+        set_(self, "root", root)
+        set_(self, "flavour", CHORD_FLAVOURS[type_id])
+        set_(self, "intervals", intervals)
+        set_(self, "name", int_to_note[root] + self.flavour)
+        set_(self, "quality", CHORD_QUALITIES.get(self.flavour, "other"))
+        # Pitch classes relative to the root, and absolute
+        set_(self, "interval_mask", pitch_class_mask(intervals))
+        set_(self, "mask", pitch_class_mask(notes))
+        # The 3rd and 5th, and everything above them
+        set_(self, "triad_mask", pitch_class_mask(notes[1:3]))
+        set_(self, "extension_mask", pitch_class_mask(notes[3:]))
+        set_(self, "extensions", len(notes[3:]))
+        # Sorted MIDI notes of the chord from its root, per octave; filled in on first use
+        set_(self, "voicings", [None] * OCTAVES)
+
+    def __setattr__(self, name, value):
+        raise AttributeError("ChordData is immutable")
+
+    def __repr__(self) -> str:
+        return f"ChordData({self.name})"
+
+    def voicing(self, octave: int = Config.BASE_OCTAVE) -> Tuple[int, ...]:
+        """The chord's notes, sorted, starting from its root in the given octave."""
+        voicing = self.voicings[octave]
+        if voicing is None:
+            voicing = self.voicings[octave] = tuple(sorted(interval + self.root + octave * 12
+                                                           for interval in self.intervals))
+        return voicing
 
 
 class ScaleData:
     """
-    Holds the name, root and interval pattern of a scale. 
+    Holds the name, root and interval pattern of a scale.
+
+    Like chords, scales are immutable and interned; get them with get_scale().
+    """
+    __slots__ = ("id", "type_id", "root", "flavour", "intervals", "name", "interval_mask", "mask")
+
+    def __init__(self, root: int, type_id: int) -> None:
+        set_ = object.__setattr__
+        set_(self, "id", type_id * 12 + root)
+        set_(self, "type_id", type_id)
+        set_(self, "root", root)
+        set_(self, "flavour", SCALE_FLAVOURS[type_id])
+        set_(self, "intervals", tuple(SCALE_TYPES[self.flavour]))
+        set_(self, "name", int_to_note[root] + self.flavour)
+        set_(self, "interval_mask", pitch_class_mask(self.intervals))
+        set_(self, "mask", pitch_class_mask(interval + root for interval in self.intervals))
+
+    def __setattr__(self, name, value):
+        raise AttributeError("ScaleData is immutable")
+
+    def __repr__(self) -> str:
+        return f"ScaleData({self.name})"
+
+
+# Registries, indexed by id (type_id * 12 + root). They only ever grow, so ids stay valid.
+CHORD_FLAVOURS: List[str] = []
+SCALE_FLAVOURS: List[str] = []
+CHORDS: List[ChordData] = []
+SCALES: List[ScaleData] = []
+_SCALES_BY_NAME: Dict[str, ScaleData] = {}
+_chord_arrays = None
+_voice_leading = None
+
+
+def register_chord_type(flavour: str, intervals: Sequence[int], quality: str = "other") -> int:
+    """
+    Adds a chord type and its 12 chords to the registry, returning its type_id.
+
+    Args:
+        flavour (str): Name of the chord type, e.g. 'min9'.
+        intervals (sequence): Semitones from the root: root, 3rd, 5th, then any extensions.
+        quality (str): 'major', 'minor', 'diminished' or 'other', as in QUALITIES.
+    """
+    global _chord_arrays
+    if flavour in CHORD_FLAVOURS:
+        raise ValueError(f"Chord type '{flavour}' already exists")
+    if quality not in QUALITIES:
+        raise ValueError(f"Unknown chord quality '{quality}', expected one of {', '.join(QUALITIES)}")
+    type_id = len(CHORD_FLAVOURS)
+    if type_id == len(CHORD_TYPES):
+        CHORD_TYPES.append({flavour: tuple(intervals)})
+    CHORD_FLAVOURS.append(flavour)
+    CHORD_QUALITIES.setdefault(flavour, quality)
+    CHORDS.extend(ChordData(root, type_id) for root in range(12))
+    _chord_arrays = None
+    return type_id
+
+
+def register_scale_type(flavour: str, intervals: Sequence[int]) -> int:
+    """
+    Adds a scale type and its 12 scales to the registry, returning its type_id.
+
+    Args:
+        flavour (str): Name of the scale type, e.g. 'Dorian'. Scale names are root + flavour.
+        intervals (sequence): Semitones from the root.
+    """
+    if flavour in SCALE_FLAVOURS:
+        raise ValueError(f"Scale type '{flavour}' already exists")
+    type_id = len(SCALE_FLAVOURS)
+    SCALE_TYPES.setdefault(flavour, list(intervals))
+    SCALE_FLAVOURS.append(flavour)
+    for root in range(12):
+        scale = ScaleData(root, type_id)
+        SCALES.append(scale)
+        _SCALES_BY_NAME[scale.name] = scale
+    return type_id
+
+
+def get_chord(root: int, chord_type) -> ChordData:
+    """
+    Returns the interned chord.
+
+    Args:
+        root (int): The root pitch class (0-11).
+        chord_type: Index into CHORD_TYPES, a flavour name, or an entry of CHORD_TYPES.
+    """
+    if isinstance(chord_type, dict):
+        chord_type = list(chord_type)[0]
+    if isinstance(chord_type, str):
+        chord_type = CHORD_FLAVOURS.index(chord_type)
+    return CHORDS[chord_type * 12 + root % 12]
+
+
+def get_scale(name: str) -> ScaleData:
+    """Returns the interned scale for a name such as 'CMajor' or 'F#Dorian'."""
+    scale = _SCALES_BY_NAME.get(name)
+    if scale is None:
+        raise ValueError(f"Unknown scale '{name}'")
+    return scale
+
+
+def minor_flavour(flavour: str) -> str:
+    """
+    The minor version of a scale type: its Minor-named counterpart if there is
+    one (MajorPentatonic -> MinorPentatonic), the type itself if it already has
+    a minor 3rd (Dorian, Blues), else Minor.
+    """
+    counterpart = flavour.replace("Major", "Minor")
+    if counterpart != flavour and counterpart in SCALE_TYPES:
+        return counterpart
+    intervals = SCALE_TYPES[flavour]
+    if 3 in intervals and 4 not in intervals:
+        return flavour
+    return "Minor"
+
+
+def chord_arrays() -> Tuple[np.ndarray, np.ndarray, np.ndarray, np.ndarray]:
+    """
+    Roots, triad masks, extension masks and extension counts of every chord,
+    as arrays indexed by chord id, for scoring the whole vocabulary at once.
+    """
+    global _chord_arrays
+    if _chord_arrays is None:
+        _chord_arrays = tuple(np.array([getattr(chord, field) for chord in CHORDS], dtype=np.int64)
+                              for field in ("root", "triad_mask", "extension_mask", "extensions"))
+    return _chord_arrays
+
+
+def _build_voice_leading() -> np.ndarray:
+    """Computes voice_leading_table() from the chord masks."""
+    types = len(CHORD_FLAVOURS)
+    masks = np.array([CHORDS[type_id * 12].interval_mask for type_id in range(types)])
+    # Every type transposed by every interval: [type_b, interval]
+    shifts = np.arange(12)
+    rotated = ((masks[:, None] << shifts) | (masks[:, None] >> (12 - shifts))) & 0xFFF
+    sizes = POPCOUNT_ARRAY[masks].astype(np.float32)
+    common = POPCOUNT_ARRAY[masks[:, None, None] & rotated[None]]
+    # Motion of b's voices to a, and of a's voices to b, summed over voices
+    to_a = NEAREST[masks].astype(np.float32) @ MASK_BITS[rotated].reshape(-1, 12).T.astype(np.float32)
+    to_b = (NEAREST[rotated].reshape(-1, 12).astype(np.float32) @ MASK_BITS[masks].T.astype(np.float32)).T
+    motion = (to_a + to_b).reshape(types, types, 12) / (sizes[:, None, None] + sizes[None, :, None])
+    smaller = np.minimum(sizes[:, None], sizes[None, :])[:, :, None]
+    return (0.5 * common / smaller + 0.5 / (1.0 + motion)).astype(np.float32)
+
+
+def voice_leading_table() -> np.ndarray:
+    """
+    Voice-leading score of every pair of chord types at every root interval,
+    indexed [type_a, type_b, (root_b - root_a) % 12], in [0, 1].
+
+    The score is half the share of common tones (of the smaller chord) and
+    half 1 / (1 + mean motion), where the motion of each voice is the distance
+    in semitones to the nearest pitch class of the other chord, counted in
+    both directions. Identical chords score 1.
     """
-    def __init__(self, name: str) -> None:
-        self.name = name
-        
-        #Seperate the input into root and chord type
-        mode_pos = 1
-        for i, c in enumerate(self.name):
-            if not c.isalnum():
-                mode_pos = i+1
+    global _voice_leading
+    if _voice_leading is None or len(_voice_leading) != len(CHORD_FLAVOURS):
+        # Bump the version when the scoring changes, so cached tables are rebuilt
+        key = cache_key("voice-leading-1", [chord.intervals for chord in CHORDS[::12]])
+        _voice_leading = cached_arrays("voice_leading", key, lambda: {"table": _build_voice_leading()})["table"]
+    return _voice_leading
 
-        self.root = note_to_int[self.name[:mode_pos]]
-        self.intervals = SCALE_TYPES[self.name[mode_pos:]]
 
+def chord_names() -> List[str]:
+    """Every chord's name, by id."""
+    return [chord.name for chord in CHORDS]
 
 
+for _chord_type in list(CHORD_TYPES):
+    _flavour = list(_chord_type)[0]
+    register_chord_type(_flavour, _chord_type[_flavour], CHORD_QUALITIES.get(_flavour, "other"))
+for _flavour, _intervals, _quality in generated_chord_types():
+    register_chord_type(_flavour, _intervals, _quality)
+for _flavour in list(SCALE_TYPES):
+    register_scale_type(_flavour, SCALE_TYPES[_flavour])
+for _flavour, _intervals in Config.USER_SCALES:
+    register_scale_type(_flavour, _intervals)
@@ -0,0 +1,187 @@
+"""
+MIDI output backends.
+
+Every backend takes batches of raw, pre-encoded MIDI messages (3-byte `bytes`).
+RtMidiBackend hands them straight to python-rtmidi, with no per-message objects;
+MidoBackend is the fallback through any mido port; NullBackend discards them and
+LoopbackBackend keeps them in memory, for measuring timing without a MIDI device.
+"""
+import time
+from collections import deque
+from functools import lru_cache
+from typing import Callable, List, Tuple
+
+import mido
+
+NOTE_OFF_STATUS = 0x80
+NOTE_ON_STATUS = 0x90
+CONTROL_CHANGE_STATUS = 0xB0
+
+# Note-offs are always sent with velocity 0, so every one of them can be encoded up front
+NOTE_OFF_MESSAGES = [[bytes((NOTE_OFF_STATUS | channel, note, 0)) for note in range(128)]
+                     for channel in range(16)]
+
+# System real-time and common messages for MIDI clock and transport
+CLOCK_MESSAGE = bytes((0xF8,))
+START_MESSAGE = bytes((0xFA,))
+CONTINUE_MESSAGE = bytes((0xFB,))
+STOP_MESSAGE = bytes((0xFC,))
+
+# Channel mode messages for panic: all notes off (123) and reset all controllers (121)
+RESET_MESSAGES = [bytes((CONTROL_CHANGE_STATUS | channel, controller, 0))
+                  for channel in range(16) for controller in (123, 121)]
+
+_note_on_cache = {}
+
+
+def encode_note_on(channel: int, note: int, velocity: int) -> bytes:
+    """Returns the encoded note-on, reusing the same object for repeated messages."""
+    key = (channel << 14) | (note << 7) | velocity
+    message = _note_on_cache.get(key)
+    if message is None:
+        message = _note_on_cache[key] = bytes((NOTE_ON_STATUS | channel, note, velocity))
+    return message
+
+
+def encode_note_off(channel: int, note: int) -> bytes:
+    return NOTE_OFF_MESSAGES[channel][note]
+
+
+def encode_song_position(sixteenths: int) -> bytes:
+    """Song position pointer, in sixteenth notes since the start."""
+    sixteenths &= 0x3FFF
+    return bytes((0xF2, sixteenths & 0x7F, sixteenths >> 7))
+
+
+class NullBackend:
+    """Discards everything, counting messages. For running without a MIDI device."""
+
+    def __init__(self) -> None:
+        self.sent = 0
+
+    def send_batch(self, messages: List[bytes]) -> None:
+        self.sent += len(messages)
+
+    def reset(self) -> None:
+        pass
+
+    def close(self) -> None:
+        pass
+
+
+class LoopbackBackend:
+    """
+    In-process sink that stamps each message with its arrival time, as a port
+    on the receiving side would. Keeps the most recent `capacity` messages.
+    """
+
+    def __init__(self, clock: Callable[[], float] = time.perf_counter, capacity: int = 65536) -> None:
+        self.clock = clock
+        self.received: deque = deque(maxlen=capacity)  # (arrival time, message)
+
+    def send_batch(self, messages: List[bytes]) -> None:
+        now = self.clock()
+        self.received.extend((now, message) for message in messages)
+
+    def drain(self) -> List[Tuple[float, bytes]]:
+        """Returns and forgets everything received so far."""
+        received = list(self.received)
+        self.received.clear()
+        return received
+
+    def reset(self) -> None:
+        pass
+
+    def close(self) -> None:
+        pass
+
+
+class RtMidiBackend:
+    """Raw output through python-rtmidi, without mido.Message objects."""
+
+    def __init__(self, port_name: str, virtual: bool = True) -> None:
+        """
+        Args:
+            port_name (str): Name of the virtual port to create.
+            virtual (bool): Create a virtual port; otherwise open the first available one.
+        """
+        import rtmidi
+        self._out = rtmidi.MidiOut()
+        if virtual:
+            self._out.open_virtual_port(port_name)
+        elif self._out.get_port_count():
+            self._out.open_port(0)
+        else:
+            raise IOError("No MIDI output ports available")
+        self._send = self._out.send_message
+
+    def send_batch(self, messages: List[bytes]) -> None:
+        send = self._send
+        for message in messages:
+            send(message)
+
+    def reset(self) -> None:
+        self.send_batch(RESET_MESSAGES)
+
+    def close(self) -> None:
+        self._out.close_port()
+
+
+@lru_cache(maxsize=4096)
+def _to_mido(message: bytes) -> mido.Message:
+    return mido.Message.from_bytes(message)
+
+
+class MidoBackend:
+    """Fallback through a mido port. Decoded messages are cached, since they repeat a lot."""
+
+    def __init__(self, port) -> None:
+        self.port = port
+
+    def send_batch(self, messages: List[bytes]) -> None:
+        send = self.port.send
+        for message in messages:
+            send(_to_mido(message))
+
+    def reset(self) -> None:
+        self.port.reset()
+
+    def close(self) -> None:
+        self.port.close()
+
+
+def open_backend(port_name: str, backend: str = "rtmidi"):
+    """
+    Opens a MIDI output, trying the fast path first.
+
+    Args:
+        port_name (str): Name of the virtual port to create.
+        backend (str): "rtmidi" for raw python-rtmidi output, falling back to mido;
+            "mido" for mido only; "null" to discard output; "loopback" to keep it in memory.
+
+    Returns:
+        A backend, or None if no MIDI output is available.
+    """
+    if backend == "null":
+        return NullBackend()
+    if backend == "loopback":
+        return LoopbackBackend()
+    if backend == "rtmidi":
+        try:
+            out = RtMidiBackend(port_name)
+            print(f"MIDI Port '{port_name}' opened.")
+            return out
+        except Exception as e:
+            print(f"Could not open raw MIDI port: {e}. Falling back to mido.")
+
+    try:
+        out = MidoBackend(mido.open_output(port_name, virtual=True))
+        print(f"MIDI Port '{port_name}' opened.")
+        return out
+    except Exception as e:
+        print(f"Could not open MIDI port: {e}. Defaulting to first available.")
+    try:
+        return MidoBackend(mido.open_output())
+    except Exception:
+        print("No MIDI outputs available. Running without MIDI.")
+        return None
@@ -0,0 +1,85 @@
+from typing import Dict, List, Tuple
+
+import mido
+
+from config import Config
+from music.midi_backends import NOTE_ON_STATUS
+from music.scheduler import MIDIScheduler
+
+TRACK_NAMES = {0: "Arpeggio", 1: "Melody"}
+
+
+class MIDIFileWriter:
+    """
+    Drop-in replacement for MIDIHandler that records to a Standard MIDI File.
+
+    Notes go through the same MIDIScheduler as live output, so overlapping
+    notes are handled identically, but nothing runs on a thread: the caller
+    advances time with update(), typically from a simulated clock. MIDI clock
+    and transport messages are not recorded; the file has its own tempo.
+    """
+
+    def __init__(self, tempo_bpm: float = Config.DEFAULT_BPM, ticks_per_beat: int = 480, log=None) -> None:
+        self.tempo_bpm = tempo_bpm
+        self.ticks_per_beat = ticks_per_beat
+        self.events: List[Tuple[float, bytes]] = []  # (time, encoded message)
+        self._now = 0.0
+        self.clock = lambda: self._now
+        self.scheduler = MIDIScheduler(self._record, self.clock, log=log)
+
+    @property
+    def active_notes(self) -> dict:
+        return self.scheduler.sounding
+
+    def _record(self, messages: List[bytes]) -> None:
+        now = self._now
+        self.events.extend((now, message) for message in messages if message[0] < 0xF0)
+
+    def update(self, current_time: float) -> None:
+        """Records every event due by current_time, each at its exact timestamp."""
+        next_time = self.scheduler.next_time()
+        while next_time is not None and next_time <= current_time:
+            # Dispatch one timestamp at a time so each event is stamped with its own time
+            self._now = next_time
+            self.scheduler.dispatch_due(self._now)
+            next_time = self.scheduler.next_time()
+        self._now = current_time
+
+    def send_note(self, note: int, velocity: int, duration: float, current_time: float, channel: int) -> None:
+        """Schedules a note_on at current_time and its note_off after duration."""
+        self.scheduler.schedule_note(current_time, note, velocity, duration, channel)
+
+    def panic(self) -> None:
+        """Ends every sounding note at the current time."""
+        self.scheduler.clear()
+
+    def to_midi_file(self) -> mido.MidiFile:
+        """
+        Builds a type 1 MIDI file with a tempo track and one track per MIDI channel used.
+        """
+        midi_file = mido.MidiFile(type=1, ticks_per_beat=self.ticks_per_beat)
+        tempo_track = mido.MidiTrack()
+        tempo_track.append(mido.MetaMessage('set_tempo', tempo=mido.bpm2tempo(self.tempo_bpm), time=0))
+        midi_file.tracks.append(tempo_track)
+
+        by_channel: Dict[int, List[Tuple[float, bytes]]] = {}
+        for t, message in self.events:
+            by_channel.setdefault(message[0] & 0x0F, []).append((t, message))
+
+        ticks_per_second = self.ticks_per_beat * self.tempo_bpm / 60.0
+        for channel in sorted(by_channel):
+            track = mido.MidiTrack()
+            track.append(mido.MetaMessage('track_name', name=TRACK_NAMES.get(channel, f"Swarm {channel}"), time=0))
+            last_tick = 0
+            for t, message in by_channel[channel]:
+                tick = int(round(t * ticks_per_second))
+                msg_type = 'note_on' if message[0] & 0xF0 == NOTE_ON_STATUS else 'note_off'
+                track.append(mido.Message(msg_type, note=message[1], velocity=message[2], channel=channel,
+                                          time=max(0, tick - last_tick)))
+                last_tick = max(last_tick, tick)
+            midi_file.tracks.append(track)
+        return midi_file
+
+    def save(self, path: str) -> None:
+        """Writes the recording to a .mid file."""
+        self.to_midi_file().save(path)
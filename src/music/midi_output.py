@@ -1,49 +1,77 @@
-import mido
+import time
+from typing import Callable
+
+from config import Config
+from music.midi_backends import open_backend
+from music.midi_timing import TimingMonitor
+from music.scheduler import MIDIScheduler
 
 class MIDIHandler:
-    def __init__(self, port_name: str):
-        try:
-            self.out_port = mido.open_output(port_name, virtual=True)
-            print(f"MIDI Port '{port_name}' opened.")
-        except Exception as e:
-            print(f"Could not open MIDI port: {e}. Defaulting to first available.")
-            try:
-                self.out_port = mido.open_output()
-            except:
-                print("No MIDI outputs available. Running without MIDI.")
-                self.out_port = None
-        
-        self.active_notes = {}  # {note: time_to_off}
-        self.last_arp_time = 0.0
+    def __init__(self, port_name: str, clock: Callable[[], float] = time.perf_counter,
+                 threaded: bool = True, backend: str = Config.MIDI_BACKEND,
+                 monitor_timing: bool = Config.MIDI_TIMING, log=None):
+        """
+        Opens the MIDI output and its scheduler.
+
+        Args:
+            port_name (str): Name of the virtual port to create.
+            clock (callable): Clock that note times passed to send_note refer to.
+            threaded (bool): Send events from the scheduler's own thread. If False,
+                the caller drives output with update().
+            backend (str): Output backend, see music.midi_backends.open_backend.
+            monitor_timing (bool): Record intended vs actual send times in self.timing.
+            log (SessionLog): Log every note event to this session log.
+        """
+        self.out_port = open_backend(port_name, backend)
+        self.clock = clock
+        self.timing = TimingMonitor(clock=clock) if monitor_timing else None
+        self.scheduler = MIDIScheduler(self._send, clock, monitor=self.timing, log=log)
+        if self.out_port and threaded:
+            self.scheduler.start()
+
+    @property
+    def active_notes(self) -> dict:
+        """Sounding notes, as {(note, channel): overlapping note count}."""
+        return self.scheduler.sounding
+
+    def _send(self, messages) -> None:
+        self.out_port.send_batch(messages)
 
     def update(self, current_time: float):
-        """Turn off notes that have expired."""
+        """
+        Sends events that are due. Only needed when not threaded, e.g. when
+        running on a simulated clock.
+        """
         if not self.out_port:
             return
-        notes_to_remove = []
-        for key, off_time in self.active_notes.items(): #key is (note, channel)
-            if current_time >= off_time:
-                note, channel = key
-                msg_off = mido.Message('note_off', note=note, velocity=0, channel=channel)
-                self.out_port.send(msg_off)
-                notes_to_remove.append(key)
-        for key in notes_to_remove:
-            del self.active_notes[key]
+        self.scheduler.dispatch_due(current_time)
 
     def send_note(self, note: int, velocity: int, duration: float, current_time: float, channel: int):
-        """Sends a note_on and schedules note_off."""
+        """
+        Schedules a note_on at current_time and its note_off after duration.
+        current_time may be in the future; the scheduler sends both at their exact times.
+        """
+        if not self.out_port:
+            return
+        self.scheduler.schedule_note(current_time, note, velocity, duration, channel)
+
+    def start_transport(self, musical_clock) -> None:
+        """Starts sending MIDI clock and transport, locked to musical_clock."""
+        if not self.out_port:
+            return
+        self.scheduler.start_transport(musical_clock)
+
+    def stop_transport(self) -> None:
+        """Stops MIDI clock and sends a transport stop."""
         if not self.out_port:
             return
-        msg_on = mido.Message('note_on', note=note, velocity=velocity, channel=channel)
-        self.out_port.send(msg_on)
-        self.active_notes[(note, channel)] = current_time + duration
+        self.scheduler.stop_transport()
 
     def panic(self):
-        """Turn off all notes immediately."""
+        """Stop the transport and turn off all notes immediately."""
         if not self.out_port:
             return
-        for (note, channel) in list(self.active_notes.keys()):
-            msg_off = mido.Message('note_off', note=note, velocity=0, channel=channel)
-            self.out_port.send(msg_off)
-        self.active_notes.clear()
-        self.out_port.reset()
\ No newline at end of file
+        self.scheduler.stop_transport()
+        self.scheduler.stop()
+        self.scheduler.clear()
+        self.out_port.reset()
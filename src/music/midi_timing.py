@@ -0,0 +1,141 @@
+import json
+import threading
+import time
+from typing import Callable, Optional
+
+import numpy as np
+
+from config import Config
+from music.scheduler import CLOCK_TICK, NOTE_OFF, NOTE_ON
+
+PERCENTILES = (50, 90, 99, 99.9)
+
+
+class TimingMonitor:
+    """
+    Records when each MIDI event was meant to leave versus when it actually did.
+
+    Samples go into fixed-size ring buffers, so recording never allocates and the
+    monitor can stay on indefinitely; statistics cover the most recent `capacity`
+    events. Lateness is actual minus intended time: for note-ons it is the
+    timing jitter heard as the groove wobbling, for note-offs it is how much
+    notes overhang, and for MIDI clock pulses it is the clock jitter a DAW
+    syncing to Blastov would see.
+
+    Lateness is measured on the clock the events are scheduled by, which live
+    is the simulation's clock. If that clock itself stalls, events can leave
+    on time by it and still be late in real time, so each send is also
+    stamped with wall_clock: wall_jitter() compares the real spacing of
+    events with their intended spacing.
+    """
+
+    def __init__(self, capacity: int = Config.MIDI_TIMING_CAPACITY,
+                 clock: Callable[[], float] = time.perf_counter,
+                 wall_clock: Callable[[], float] = time.perf_counter) -> None:
+        self.capacity = capacity
+        self.clock = clock
+        self.wall_clock = wall_clock
+        self.intended = np.zeros(capacity)
+        self.actual = np.zeros(capacity)
+        self.wall = np.zeros(capacity)
+        self.kinds = np.zeros(capacity, dtype=np.int8)
+        self.count = 0
+        self._lock = threading.Lock()
+
+    def record(self, intended: float, actual: float, kind: int) -> None:
+        """Records one event that was sent."""
+        wall = self.wall_clock()
+        with self._lock:
+            i = self.count % self.capacity
+            self.intended[i] = intended
+            self.actual[i] = actual
+            self.wall[i] = wall
+            self.kinds[i] = kind
+            self.count += 1
+
+    def _samples(self):
+        """The recorded (intended, actual, wall, kind) arrays, oldest first."""
+        with self._lock:
+            n = min(self.count, self.capacity)
+            # Once the ring has wrapped, the oldest sample is the next one to be overwritten
+            start = self.count % self.capacity if self.count > self.capacity else 0
+            order = np.roll(np.arange(n), -start)
+            return self.intended[order], self.actual[order], self.wall[order], self.kinds[order]
+
+    def lateness(self, kind: Optional[int] = None) -> np.ndarray:
+        """Lateness in milliseconds of the recorded events, optionally of one kind only."""
+        intended, actual, _, kinds = self._samples()
+        late = (actual - intended) * 1000.0
+        return late if kind is None else late[kinds == kind]
+
+    def wall_jitter(self, kind: Optional[int] = None) -> np.ndarray:
+        """
+        How far, in milliseconds, the wall-clock time between consecutive events
+        (optionally of one kind only) strays from the time between their intended times.
+        """
+        intended, _, wall, kinds = self._samples()
+        if kind is not None:
+            intended, wall = intended[kinds == kind], wall[kinds == kind]
+        return np.abs(np.diff(wall) - np.diff(intended)) * 1000.0
+
+    def message_rates(self, window: float = 1.0) -> np.ndarray:
+        """Messages sent in each window (of wall-clock time) of the recorded period, per second."""
+        _, _, wall, _ = self._samples()
+        if len(wall) < 2:
+            return np.zeros(0)
+        bins = np.arange(wall.min(), wall.max() + window, window)
+        counts, _ = np.histogram(wall, bins=bins)
+        return counts / window
+
+    def stats(self) -> dict:
+        """
+        Percentiles of note-on jitter (on the scheduling clock and in wall-clock
+        time), note-off lateness, clock jitter (ms) and message rate (msg/s).
+        """
+        def summary(values):
+            if len(values) == 0:
+                return {}
+            result = {f"p{p:g}": float(np.percentile(values, p)) for p in PERCENTILES}
+            result["max"] = float(np.max(values))
+            result["count"] = int(len(values))
+            return result
+
+        return {"Jitter (ms)": summary(self.lateness(NOTE_ON)),
+                "Wall-clock jitter (ms)": summary(self.wall_jitter(NOTE_ON)),
+                "Note-off lateness (ms)": summary(self.lateness(NOTE_OFF)),
+                "Clock jitter (ms)": summary(self.lateness(CLOCK_TICK)),
+                "Message rate (msg/s)": summary(self.message_rates())}
+
+    def histograms(self, bin_ms: float = 0.25, max_ms: float = 20.0) -> dict:
+        """Histograms of lateness per kind, with a final bin for anything later than max_ms."""
+        edges = np.append(np.arange(0.0, max_ms + bin_ms, bin_ms), np.inf)
+        result = {"Bin edges (ms)": edges[:-1].tolist()}
+        for name, kind in (("Note-on", NOTE_ON), ("Note-off", NOTE_OFF), ("Clock", CLOCK_TICK)):
+            counts, _ = np.histogram(np.clip(self.lateness(kind), 0.0, None), bins=edges)
+            result[name] = counts.tolist()
+        return result
+
+    def hud_text(self) -> str:
+        """One-line summary for the HUD."""
+        on = self.lateness(NOTE_ON)
+        off = self.lateness(NOTE_OFF)
+        if len(on) == 0:
+            return "MIDI timing: no events yet"
+        # Rate over the last second only
+        _, _, wall, _ = self._samples()
+        rate = np.count_nonzero(wall > wall.max() - 1.0)
+        text = f"MIDI jitter p50 {np.percentile(on, 50):.2f}ms p99 {np.percentile(on, 99):.2f}ms"
+        wall_jitter = self.wall_jitter(NOTE_ON)
+        if len(wall_jitter):
+            text += f" (wall p99 {np.percentile(wall_jitter, 99):.2f}ms)"
+        if len(off):
+            text += f" | off p99 {np.percentile(off, 99):.2f}ms"
+        clock = self.lateness(CLOCK_TICK)
+        if len(clock):
+            text += f" | clock p99 {np.percentile(clock, 99):.2f}ms"
+        return text + f" | {rate} msg/s"
+
+    def write(self, path: str) -> None:
+        """Writes stats and histograms to a JSON file."""
+        with open(path, "w") as f:
+            json.dump({"Stats": self.stats(), "Histograms": self.histograms()}, f, indent=2)
@@ -0,0 +1,228 @@
+import heapq
+import math
+import threading
+import time
+from typing import Callable, Dict, List, Optional, Tuple
+
+from config import Config
+from music.midi_backends import (CLOCK_MESSAGE, CONTINUE_MESSAGE, START_MESSAGE, STOP_MESSAGE,
+                                 encode_note_off, encode_note_on, encode_song_position)
+
+# Event kinds. At equal timestamps, note-offs sort first so a re-triggered note isn't cut short.
+NOTE_OFF = 0
+NOTE_ON = 1
+CLOCK_TICK = 2  # Only used for timing records; clock ticks are generated, not queued
+
+# MIDI clock resolution, in pulses per quarter note
+PPQN = 24
+
+
+class MIDIScheduler:
+    """
+    Sends timestamped note events from a dedicated thread, in time order.
+
+    Events wait in a heap keyed by absolute timestamp. The thread sleeps on a
+    condition until shortly before the next event, then spins (yielding the GIL)
+    for the last spin_margin seconds, which gives sub-millisecond accuracy without
+    burning a core. Overlapping notes on the same (note, channel) are reference
+    counted: every note-on is sent, but the note-off is only sent when the last
+    overlapping note ends. All events due at once are encoded to raw MIDI bytes
+    and handed to the output as a single batch.
+
+    The same thread can also send MIDI clock (24 PPQN) and transport messages,
+    following the MusicalClock the notes are scheduled from. Each pulse time is
+    computed from the pulse's beat position rather than from the previous
+    pulse, so the clock doesn't drift, and it follows tempo changes.
+
+    Without the thread, dispatch_due() sends everything due by a given time,
+    which lets a caller drive the scheduler from a simulated clock.
+    """
+
+    def __init__(self, send: Callable[[List[bytes]], None],
+                 clock: Callable[[], float] = time.perf_counter,
+                 spin_margin: float = Config.MIDI_SPIN_MARGIN, monitor=None, log=None) -> None:
+        """
+        Args:
+            send (callable): Called as send(messages) to output a batch of encoded
+                messages. The list is reused, so it must not be kept.
+            clock (callable): Clock in seconds that event timestamps refer to.
+            spin_margin (float): How long before an event to stop sleeping and start spinning.
+            monitor (TimingMonitor): If given, records intended and actual send times.
+            log (SessionLog): If given, every note event taken from the queue is logged
+                at its timestamp, whether or not it is sent, and so is clear().
+        """
+        self._send = send
+        self.clock = clock
+        self.spin_margin = spin_margin
+        self.monitor = monitor
+        self.log = log
+        self._queue: List[Tuple[float, int, int, int, int, int]] = []
+        self._sequence = 0
+        self.sounding: Dict[Tuple[int, int], int] = {}  # {(note, channel): overlapping note count}
+        self._batch: List[bytes] = []
+        self._transport = None  # MusicalClock while MIDI clock is running
+        self._next_pulse = 0
+        self._system_pending: List[bytes] = []  # Transport messages to send as soon as possible
+        self._condition = threading.Condition()
+        self._thread = None
+        self._running = False
+
+    @property
+    def queued(self) -> int:
+        """Events waiting to be sent."""
+        return len(self._queue)
+
+    def start(self) -> None:
+        """Starts the output thread."""
+        if self._thread is not None:
+            return
+        self._running = True
+        self._thread = threading.Thread(target=self._run, daemon=True)
+        self._thread.start()
+
+    def stop(self) -> None:
+        """Stops the output thread. Pending events stay queued."""
+        with self._condition:
+            self._running = False
+            self._condition.notify()
+        if self._thread is not None:
+            self._thread.join()
+            self._thread = None
+
+    def start_transport(self, musical_clock) -> None:
+        """
+        Starts sending MIDI clock from the next sixteenth note, preceded by its song
+        position and a start (at the very beginning) or continue message.
+
+        Args:
+            musical_clock (MusicalClock): The clock the notes are scheduled with.
+        """
+        with self._condition:
+            sixteenth = max(0, math.ceil(musical_clock.beat_at(self.clock()) * 4))
+            self._transport = musical_clock
+            self._next_pulse = sixteenth * PPQN // 4
+            self._system_pending += [encode_song_position(sixteenth),
+                                     CONTINUE_MESSAGE if sixteenth else START_MESSAGE]
+            self._condition.notify()
+
+    def stop_transport(self) -> None:
+        """Stops MIDI clock and sends a stop message."""
+        with self._condition:
+            if self._transport is None:
+                return
+            self._transport = None
+            self._system_pending.append(STOP_MESSAGE)
+            self._condition.notify()
+
+    def _next_pulse_time(self) -> float:
+        return self._transport.time_at(self._next_pulse / PPQN) if self._transport else math.inf
+
+    def schedule(self, timestamp: float, kind: int, note: int, velocity: int, channel: int) -> None:
+        """Queues an event for the given absolute time."""
+        with self._condition:
+            heapq.heappush(self._queue, (timestamp, kind, self._sequence, note, velocity, channel))
+            self._sequence += 1
+            # Wake the thread if this is now the earliest event
+            if self._queue[0][2] == self._sequence - 1:
+                self._condition.notify()
+
+    def schedule_note(self, timestamp: float, note: int, velocity: int,
+                      duration: float, channel: int) -> None:
+        """Queues a note-on and its note-off."""
+        self.schedule(timestamp, NOTE_ON, note, velocity, channel)
+        self.schedule(timestamp + duration, NOTE_OFF, note, 0, channel)
+
+    def next_time(self) -> Optional[float]:
+        """Timestamp of the earliest pending event, or None if the queue is empty."""
+        with self._condition:
+            return self._queue[0][0] if self._queue else None
+
+    def dispatch_due(self, now: float) -> int:
+        """
+        Sends every event due by now. MIDI clock pulses are only generated up to a
+        finite now, so dispatch_due(math.inf) flushes the queue without them.
+
+        Returns:
+            int: The number of events taken from the queue.
+        """
+        # Everything, down to the send, happens under the lock, so the reference
+        # counts and the shared batch stay consistent whichever thread dispatches
+        with self._condition:
+            batch = self._batch
+            sent = [] if self.monitor is not None else None
+            due = []
+            while self._queue and self._queue[0][0] <= now:
+                due.append(heapq.heappop(self._queue))
+
+            # Transport and clock go first: a note on a beat belongs after its clock pulse
+            if self._system_pending:
+                batch += self._system_pending
+                self._system_pending.clear()
+            if self._transport is not None and math.isfinite(now):
+                while self._next_pulse_time() <= now:
+                    batch.append(CLOCK_MESSAGE)
+                    if sent is not None:
+                        sent.append((self._next_pulse_time(), CLOCK_TICK))
+                    self._next_pulse += 1
+
+            sounding = self.sounding
+            log = self.log
+            for timestamp, kind, _, note, velocity, channel in due:
+                if log is not None:
+                    log.note(timestamp, kind, note, velocity, channel)
+                key = (note, channel)
+                if kind == NOTE_ON:
+                    sounding[key] = sounding.get(key, 0) + 1
+                    batch.append(encode_note_on(channel, note, velocity))
+                else:
+                    count = sounding.get(key, 0) - 1
+                    if count > 0:
+                        sounding[key] = count
+                        continue
+                    sounding.pop(key, None)
+                    batch.append(encode_note_off(channel, note))
+                if sent is not None:
+                    sent.append((timestamp, kind))
+
+            if batch:
+                self._send(batch)
+                batch.clear()
+                if sent:
+                    actual = self.clock()
+                    for timestamp, kind in sent:
+                        self.monitor.record(timestamp, actual, kind)
+            return len(due)
+
+    def clear(self) -> None:
+        """Drops every pending event and silences every sounding note."""
+        if self.log is not None:
+            self.log.panic(self.clock())
+        with self._condition:
+            self._queue.clear()
+            messages = self._system_pending + [encode_note_off(channel, note) for note, channel in self.sounding]
+            self._system_pending.clear()
+            self.sounding.clear()
+            if messages:
+                self._send(messages)
+
+    def _run(self) -> None:
+        while True:
+            with self._condition:
+                if not self._running:
+                    return
+                target = min(self._queue[0][0] if self._queue else math.inf, self._next_pulse_time())
+                if self._system_pending:
+                    target = self.clock()
+                if target == math.inf:
+                    self._condition.wait()
+                    continue
+                wait = target - self.clock()
+                if wait > self.spin_margin:
+                    # Woken early by a new earliest event or stop(), or time to spin
+                    self._condition.wait(wait - self.spin_margin)
+                    continue
+
+            # Spin for the last stretch, yielding so other threads keep running
+            while self.clock() < target:
+                time.sleep(0)
+            self.dispatch_due(self.clock())
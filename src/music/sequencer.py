@@ -0,0 +1,195 @@
+import math
+from collections import deque
+from typing import Callable, Optional
+
+from config import Config
+from markov.MarkovChainMelodyGenerator import MarkovChainMelodyGenerator
+from music.harmony import ChordData, ScaleData
+
+
+def fold_melody_pitch(pitch: int) -> int:
+    """Moves a melody pitch by octaves into the playable range, MIDI 60-96."""
+    while pitch < 60:
+        pitch += 12
+    while pitch > 96:
+        pitch -= 12
+    return pitch
+
+
+class MusicalClock:
+    """
+    Maps a clock in seconds onto beats at a tempo.
+
+    Tempo changes re-anchor the mapping at the time of the change, so the beat
+    position stays continuous.
+    """
+
+    def __init__(self, clock: Callable[[], float], tempo_bpm: float = Config.DEFAULT_BPM) -> None:
+        """
+        Args:
+            clock (callable): Clock in seconds, the same one MIDI events are timed with.
+            tempo_bpm (float): Initial tempo.
+        """
+        self.clock = clock
+        self.tempo_bpm = float(tempo_bpm)
+        self._anchor_time = clock()
+        self._anchor_beat = 0.0
+
+    def now(self) -> float:
+        return self.clock()
+
+    def beat_at(self, t: float) -> float:
+        """Beat position at time t."""
+        return self._anchor_beat + (t - self._anchor_time) * self.tempo_bpm / 60.0
+
+    def time_at(self, beat: float) -> float:
+        """Time of a beat position."""
+        return self._anchor_time + (beat - self._anchor_beat) * 60.0 / self.tempo_bpm
+
+    def set_tempo(self, tempo_bpm: float, t: Optional[float] = None) -> None:
+        """Changes tempo from time t (default: now) onwards."""
+        t = self.clock() if t is None else t
+        self._anchor_beat = self.beat_at(t)
+        self._anchor_time = t
+        self.tempo_bpm = float(tempo_bpm)
+
+
+class Sequencer:
+    """
+    Schedules the arpeggio (channel 0) and the Markov melody (channel 1) ahead of time.
+
+    Each tick computes every event that falls within the lookahead window, at its
+    exact beat position, and hands it to the MIDI layer with its timestamp. The
+    arpeggio steps on a grid of 1..max_subdivisions per beat chosen from the
+    satellite's speed; melody notes last their Markov duration, scaled by the same
+    subdivision. Timing therefore depends only on the musical clock, not on when
+    tick() happens to be called.
+    """
+
+    def __init__(self, midi, markov_model: MarkovChainMelodyGenerator,
+                 musical_clock: MusicalClock, start_pitch: int = 72,
+                 lookahead: float = Config.LOOKAHEAD, max_subdivisions: int = 8,
+                 melody_engine=None) -> None:
+        """
+        Args:
+            midi (MIDIHandler): Output for the notes.
+            markov_model (MarkovChainMelodyGenerator): Trained melody model.
+            musical_clock (MusicalClock): Source of beat positions.
+            start_pitch (int): MIDI pitch the melody starts from.
+            lookahead (float): How far ahead, in seconds, events are scheduled.
+            max_subdivisions (int): Arpeggio steps per beat at top speed.
+            melody_engine (NeuralMelodyEngine): Optionally picks melody intervals instead of the
+                Markov model, which still sets the rhythm and plays any note the engine misses.
+        """
+        self.midi = midi
+        self.markov_model = markov_model
+        self.clock = musical_clock
+        self.lookahead = lookahead
+        self.max_subdivisions = max_subdivisions
+        self.melody_engine = melody_engine
+
+        # Musical context, refreshed by set_context
+        self.chord = None
+        self.scale = None
+        self.speed = 0.0
+        self.frozen = True
+
+        # Arpeggio state
+        self.arp_index = 0
+        self._next_arp_beat = None
+        self._arp_history = deque(maxlen=64)  # (start time, end time, note) for the HUD
+
+        # Melody state
+        self.melody_state = markov_model._generate_starting_state()
+        self.last_melody_pitch = start_pitch
+        self._next_melody_beat = None
+
+    def set_context(self, chord: ChordData, scale: ScaleData, speed: float, frozen: bool) -> None:
+        """Updates the harmonic and physical context used for upcoming events."""
+        self.chord = chord
+        self.scale = scale
+        self.speed = speed
+        self.frozen = frozen
+
+    @property
+    def subdivision(self) -> int:
+        """Arpeggio steps per beat for the current speed."""
+        factor = 1.0 + (self.speed / Config.MAX_SPEED) * (self.max_subdivisions - 1.0)
+        return int(min(self.max_subdivisions, max(1, round(factor))))
+
+    @property
+    def velocity(self) -> int:
+        return min(127, int(20 + self.speed * 2))
+
+    def tick(self, now: float) -> int:
+        """
+        Schedules every event due before now + lookahead.
+
+        Returns:
+            int: The number of notes scheduled.
+        """
+        if self.frozen or self.chord is None:
+            # Restart on the beat grid when the satellite is released
+            self._next_arp_beat = None
+            self._next_melody_beat = None
+            return 0
+
+        horizon = now + self.lookahead
+        subdivision = self.subdivision
+        if self._next_arp_beat is None:
+            self._next_arp_beat = math.ceil(self.clock.beat_at(now) * subdivision) / subdivision
+        if self._next_melody_beat is None:
+            self._next_melody_beat = self._next_arp_beat
+
+        scheduled = 0
+        while self.clock.time_at(self._next_arp_beat) < horizon:
+            self._schedule_arp(self._next_arp_beat, subdivision)
+            # Next step on the current subdivision grid
+            self._next_arp_beat = (math.floor(self._next_arp_beat * subdivision + 1e-6) + 1) / subdivision
+            scheduled += 1
+
+        while self.clock.time_at(self._next_melody_beat) < horizon:
+            self._next_melody_beat += self._schedule_melody(self._next_melody_beat, subdivision)
+            scheduled += 1
+        return scheduled
+
+    def _schedule_arp(self, beat: float, subdivision: int) -> None:
+        chord_notes = self.chord.voicing(Config.BASE_OCTAVE)
+        note = chord_notes[self.arp_index % len(chord_notes)]
+        start = self.clock.time_at(beat)
+        step = self.clock.time_at(beat + 1.0 / subdivision) - start
+
+        self.midi.send_note(note, self.velocity, duration=step * 0.8, current_time=start, channel=0)
+        self._arp_history.append((start, start + step, note))
+        self.arp_index += 1
+
+    def _schedule_melody(self, beat: float, subdivision: int) -> float:
+        """Schedules one melody note and returns its length in beats."""
+        root_midi = 60 + self.chord.root
+        self.melody_state = self.markov_model._generate_next_state(
+            self.melody_state, self.last_melody_pitch, root_midi,
+            self.scale.interval_mask, self.chord.interval_mask)
+
+        interval, duration = self.melody_state
+        if self.melody_engine is not None:
+            interval = self.melody_engine.next_interval(interval, self.last_melody_pitch, self.chord,
+                                                        self.scale, self.velocity)
+        # Keep melody in playable range
+        melody_midi = fold_melody_pitch(self.last_melody_pitch + interval)
+
+        # A melody note lasts its duration in arpeggio steps, times two
+        length = duration * 2.0 / subdivision
+        start = self.clock.time_at(beat)
+        self.midi.send_note(melody_midi, self.velocity, duration=self.clock.time_at(beat + length) - start,
+                            current_time=start, channel=1)
+        self.last_melody_pitch = melody_midi
+        return length
+
+    def current_note(self, now: float) -> Optional[int]:
+        """The arpeggio note sounding at time now, if any."""
+        for start, end, note in reversed(self._arp_history):
+            if start <= now < end:
+                return note
+            if end <= now:
+                break
+        return None
@@ -0,0 +1,139 @@
+import heapq
+from typing import Dict, List, Optional, Sequence
+
+import numpy as np
+
+from config import Config
+from music.harmony import ChordData
+from physics.swarm import SwarmState
+
+
+class VoiceAllocator:
+    """
+    Maps many voices onto a few MIDI channels, within a polyphony limit per
+    channel and a global budget of notes per second.
+
+    Each voice always gets the same channel, so a satellite keeps its instrument.
+    The budget is a token bucket: it refills at max_notes_per_second and holds
+    at most one second's worth, which bounds the MIDI message rate whatever
+    the number of voices.
+    """
+
+    def __init__(self, channels: Sequence[int] = Config.SWARM_CHANNELS,
+                 polyphony: int = Config.SWARM_POLYPHONY,
+                 max_notes_per_second: float = Config.SWARM_MAX_NOTES_PER_SECOND) -> None:
+        self.channels = tuple(channels)
+        self.polyphony = polyphony
+        self.max_notes_per_second = max_notes_per_second
+        self._sounding: Dict[int, List[float]] = {ch: [] for ch in self.channels}  # heaps of end times
+        self._tokens = max_notes_per_second
+        self._last_refill = None
+
+    def available(self, now: float) -> int:
+        """Returns how many notes the budget allows at time now."""
+        # Notes scheduled ahead don't arrive in time order, so only ever refill forwards
+        if self._last_refill is None or now > self._last_refill:
+            if self._last_refill is not None:
+                self._tokens = min(self.max_notes_per_second,
+                                   self._tokens + (now - self._last_refill) * self.max_notes_per_second)
+            self._last_refill = now
+        return int(self._tokens)
+
+    def allocate(self, voice_id: int, now: float, duration: float) -> Optional[int]:
+        """
+        Reserves a note for a voice.
+
+        Args:
+            voice_id (int): Stable id of the voice, e.g. its swarm slot.
+            now (float): Start time of the note.
+            duration (float): Length of the note in seconds.
+
+        Returns:
+            int or None: The MIDI channel to play on, or None if the note must be dropped.
+        """
+        if self.available(now) < 1:
+            return None
+
+        channel = self.channels[voice_id % len(self.channels)]
+        sounding = self._sounding[channel]
+        while sounding and sounding[0] <= now:
+            heapq.heappop(sounding)
+        if len(sounding) >= self.polyphony:
+            return None
+
+        heapq.heappush(sounding, now + duration)
+        self._tokens -= 1
+        return channel
+
+
+class SwarmArpeggiator:
+    """
+    Plays one arpeggio voice per swarm satellite, over the chord of its dominant planet.
+
+    Like the main arpeggio, each voice's rate follows its speed, and its notes
+    are scheduled ahead at their own times, within the same lookahead window as
+    the Sequencer's. Voices that are due when the note budget is exhausted skip
+    that note rather than queueing it, so the swarm never falls behind.
+    """
+
+    def __init__(self, capacity: int = Config.SWARM_CAPACITY,
+                 allocator: Optional[VoiceAllocator] = None) -> None:
+        self.allocator = allocator if allocator is not None else VoiceAllocator()
+        self.next_time = np.full(capacity, np.inf)
+        self.arp_index = np.zeros(capacity, dtype=int)
+
+    def update(self, swarm: SwarmState, chords: List[ChordData], current_time: float,
+               tempo_bpm: float, midi, lookahead: float = Config.LOOKAHEAD) -> int:
+        """
+        Schedules the next note of every voice due within the lookahead window.
+
+        Args:
+            swarm (SwarmState): Current swarm state.
+            chords (list): The chord of each planet, indexed like swarm.dominant.
+            current_time (float): Current musical time in seconds.
+            tempo_bpm (float): Global tempo.
+            midi (MIDIHandler): Output for the notes.
+            lookahead (float): How far ahead, in seconds, notes are scheduled.
+
+        Returns:
+            int: The number of notes sent.
+        """
+        horizon = current_time + lookahead
+        # Newly launched voices start at the end of the window, so their first note
+        # is on time; removed ones fall silent
+        self.next_time[swarm.active & np.isinf(self.next_time)] = horizon
+        self.next_time[~swarm.active] = np.inf
+
+        due = np.flatnonzero(self.next_time <= horizon)
+        if len(due) == 0:
+            return 0
+        # A voice only falls behind the window if update() itself was late
+        start = np.maximum(self.next_time[due], current_time)
+
+        # Same speed -> subdivision mapping as the main arpeggio
+        speed = np.sqrt(np.einsum('nk,nk->n', swarm.vel[due], swarm.vel[due]))
+        beat_duration = 60.0 / float(tempo_bpm)
+        subdivision_factor = 1.0 + (speed / Config.MAX_SPEED) * (8.0 - 1.0)
+        arp_interval = np.maximum(0.02, beat_duration / subdivision_factor)
+
+        # Most overdue voices get the budget first
+        due_order = np.argsort(self.next_time[due], kind='stable')
+        budget = self.allocator.available(current_time)
+        chord_notes = [chord.voicing(Config.BASE_OCTAVE) for chord in chords]
+
+        sent = 0
+        for k in due_order[:budget]:
+            slot = due[k]
+            notes = chord_notes[swarm.dominant[slot]]
+            channel = self.allocator.allocate(slot, start[k], arp_interval[k] * 0.8)
+            if channel is None:
+                continue
+            note = notes[self.arp_index[slot] % len(notes)]
+            velocity = min(127, int(20 + speed[k] * 2))
+            midi.send_note(note, velocity, duration=arp_interval[k] * 0.8,
+                           current_time=start[k], channel=channel)
+            sent += 1
+
+        self.arp_index[due] += 1
+        self.next_time[due] = start + arp_interval
+        return sent
@@ -0,0 +1,188 @@
+"""
+Offline, faster-than-real-time rendering of Blastov to a Standard MIDI File.
+
+Drives the same planets, satellite, genetic algorithm, Markov melody and
+sequencer as main.py, but on a simulated clock instead of the wall clock, and
+records the output with MIDIFileWriter. Useful for auditioning long pieces,
+comparing output between versions, and as an end-to-end throughput benchmark.
+
+Example:
+    python offline.py --duration 3600 --launch 4,-1 --keys 0:CMajor,60:GMajor,120:FMinor --out piece.mid
+"""
+import argparse
+import random
+import time
+from typing import List, Optional, Tuple
+
+import numpy as np
+
+from config import Config
+from genetic_engine import GeneticSolarSystemGenerator
+from main import get_markov_model, initialize_planets
+from music.harmony import get_scale
+from music.midi_file import MIDIFileWriter
+from music.sequencer import MusicalClock, Sequencer
+from music.voices import SwarmArpeggiator
+from session_log import SessionLog
+from physics.gravity import Satellite
+from physics.simulation import PhysicsSimulation
+
+
+class OfflineSession:
+    """
+    The Blastov pipeline on a simulated clock.
+
+    Time advances in display-frame increments of 1/Config.FPS: each frame the
+    physics takes its fixed steps, the GA takes a generation when due (in-line,
+    rather than on a thread), and the sequencer schedules ahead exactly as it
+    does live.
+    """
+
+    def __init__(self, midi, launch: Optional[Tuple[float, float]],
+                 key_script: List[Tuple[float, str]],
+                 start_scale: str = "CMajor", ga_rate: float = 8.0,
+                 physics_rate: int = Config.PHYSICS_RATE, log=None) -> None:
+        """
+        Args:
+            midi: Output with the MIDIHandler interface, e.g. a MIDIFileWriter.
+            launch (tuple): Satellite launch velocity, in pixels per frame, or None
+                to leave the satellite frozen at its start.
+            key_script (list): (time in seconds, scale name) key changes.
+            start_scale (str): Scale before the first key change.
+            ga_rate (float): GA generations per second while modulating.
+            physics_rate (int): Physics steps per second. Lower is faster but
+                diverges from what the live version would play.
+            log (SessionLog): If given, key changes, queen updates and the launch
+                are logged here. Notes are logged by midi, if it was given the log too.
+        """
+        self.now = 0.0
+        self.frame_dt = 1.0 / Config.FPS
+        self.midi = midi
+        self.log = log
+
+        system_center = np.array([Config.WINDOW_WIDTH // 2, Config.WINDOW_HEIGHT // 2])
+        self.planets = initialize_planets(system_center)
+        self.simulation = PhysicsSimulation(self.planets, Satellite(np.array([100, 100])),
+                                            rate=physics_rate, clock=lambda: self.now)
+        if launch is not None:
+            self.simulation.launch(np.array(launch, dtype=float))
+            if log is not None:
+                log.launch(0.0, launch)
+        self.swarm_arp = SwarmArpeggiator()
+
+        self.generator = GeneticSolarSystemGenerator(number_of_planets=len(self.planets))
+        self.ga_delta = 1.0 / ga_rate
+        self.ga_timer = 0.0
+        self.ga_active = False
+        self.current_scale = get_scale(start_scale)
+        self.key_script = sorted(key_script)
+
+        self.musical_clock = MusicalClock(self.simulation.clock, Config.DEFAULT_BPM)
+        self.sequencer = Sequencer(midi, get_markov_model(), self.musical_clock,
+                                   start_pitch=72 + self.current_scale.root)
+        self.frames = 0
+        self.ga_generations = 0
+        self.fitness_trend: List[Tuple[float, float, float]] = []  # (time, best, average) per generation
+        # Wall-clock seconds spent in each part of the pipeline
+        self.timings = {"Physics": 0.0, "GA": 0.0, "Music": 0.0, "MIDI": 0.0}
+
+    def _apply_script(self) -> None:
+        while self.key_script and self.key_script[0][0] <= self.now:
+            _, scale_name = self.key_script.pop(0)
+            self.current_scale = get_scale(scale_name)
+            self.ga_active = True
+            if self.log is not None:
+                self.log.key(self.simulation.clock(), self.current_scale)
+
+    def _step_ga(self) -> None:
+        self.ga_timer += self.frame_dt
+        if not self.ga_active or self.ga_timer < self.ga_delta:
+            return
+        self.ga_timer = 0.0
+        queen, resolved = self.generator.run(self.current_scale)
+        self.fitness_trend.append((self.now, self.generator.last_stats["Best fit"],
+                                   self.generator.last_stats["Avg fit"]))
+        chords = [gene.chord for gene in queen.planet_genes]
+        self.simulation.set_chords(chords)
+        if self.log is not None:
+            self.log.queen(self.simulation.clock(), chords)
+        self.ga_generations += 1
+        if resolved or self.generator.current_scale_steps >= self.generator.max_gens:
+            self.ga_active = False
+
+    def frame(self) -> None:
+        """Advances everything by one display frame."""
+        self.now += self.frame_dt
+        timings = self.timings
+        t0 = time.perf_counter()
+        self._apply_script()
+        self._step_ga()
+        t1 = time.perf_counter()
+        self.simulation.advance(self.frame_dt)
+        t2 = time.perf_counter()
+
+        world = self.simulation.snapshot()
+        current_time = self.simulation.clock()
+        speed = np.linalg.norm(world.sat.vel)
+        self.sequencer.set_context(world.dominant_planet.chord, self.current_scale, speed, world.sat.frozen)
+        self.sequencer.tick(current_time)
+        self.swarm_arp.update(world.swarm, [p.chord for p in world.planets], current_time,
+                              self.musical_clock.tempo_bpm, self.midi)
+        t3 = time.perf_counter()
+        self.midi.update(current_time)
+        t4 = time.perf_counter()
+        timings["GA"] += t1 - t0
+        timings["Physics"] += t2 - t1
+        timings["Music"] += t3 - t2
+        timings["MIDI"] += t4 - t3
+        self.frames += 1
+
+    def run(self, duration: float) -> None:
+        """Runs for duration simulated seconds, then ends any sounding notes."""
+        while self.now < duration:
+            self.frame()
+        self.midi.panic()
+
+
+def parse_key_script(text: str) -> List[Tuple[float, str]]:
+    """Parses 'time:Scale,time:Scale', e.g. '0:CMajor,30:GMajor'."""
+    script = []
+    for entry in filter(None, text.split(',')):
+        t, scale_name = entry.split(':')
+        script.append((float(t), scale_name.strip()))
+    return script
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Render Blastov offline to a MIDI file.")
+    parser.add_argument("--duration", type=float, default=600.0, help="Simulated seconds to render.")
+    parser.add_argument("--launch", default="4,-1", help="Launch velocity 'vx,vy' in pixels per frame.")
+    parser.add_argument("--keys", default="0:CMajor", help="Key changes as 'time:Scale,time:Scale'.")
+    parser.add_argument("--physics-rate", type=int, default=Config.PHYSICS_RATE,
+                        help="Physics steps per second; lower renders faster but less faithfully.")
+    parser.add_argument("--seed", type=int, default=0, help="Random seed, for reproducible output.")
+    parser.add_argument("--out", default="blastov.mid", help="Output .mid path.")
+    parser.add_argument("--log", help="Also write a session log, for replay.py.")
+    args = parser.parse_args()
+
+    random.seed(args.seed)
+    np.random.seed(args.seed)
+
+    log = SessionLog(args.log) if args.log else None
+    writer = MIDIFileWriter(log=log)
+    session = OfflineSession(writer, tuple(float(v) for v in args.launch.split(',')),
+                             parse_key_script(args.keys), physics_rate=args.physics_rate, log=log)
+    start = time.perf_counter()
+    session.run(args.duration)
+    elapsed = time.perf_counter() - start
+    writer.save(args.out)
+    if log is not None:
+        log.close()
+
+    print(f"Rendered {args.duration:.0f}s in {elapsed:.2f}s ({args.duration / elapsed:.0f}x real time).")
+    print(f"{session.frames} frames, {session.ga_generations} GA generations, "
+          f"{len(writer.events)} MIDI events -> {args.out}")
+
+
+if __name__ == "__main__":
+    main()
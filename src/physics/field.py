@@ -0,0 +1,191 @@
+from typing import Optional
+
+import numpy as np
+
+from config import Config
+from physics.gravity import calculate_gravity_batch, get_dominant_planets
+
+
+class InfluenceField:
+    """
+    Optional cache of gravity and planet influence, rasterized onto a coarse grid
+    over the window.
+
+    Each planet's force and influence weight (mass / (dist + 1), as in
+    get_dominant_planet) are kept as a separate layer, and a layer is only
+    re-rasterized when its planet has moved more than move_tolerance pixels. Lookups
+    are bilinear, so they cost the same whatever the grid size. Close to a planet
+    the force changes too quickly to interpolate, so points within fallback_radius
+    of a planet (or outside the grid) are evaluated exactly.
+
+    The cache measures its own accuracy: each update compares a few random probe
+    points against exact evaluation, see error_stats(). The probes come from the
+    field's own generator, so measuring never consumes the global random state.
+    """
+
+    def __init__(self, width: int = Config.WINDOW_WIDTH, height: int = Config.WINDOW_HEIGHT,
+                 cell_size: float = Config.FIELD_CELL_SIZE,
+                 move_tolerance: float = Config.FIELD_MOVE_TOLERANCE,
+                 fallback_radius: float = Config.FIELD_FALLBACK_RADIUS,
+                 error_probes: int = Config.FIELD_ERROR_PROBES, seed: Optional[int] = None) -> None:
+        self.width = width
+        self.height = height
+        self.cell_size = cell_size
+        self.move_tolerance = move_tolerance
+        self.fallback_radius = fallback_radius
+        self.error_probes = error_probes
+        self.rng = np.random.default_rng(seed)
+        self.cols = int(np.ceil(width / cell_size)) + 1
+        self.rows = int(np.ceil(height / cell_size)) + 1
+
+        xs = np.arange(self.cols) * cell_size
+        ys = np.arange(self.rows) * cell_size
+        grid_x, grid_y = np.meshgrid(xs, ys)
+        self._nodes = np.stack([grid_x.ravel(), grid_y.ravel()], axis=1)
+
+        # Per-planet layers, shape (P, rows, cols[, 2])
+        self._force_layers = None
+        self._weight_layers = None
+        self._rasterized_pos = None
+        self._planet_pos = np.zeros((0, 2))
+        self._planet_mass = np.zeros(0)
+
+        # Combined grids, replaced (not modified) on update so readers on other threads see whole grids
+        self.force = np.zeros((self.rows, self.cols, 2))
+        self.dominant = np.zeros((self.rows, self.cols), dtype=int)
+
+        self.layer_updates = 0
+        self.mean_force_error = 0.0
+        self.max_force_error = 0.0
+        self.dominant_mismatch_rate = 0.0
+
+    def update(self, planet_pos: np.ndarray, planet_mass: np.ndarray) -> int:
+        """
+        Re-rasterizes the layers of planets that have moved.
+
+        Args:
+            planet_pos (array): Planet positions, shape (P, 2).
+            planet_mass (array): Planet masses, shape (P,).
+
+        Returns:
+            int: The number of layers re-rasterized.
+        """
+        if self._force_layers is None or len(planet_pos) != len(self._rasterized_pos):
+            count = len(planet_pos)
+            self._force_layers = np.zeros((count, self.rows, self.cols, 2))
+            self._weight_layers = np.zeros((count, self.rows, self.cols))
+            self._rasterized_pos = np.full((count, 2), np.inf)
+
+        moved = np.flatnonzero(np.linalg.norm(planet_pos - self._rasterized_pos, axis=1) > self.move_tolerance)
+        for i in moved:
+            self._rasterize(i, planet_pos[i], planet_mass[i])
+        self._planet_pos = planet_pos.copy()
+        self._planet_mass = planet_mass.copy()
+
+        if len(moved):
+            self.force = self._force_layers.sum(axis=0)
+            self.dominant = np.argmax(self._weight_layers, axis=0)
+            self.layer_updates += len(moved)
+            self._measure_error()
+        return len(moved)
+
+    def _rasterize(self, i: int, pos: np.ndarray, mass: float) -> None:
+        single_pos = pos[None, :]
+        single_mass = np.array([mass])
+        force = calculate_gravity_batch(self._nodes, single_pos, single_mass)
+        dist = np.linalg.norm(self._nodes - pos, axis=1)
+        self._force_layers[i] = force.reshape(self.rows, self.cols, 2)
+        self._weight_layers[i] = (mass / (dist + 1.0)).reshape(self.rows, self.cols)
+        self._rasterized_pos[i] = pos
+
+    def _bilinear(self, grids: np.ndarray, positions: np.ndarray) -> np.ndarray:
+        """
+        Bilinearly samples grids of shape (..., rows, cols) at positions (N, 2).
+
+        Returns:
+            array: Samples with shape (..., N).
+        """
+        fx = np.clip(positions[:, 0] / self.cell_size, 0, self.cols - 1)
+        fy = np.clip(positions[:, 1] / self.cell_size, 0, self.rows - 1)
+        x0 = np.minimum(fx.astype(int), self.cols - 2)
+        y0 = np.minimum(fy.astype(int), self.rows - 2)
+        tx = fx - x0
+        ty = fy - y0
+        top = grids[..., y0, x0] * (1 - tx) + grids[..., y0, x0 + 1] * tx
+        bottom = grids[..., y0 + 1, x0] * (1 - tx) + grids[..., y0 + 1, x0 + 1] * tx
+        return top * (1 - ty) + bottom * ty
+
+    def _needs_exact(self, positions: np.ndarray) -> np.ndarray:
+        """Points near a planet, or outside the grid, where the cache isn't trusted."""
+        outside = ((positions[:, 0] < 0) | (positions[:, 0] > self.width) |
+                   (positions[:, 1] < 0) | (positions[:, 1] > self.height))
+        if len(self._planet_pos) == 0:
+            return outside
+        diff = self._planet_pos[None, :, :] - positions[:, None, :]
+        near = np.einsum('npk,npk->np', diff, diff).min(axis=1) < self.fallback_radius ** 2
+        return outside | near
+
+    def sample_force(self, positions: np.ndarray, exact_fallback: bool = True) -> np.ndarray:
+        """
+        Looks up the gravitational force at many points.
+
+        Args:
+            positions (array): Points, shape (N, 2).
+            exact_fallback (bool): Evaluate points the cache can't be trusted with exactly.
+
+        Returns:
+            array: Force per point, shape (N, 2).
+        """
+        force = self._bilinear(np.moveaxis(self.force, -1, 0), positions).T
+        if exact_fallback:
+            exact = np.flatnonzero(self._needs_exact(positions))
+            if len(exact):
+                force[exact] = calculate_gravity_batch(positions[exact], self._planet_pos, self._planet_mass)
+        return force
+
+    def sample_dominant(self, positions: np.ndarray, exact_fallback: bool = True) -> np.ndarray:
+        """
+        Looks up the dominant planet at many points, from interpolated influence weights.
+
+        Returns:
+            array: Dominant planet index per point, shape (N,).
+        """
+        weights = self._bilinear(self._weight_layers, positions)
+        dominant = np.argmax(weights, axis=0)
+        if exact_fallback:
+            exact = np.flatnonzero(self._needs_exact(positions))
+            if len(exact):
+                dominant[exact] = get_dominant_planets(positions[exact], self._planet_pos, self._planet_mass)
+        return dominant
+
+    def _measure_error(self) -> None:
+        """Compares the cache with exact evaluation at random probe points away from planets."""
+        probes = self.rng.random((self.error_probes, 2)) * [self.width, self.height]
+        probes = probes[~self._needs_exact(probes)]
+        if len(probes) == 0:
+            return
+
+        exact_force = calculate_gravity_batch(probes, self._planet_pos, self._planet_mass)
+        cached_force = self.sample_force(probes, exact_fallback=False)
+        magnitude = np.maximum(np.linalg.norm(exact_force, axis=1), 1e-9)
+        errors = np.linalg.norm(cached_force - exact_force, axis=1) / magnitude
+
+        mismatches = np.mean(self.sample_dominant(probes, exact_fallback=False) !=
+                             get_dominant_planets(probes, self._planet_pos, self._planet_mass))
+
+        # Exponential moving averages, with the worst case seen kept separately
+        self.mean_force_error = 0.9 * self.mean_force_error + 0.1 * float(np.mean(errors))
+        self.max_force_error = max(self.max_force_error, float(np.max(errors)))
+        self.dominant_mismatch_rate = 0.9 * self.dominant_mismatch_rate + 0.1 * float(mismatches)
+
+    def error_stats(self) -> dict:
+        """Returns the measured accuracy of the cache against exact evaluation."""
+        return {"Mean force error": self.mean_force_error,
+                "Max force error": self.max_force_error,
+                "Dominant mismatch": self.dominant_mismatch_rate,
+                "Layer updates": self.layer_updates}
+
+    def hud_text(self) -> str:
+        """Short summary of error_stats() for the HUD: mean and max force error, dominant mismatch."""
+        return (f"Field err {self.mean_force_error:.1%} max {self.max_force_error:.1%}, "
+                f"dom {self.dominant_mismatch_rate:.1%}")
@@ -1,9 +1,17 @@
+import math
 import numpy as np
+from collections import deque
 from dataclasses import dataclass
-from typing import List
+from typing import Deque, List, Tuple
 from config import Config
+import kernels
 from music.harmony import ChordData
 
+QUALITY_COLOURS = {"major": (200, 100, 100),  # Red-ish for major
+                   "minor": (100, 100, 200),  # Blue-ish for minor
+                   "diminished": (150, 150, 150),  # Gray for diminished
+                   "other": (200, 200, 100)}  # Yellow-ish for others
+
 @dataclass
 class Planet:
     """
@@ -33,16 +41,7 @@ class Planet:
         """
 
 
-        quality = self.chord.flavour.lower() if self.chord.flavour else "other"
-        if quality == "maj" or quality == "maj7" or quality == "7" or quality == "maj9" or quality == "maj7#11":
-            self.color = (200, 100, 100)  # Red-ish for major
-        elif quality == "min" or quality == "minmaj7" or quality == "min7" or quality == "min7add4":
-            self.color = (100, 100, 200)  # Blue-ish for minor
-        elif quality == "dim" or quality == "dim7":
-            self.color = (150, 150, 150)  # Gray for diminished
-        else:
-            self.color = (200, 200, 100)  # Yellow-ish for others
-
+        self.color = QUALITY_COLOURS[self.chord.quality]
 
         if self.orbit_center is None or self.orbit_radius == 0.0 or self.angular_speed == 0.0:
             return
@@ -60,30 +59,40 @@ class Satellite:
         self.pos = pos.astype(float)
         self.vel = np.zeros(2, dtype=float)
         self.acc = np.zeros(2, dtype=float)
-        self.history: List[np.ndarray] = []
+        self.history: Deque[np.ndarray] = deque(maxlen=50)
         self.frozen = True
         self.show_booster = False
         self.thrust_angle = 0.0
+        self._trail_time = 0.0
 
     def apply_force(self, force: np.ndarray) -> None:
         self.acc += force
 
-    def update(self) -> None:
+    def update(self, dt: float = 1.0 / Config.FPS) -> None:
+        """
+        Integrates one time step.
+
+        Arguments:
+            dt (float): Time step in seconds. Velocities and forces are expressed
+                per display frame, so they are scaled by the fraction of a frame dt represents.
+        """
         if not self.frozen:
-            self.vel += self.acc
+            frames = dt * Config.FPS
+            self.vel += self.acc * frames
             # Limit speed
             speed = np.linalg.norm(self.vel)
             if speed > Config.MAX_SPEED:
                 self.vel = (self.vel / speed) * Config.MAX_SPEED
                 
-            self.pos += self.vel
-            self.vel *= Config.DAMPING
+            self.pos += self.vel * frames
+            self.vel *= Config.DAMPING ** frames
             self.acc *= 0
             
-            # Trail history
-            self.history.append(self.pos.copy())
-            if len(self.history) > 50:
-                self.history.pop(0)
+            # Trail history, sampled once per display frame whatever the step size
+            self._trail_time += dt
+            if self._trail_time >= 1.0 / Config.FPS:
+                self._trail_time -= 1.0 / Config.FPS
+                self.history.append(self.pos.copy())
 
     def freeze(self) -> None:
         """Hold the sattelite still while new trajectory being defined."""
@@ -92,13 +101,19 @@ class Satellite:
         self.frozen = True
 
 def calculate_gravity(sat: Satellite, planets: List[Planet]) -> np.ndarray:
+    if kernels.jit is not None and planets:
+        planet_pos, planet_mass = planet_arrays(planets)
+        return kernels.jit.gravity(np.asarray(sat.pos, dtype=float), planet_pos, planet_mass,
+                                   Config.G, Config.MIN_DISTANCE)
     total_force = np.zeros(2)
     for p in planets:
         diff = p.pos - sat.pos
-        dist = np.linalg.norm(diff)
+        # Written out rather than np.linalg.norm, whose BLAS dot product may fuse
+        # the multiply-add, so the numba kernel gets exactly the same distance
+        dist = math.sqrt(diff[0] * diff[0] + diff[1] * diff[1])
         dist = max(dist, Config.MIN_DISTANCE) # Prevent division by zero
         
-        force_mag = (Config.G * p.mass) / (dist ** 2)
+        force_mag = (Config.G * p.mass) / (dist * dist)
         total_force += (diff / dist) * force_mag
     return total_force
 
@@ -112,4 +127,50 @@ def get_dominant_planet(sat: Satellite, planets: List[Planet]) -> Planet:
         if weight > max_weight:
             max_weight = weight
             dominant = p
-    return dominant
\ No newline at end of file
+    return dominant
+
+
+def planet_arrays(planets: List[Planet]) -> Tuple[np.ndarray, np.ndarray]:
+    """
+    Packs planet positions and masses into arrays for the batched functions below.
+
+    Returns:
+        tuple: Positions with shape (P, 2) and masses with shape (P,).
+    """
+    positions = np.array([p.pos for p in planets], dtype=float)
+    masses = np.array([p.mass for p in planets], dtype=float)
+    return positions, masses
+
+def calculate_gravity_batch(positions: np.ndarray, planet_pos: np.ndarray,
+                            planet_mass: np.ndarray) -> np.ndarray:
+    """
+    Vectorized calculate_gravity for many points at once.
+
+    Args:
+        positions (array): Points with shape (N, 2).
+        planet_pos (array): Planet positions with shape (P, 2).
+        planet_mass (array): Planet masses with shape (P,).
+
+    Returns:
+        array: Total force on each point, shape (N, 2).
+    """
+    if kernels.jit is not None:
+        return kernels.jit.gravity_batch(positions, planet_pos, planet_mass, Config.G, Config.MIN_DISTANCE)
+    diff = planet_pos[None, :, :] - positions[:, None, :]
+    dist = np.maximum(np.sqrt(np.einsum('npk,npk->np', diff, diff)), Config.MIN_DISTANCE)
+    # Cubed by multiplying rather than dist ** 3, which numpy may compute with
+    # its own pow, so the numba kernel gets exactly the same result
+    scale = (Config.G * planet_mass) / (dist * dist * dist)
+    return np.einsum('npk,np->nk', diff, scale)
+
+def get_dominant_planets(positions: np.ndarray, planet_pos: np.ndarray,
+                         planet_mass: np.ndarray) -> np.ndarray:
+    """
+    Vectorized get_dominant_planet for many points at once.
+
+    Returns:
+        array: Index of the dominant planet for each point, shape (N,).
+    """
+    diff = planet_pos[None, :, :] - positions[:, None, :]
+    dist = np.sqrt(np.einsum('npk,npk->np', diff, diff))
+    return np.argmax(planet_mass / (dist + 1.0), axis=1)
@@ -1,7 +1,9 @@
+import math
 import numpy as np
 from typing import List, Tuple
-from physics.gravity import Planet, calculate_gravity
+from physics.gravity import Planet, calculate_gravity, planet_arrays
 from config import Config
+import kernels
 
 def predict_path(start_pos: np.ndarray, start_vel: np.ndarray, planets: List[Planet], steps: int = 120, dt: float = 1.0/Config.FPS) -> List[Tuple[float, float]]:
     """
@@ -11,6 +13,9 @@ def predict_path(start_pos: np.ndarray, start_vel: np.ndarray, planets: List[Pla
         steps: Number of frames to predict (120 steps = 2 seconds at 60fps)
         dt: Time step (default 1/60 seconds)
     """
+    if kernels.jit is not None and planets:
+        return _predict_path_jit(start_pos, start_vel, planets, steps, dt)
+
     path = []
     # Create temporary physics state
     temp_pos = start_pos.copy()
@@ -41,7 +46,7 @@ def predict_path(start_pos: np.ndarray, start_vel: np.ndarray, planets: List[Pla
             if self.orbit_center is None or self.orbit_radius == 0.0 or self.angular_speed == 0.0:
                 return
             self.angle += self.angular_speed * dt
-            self.pos = self.orbit_center + np.array([np.cos(self.angle), np.sin(self.angle)]) * self.orbit_radius
+            self.pos = self.orbit_center + np.array([math.cos(self.angle), math.sin(self.angle)]) * self.orbit_radius
 
     #Initialize simulation states
     ghost = GhostSat(temp_pos, temp_vel)
@@ -59,7 +64,7 @@ def predict_path(start_pos: np.ndarray, start_vel: np.ndarray, planets: List[Pla
         ghost.vel += force
 
         # Limit speed to match game settings
-        speed = np.linalg.norm(ghost.vel)
+        speed = math.sqrt(ghost.vel[0] * ghost.vel[0] + ghost.vel[1] * ghost.vel[1])
         if speed > Config.MAX_SPEED:
             ghost.vel = (ghost.vel / speed) * Config.MAX_SPEED
             
@@ -68,4 +73,22 @@ def predict_path(start_pos: np.ndarray, start_vel: np.ndarray, planets: List[Pla
 
         # 4. Record the integer coordinates for rendering
         path.append((int(ghost.pos[0]), int(ghost.pos[1])))
-    return path
\ No newline at end of file
+    return path
+
+
+def _predict_path_jit(start_pos: np.ndarray, start_vel: np.ndarray, planets: List[Planet],
+                      steps: int, dt: float) -> List[Tuple[int, int]]:
+    """predict_path on the numba kernel, with the planets' orbits packed into arrays."""
+    planet_pos, planet_mass = planet_arrays(planets)
+    orbiting = np.array([p.orbit_center is not None and p.orbit_radius != 0.0 and p.angular_speed != 0.0
+                         for p in planets])
+    centers = np.array([p.orbit_center if p.orbit_center is not None else (0.0, 0.0) for p in planets],
+                       dtype=float)
+    radii = np.array([p.orbit_radius for p in planets], dtype=float)
+    speeds = np.array([p.angular_speed for p in planets], dtype=float)
+    angles = np.array([p.angle for p in planets], dtype=float)
+    path = kernels.jit.predict_path(np.asarray(start_pos, dtype=float), np.asarray(start_vel, dtype=float),
+                                    planet_pos, planet_mass, centers, radii, speeds, angles, orbiting,
+                                    steps, dt, Config.G, Config.MIN_DISTANCE, Config.MAX_SPEED,
+                                    Config.DAMPING)
+    return list(map(tuple, path.tolist()))
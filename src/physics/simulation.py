@@ -0,0 +1,303 @@
+import threading
+import time
+from dataclasses import dataclass, replace
+from typing import Callable, List, Optional
+
+import numpy as np
+
+from config import Config
+from music.harmony import ChordData
+from physics.field import InfluenceField
+from physics.gravity import Planet, Satellite, calculate_gravity_batch, get_dominant_planets, planet_arrays
+from physics.swarm import SatelliteSwarm, SwarmState
+
+
+@dataclass
+class SatelliteState:
+    """
+    Read-only copy of the satellite, with the attributes the renderer uses.
+    """
+    pos: np.ndarray
+    vel: np.ndarray
+    history: List[np.ndarray]
+    frozen: bool
+    show_booster: bool
+    thrust_angle: float
+
+
+@dataclass
+class PlanetState:
+    """
+    Read-only copy of a planet, with the attributes the renderer and
+    predict_path use.
+    """
+    pos: np.ndarray
+    mass: float
+    chord: ChordData
+    radius: float
+    orbit_center: Optional[np.ndarray]
+    orbit_radius: float
+    angular_speed: float
+    angle: float
+    color: tuple
+
+
+@dataclass
+class WorldSnapshot:
+    """
+    The state of the world after a physics step.
+
+    Attributes:
+        sim_time (float): Simulated seconds since the simulation started.
+        sat (SatelliteState): The satellite.
+        planets (list): One PlanetState per planet, in the original order.
+        dominant_index (int): Index of the planet with the strongest pull on the satellite.
+        swarm (SwarmState): The satellite swarm.
+    """
+    sim_time: float
+    sat: SatelliteState
+    planets: List[PlanetState]
+    dominant_index: int
+    swarm: SwarmState
+
+    @property
+    def dominant_planet(self) -> PlanetState:
+        return self.planets[self.dominant_index]
+
+
+class PhysicsSimulation:
+    """
+    Runs the planets and the satellite at a fixed rate, independently of the
+    display frame rate.
+
+    Time is consumed with an accumulator: real elapsed time is added to it, and
+    whole steps of 1/rate seconds are taken out. The simulation can be driven
+    by its own thread (start/stop) or stepped manually with advance(), e.g. on
+    a simulated clock. Readers get copies through snapshot(), optionally
+    interpolated between the last two steps for smooth rendering.
+    """
+
+    def __init__(self, planets: List[Planet], sat: Satellite,
+                 swarm: Optional[SatelliteSwarm] = None,
+                 field: Optional[InfluenceField] = None,
+                 rate: int = Config.PHYSICS_RATE,
+                 clock: Callable[[], float] = time.perf_counter) -> None:
+        """
+        Args:
+            planets (list): The planets; owned by the simulation from now on.
+            sat (Satellite): The satellite; owned by the simulation from now on.
+            swarm (SatelliteSwarm): Extra satellites; an empty swarm if not given.
+            field (InfluenceField): Optional grid cache used for the swarm's gravity.
+            rate (int): Physics steps per second.
+            clock (callable): Monotonic clock in seconds, used by the thread.
+        """
+        self.planets = planets
+        self.sat = sat
+        self.swarm = swarm if swarm is not None else SatelliteSwarm()
+        self.field = field
+        self.dt = 1.0 / rate
+        self.sim_time = 0.0
+        self._clock = clock
+        self._accumulator = 0.0
+        self._thrust = None
+        self._lock = threading.Lock()
+        self._thread = None
+        self._running = False
+        # Optional profiler.RateTimer for the thread's wake-ups, e.g. the engine's
+        self.timer = None
+
+        self.dominant_index = int(get_dominant_planets(self.sat.pos[None, :], *planet_arrays(planets))[0])
+        self._current = self._make_snapshot()
+        self._previous = self._current
+        self._current_wall_time = self._clock()
+
+    # Thread control
+    def start(self) -> None:
+        """Starts stepping the simulation on a background thread."""
+        if self._thread is not None:
+            return
+        self._running = True
+        self._thread = threading.Thread(target=self._run, daemon=True)
+        self._thread.start()
+
+    def stop(self) -> None:
+        """Stops the background thread, if running."""
+        self._running = False
+        if self._thread is not None:
+            self._thread.join()
+            self._thread = None
+
+    def _run(self) -> None:
+        previous = due = self._clock()
+        while self._running:
+            now = self._clock()
+            self.advance(now - previous)
+            previous = now
+            # Sleep until the next step is due
+            delay = max(0.0, self.dt - self._accumulator)
+            if self.timer is not None:
+                end = self._clock()
+                self.timer.record(now - due, end - now, now)
+                due = end + delay
+            time.sleep(delay)
+
+    # Stepping
+    def advance(self, elapsed: float) -> int:
+        """
+        Adds elapsed time to the accumulator and takes as many fixed steps as fit.
+
+        Args:
+            elapsed (float): Seconds since the last call. Clamped to
+                Config.MAX_FRAME_TIME so a long stall doesn't cause a spiral of catch-up steps.
+
+        Returns:
+            int: The number of steps taken.
+        """
+        self._accumulator += min(elapsed, Config.MAX_FRAME_TIME)
+        steps = int(self._accumulator / self.dt)
+        for i in range(steps):
+            # Only the last two steps are ever read, so skip the snapshots of the others
+            self.step(publish=i >= steps - 2)
+            self._accumulator -= self.dt
+        return steps
+
+    def step(self, publish: bool = True) -> None:
+        """
+        Advances the world by exactly one fixed step.
+
+        Args:
+            publish (bool): Make the new state available to snapshot().
+        """
+        with self._lock:
+            for p in self.planets:
+                p.update(self.dt)
+            planet_pos, planet_mass = planet_arrays(self.planets)
+
+            if self._thrust is not None:
+                self.sat.apply_force(self._thrust)
+            self.sat.apply_force(calculate_gravity_batch(self.sat.pos[None, :], planet_pos, planet_mass)[0])
+            self.sat.update(self.dt)
+            if self.field is not None:
+                self.field.update(planet_pos, planet_mass)
+            self.swarm.update(self.dt, planet_pos, planet_mass, self.field)
+
+            self.dominant_index = int(get_dominant_planets(self.sat.pos[None, :], planet_pos, planet_mass)[0])
+            self.sim_time += self.dt
+
+            if publish:
+                self._previous = self._current
+                self._current = self._make_snapshot()
+                self._current_wall_time = self._clock()
+
+    # Commands (safe to call from any thread)
+    def freeze(self) -> None:
+        """Holds the satellite still while a new launch is being aimed."""
+        with self._lock:
+            self.sat.freeze()
+
+    def launch(self, velocity: np.ndarray) -> None:
+        """Releases the satellite with the given velocity (pixels per frame)."""
+        with self._lock:
+            self.sat.frozen = False
+            self.sat.acc = np.zeros(2)
+            self.sat.vel = np.asarray(velocity, dtype=float)
+
+    def apply_impulse(self, force: np.ndarray) -> None:
+        """Applies a one-off change of velocity, e.g. from a single key press."""
+        with self._lock:
+            if not self.sat.frozen:
+                self.sat.vel += force
+            self.sat.show_booster = True
+
+    def set_thrust(self, force: Optional[np.ndarray], thrust_angle: float = 0.0) -> None:
+        """
+        Sets a force applied on every step until changed, e.g. while a key is held.
+
+        Args:
+            force (array or None): Force per frame, or None to stop thrusting.
+            thrust_angle (float): Angle of the booster flame, for rendering.
+        """
+        with self._lock:
+            self._thrust = None if force is None else np.asarray(force, dtype=float)
+            self.sat.show_booster = force is not None
+            self.sat.thrust_angle = thrust_angle
+
+    def launch_swarm(self, pos: np.ndarray, velocities: np.ndarray) -> List[int]:
+        """
+        Adds satellites to the swarm, all starting from the same position.
+
+        Args:
+            pos (array): Starting position.
+            velocities (array): One velocity per new satellite, shape (N, 2).
+
+        Returns:
+            list: The swarm slots used.
+        """
+        with self._lock:
+            return [self.swarm.launch(pos, vel) for vel in velocities]
+
+    def clear_swarm(self) -> None:
+        """Removes every swarm satellite."""
+        with self._lock:
+            self.swarm.clear()
+
+    def set_field(self, field: Optional[InfluenceField]) -> None:
+        """Enables (or, with None, disables) the influence field cache."""
+        with self._lock:
+            self.field = field
+
+    def set_chords(self, chords: List[ChordData]) -> None:
+        """Assigns one chord per planet, e.g. from a GA result."""
+        with self._lock:
+            for planet, chord in zip(self.planets, chords):
+                planet.chord = chord
+
+    def clock(self) -> float:
+        """
+        Continuous simulated time: the time of the latest step, plus the wall-clock
+        time since then (at most one step). Stops when the simulation stalls, so
+        anything timed by it stays in step with the physics.
+        """
+        with self._lock:
+            sim_time, step_wall_time = self.sim_time, self._current_wall_time
+        return sim_time + min(self._clock() - step_wall_time, self.dt)
+
+    # Snapshots
+    def _make_snapshot(self) -> WorldSnapshot:
+        sat = self.sat
+        return WorldSnapshot(
+            sim_time=self.sim_time,
+            sat=SatelliteState(pos=sat.pos.copy(), vel=sat.vel.copy(),
+                               history=list(sat.history), frozen=sat.frozen,
+                               show_booster=sat.show_booster, thrust_angle=sat.thrust_angle),
+            planets=[PlanetState(pos=p.pos.copy(), mass=p.mass, chord=p.chord, radius=p.radius,
+                                 orbit_center=p.orbit_center, orbit_radius=p.orbit_radius,
+                                 angular_speed=p.angular_speed, angle=p.angle, color=p.color)
+                     for p in self.planets],
+            dominant_index=self.dominant_index,
+            swarm=self.swarm.state(),
+        )
+
+    def snapshot(self, interpolate: bool = False) -> WorldSnapshot:
+        """
+        Returns the state after the latest step.
+
+        Args:
+            interpolate (bool): If True, blend positions between the last two
+                steps according to how much wall-clock time has passed since the
+                latest one. This renders one step behind, but without judder.
+                Interpolated snapshots also carry the swarm trails.
+        """
+        with self._lock:
+            previous, current = self._previous, self._current
+            since_step = self._clock() - self._current_wall_time
+            trail_state = self.swarm.state(with_trails=True) if interpolate else None
+        if not interpolate or previous is current:
+            return current if trail_state is None else replace(current, swarm=trail_state)
+
+        alpha = min(1.0, max(0.0, since_step / self.dt))
+        sat = replace(current.sat, pos=previous.sat.pos + (current.sat.pos - previous.sat.pos) * alpha)
+        planets = [replace(cur, pos=prev.pos + (cur.pos - prev.pos) * alpha)
+                   for prev, cur in zip(previous.planets, current.planets)]
+        swarm = replace(trail_state, pos=previous.swarm.pos + (current.swarm.pos - previous.swarm.pos) * alpha)
+        return replace(current, sat=sat, planets=planets, swarm=swarm)
@@ -0,0 +1,145 @@
+from dataclasses import dataclass
+from typing import Optional
+
+import numpy as np
+
+from config import Config
+from physics.field import InfluenceField
+from physics.gravity import calculate_gravity_batch, get_dominant_planets
+
+
+@dataclass
+class SwarmState:
+    """
+    Read-only copy of the swarm.
+
+    Attributes:
+        pos (array): Positions, shape (capacity, 2).
+        vel (array): Velocities, shape (capacity, 2).
+        active (array): Which slots hold a launched satellite, shape (capacity,).
+        dominant (array): Dominant planet index per slot, shape (capacity,).
+        trails (array or None): Trail points per slot, oldest first, shape
+            (capacity, trail_length, 2). Only filled in for rendering.
+        trail_counts (array or None): How many trail points are valid per slot.
+    """
+    pos: np.ndarray
+    vel: np.ndarray
+    active: np.ndarray
+    dominant: np.ndarray
+    trails: Optional[np.ndarray] = None
+    trail_counts: Optional[np.ndarray] = None
+
+
+class SatelliteSwarm:
+    """
+    Many satellites stored as arrays and integrated together.
+
+    Each slot follows the same rules as a single Satellite (per-frame velocities,
+    speed limit, damping), but gravity and dominant-planet selection are computed
+    for all slots in one batch. Trails are kept in a ring buffer shared by every
+    slot, so recording a trail point never allocates.
+    """
+
+    def __init__(self, capacity: int = Config.SWARM_CAPACITY,
+                 trail_length: int = Config.SWARM_TRAIL_LENGTH) -> None:
+        self.capacity = capacity
+        self.trail_length = trail_length
+        self.pos = np.zeros((capacity, 2))
+        self.vel = np.zeros((capacity, 2))
+        self.active = np.zeros(capacity, dtype=bool)
+        self.dominant = np.zeros(capacity, dtype=int)
+        self.launch_order = np.zeros(capacity, dtype=np.int64)
+
+        self.trail = np.zeros((capacity, trail_length, 2))
+        self.trail_counts = np.zeros(capacity, dtype=int)
+        self._trail_head = 0
+        self._trail_time = 0.0
+        self._launches = 0
+
+    @property
+    def count(self) -> int:
+        return int(np.count_nonzero(self.active))
+
+    def launch(self, pos: np.ndarray, vel: np.ndarray) -> int:
+        """
+        Adds a satellite, replacing the oldest one if the swarm is full.
+
+        Returns:
+            int: The slot index, which doubles as the satellite's voice id.
+        """
+        free = np.flatnonzero(~self.active)
+        slot = int(free[0]) if len(free) else int(np.argmin(self.launch_order))
+        self.pos[slot] = pos
+        self.vel[slot] = vel
+        self.active[slot] = True
+        self.trail_counts[slot] = 0
+        self._launches += 1
+        self.launch_order[slot] = self._launches
+        return slot
+
+    def clear(self) -> None:
+        """Removes every satellite."""
+        self.active[:] = False
+        self.trail_counts[:] = 0
+
+    def update(self, dt: float, planet_pos: np.ndarray, planet_mass: np.ndarray,
+               field: Optional[InfluenceField] = None) -> None:
+        """
+        Integrates one time step for every active satellite.
+
+        Args:
+            dt (float): Time step in seconds.
+            planet_pos (array): Planet positions, shape (P, 2).
+            planet_mass (array): Planet masses, shape (P,).
+            field (InfluenceField): If given, gravity and dominant planets are
+                looked up in it instead of being evaluated exactly.
+        """
+        idx = np.flatnonzero(self.active)
+        if len(idx) == 0:
+            return
+
+        frames = dt * Config.FPS
+        pos = self.pos[idx]
+        if field is not None:
+            force = field.sample_force(pos)
+        else:
+            force = calculate_gravity_batch(pos, planet_pos, planet_mass)
+        vel = self.vel[idx] + force * frames
+
+        # Limit speed
+        speed = np.sqrt(np.einsum('nk,nk->n', vel, vel))
+        too_fast = speed > Config.MAX_SPEED
+        vel[too_fast] *= (Config.MAX_SPEED / speed[too_fast])[:, None]
+
+        pos += vel * frames
+        vel *= Config.DAMPING ** frames
+        self.pos[idx] = pos
+        self.vel[idx] = vel
+        if field is not None:
+            self.dominant[idx] = field.sample_dominant(pos)
+        else:
+            self.dominant[idx] = get_dominant_planets(pos, planet_pos, planet_mass)
+
+        # Trail history, sampled once per display frame
+        self._trail_time += dt
+        if self._trail_time >= 1.0 / Config.FPS:
+            self._trail_time -= 1.0 / Config.FPS
+            self.trail[idx, self._trail_head] = pos
+            self.trail_counts[idx] = np.minimum(self.trail_counts[idx] + 1, self.trail_length)
+            self._trail_head = (self._trail_head + 1) % self.trail_length
+
+    def state(self, with_trails: bool = False) -> SwarmState:
+        """
+        Returns a copy of the swarm.
+
+        Args:
+            with_trails (bool): Also copy the trails, reordered oldest first.
+                This is the expensive part, so only the renderer asks for it.
+        """
+        trails = trail_counts = None
+        if with_trails:
+            order = (np.arange(self.trail_length) + self._trail_head) % self.trail_length
+            trails = self.trail[:, order]
+            trail_counts = self.trail_counts.copy()
+        return SwarmState(pos=self.pos.copy(), vel=self.vel.copy(), active=self.active.copy(),
+                          dominant=self.dominant.copy(), trails=trails, trail_counts=trail_counts)
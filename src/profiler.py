@@ -0,0 +1,237 @@
+"""
+Per-stage frame-time profiler for the main loop.
+
+The loop calls begin_frame() at the top of each frame and mark(name) at the
+end of each stage; a stage's time is from the previous mark. Durations go
+into a fixed ring buffer of the last `capacity` frames, from which the HUD
+shows rolling percentiles and write_trace() exports a Chrome trace (open it
+in chrome://tracing or https://ui.perfetto.dev), along with the ticks of the
+engine tasks' RateTimers. While disabled, begin_frame() and mark() return
+straight away, so the calls can stay in the loop.
+"""
+import json
+import time
+from typing import Callable, Dict, List, Sequence, Tuple
+
+import numpy as np
+
+from config import Config
+
+MAX_STAGES = 16
+
+
+class FrameProfiler:
+    """Times each stage of every frame with a monotonic high-resolution clock."""
+
+    def __init__(self, enabled: bool = Config.PROFILE, capacity: int = Config.PROFILE_FRAMES,
+                 clock: Callable[[], float] = time.perf_counter) -> None:
+        """
+        Args:
+            enabled (bool): Start profiling straight away.
+            capacity (int): Frames kept for statistics and the trace.
+            clock (callable): Monotonic clock in seconds.
+        """
+        self.enabled = enabled
+        self.capacity = capacity
+        self.clock = clock
+        self.stages: List[str] = []
+        self._index: Dict[str, int] = {}
+        self.frame_starts = np.zeros(capacity)
+        self.starts = np.zeros((capacity, MAX_STAGES))
+        self.durations = np.zeros((capacity, MAX_STAGES))  # Zero for stages a frame didn't run
+        self.frames = 0  # Completed frames recorded
+        # The frame in progress is accumulated in lists, which are cheaper to update than arrays
+        self._frame_start = None
+        self._starts = [0.0] * MAX_STAGES
+        self._durations = [0.0] * MAX_STAGES
+        self._last = 0.0
+
+    def toggle(self) -> None:
+        """Turns profiling on or off. Recorded frames are kept."""
+        self.enabled = not self.enabled
+        self._frame_start = None
+
+    def begin_frame(self) -> None:
+        """Ends the previous frame and starts a new one; the first stage is timed from here."""
+        if not self.enabled:
+            return
+        now = self.clock()
+        if self._frame_start is not None:
+            row = self.frames % self.capacity
+            self.frame_starts[row] = self._frame_start
+            self.starts[row] = self._starts
+            self.durations[row] = self._durations
+            self.frames += 1
+            self._durations = [0.0] * MAX_STAGES
+        self._frame_start = now
+        self._last = now
+
+    def mark(self, name: str) -> None:
+        """Ends the stage called name, which began at the previous mark or the frame start."""
+        if not self.enabled or self._frame_start is None:
+            return
+        now = self.clock()
+        i = self._index.get(name)
+        if i is None:
+            if len(self.stages) == MAX_STAGES:
+                return
+            i = self._index[name] = len(self.stages)
+            self.stages.append(name)
+        if self._durations[i] == 0.0:
+            self._starts[i] = self._last
+        self._durations[i] += now - self._last
+        self._last = now
+
+    def _recent(self, window: int) -> np.ndarray:
+        """Durations of the last `window` frames, in recording order, in ms."""
+        n = min(self.frames, self.capacity, window)
+        rows = np.arange(self.frames - n, self.frames) % self.capacity
+        return self.durations[rows, :len(self.stages)] * 1000.0
+
+    def stats(self, window: int = Config.PROFILE_WINDOW) -> Dict[str, dict]:
+        """
+        p50, p99 and max per stage (ms), plus the whole frame, over the last
+        `window` frames. A stage's percentiles only count the frames it ran
+        in, so one that runs now and then (e.g. Predict path, while aiming)
+        isn't shown as taking no time; stages that didn't run are left out.
+        """
+        recent = self._recent(window)
+        if len(recent) == 0:
+            return {}
+        columns = {name: values[values > 0.0] for name, values in zip(self.stages, recent.T)}
+        columns["Frame"] = recent.sum(axis=1)
+        return {name: {"p50": float(np.percentile(values, 50)), "p99": float(np.percentile(values, 99)),
+                       "max": float(values.max()), "frames": len(values)}
+                for name, values in columns.items() if len(values)}
+
+    def hud_lines(self, window: int = Config.PROFILE_WINDOW) -> List[str]:
+        """One line per stage for the HUD overlay."""
+        stats = self.stats(window)
+        if not stats:
+            return ["Profiling..."]
+        return [f"{name}: {s['p50']:.2f} / {s['p99']:.2f} ms" for name, s in stats.items()]
+
+    def write_trace(self, path: str, timers: Sequence["RateTimer"] = ()) -> None:
+        """
+        Writes the recorded frames as a Chrome trace (JSON trace event format),
+        with each of the timers' ticks over the same span on a track of its own.
+        """
+        n = min(self.frames, self.capacity)
+        rows = np.arange(self.frames - n, self.frames) % self.capacity
+        origin = self.frame_starts[rows[0]] if n else 0.0
+        events = [{"name": "thread_name", "ph": "M", "pid": 0, "tid": tid, "args": {"name": name}}
+                  for tid, name in enumerate(["Frame", "Render stages"] + [timer.name for timer in timers])]
+        end = origin
+        for row in rows:
+            frame_end = self.frame_starts[row]
+            for i, name in enumerate(self.stages):
+                duration = self.durations[row, i]
+                if duration > 0.0:
+                    start = self.starts[row, i]
+                    events.append({"name": name, "cat": "stage", "ph": "X", "pid": 0, "tid": 1,
+                                   "ts": (start - origin) * 1e6, "dur": duration * 1e6})
+                    frame_end = max(frame_end, start + duration)
+            events.append({"name": "Frame", "cat": "frame", "ph": "X", "pid": 0, "tid": 0,
+                           "ts": (self.frame_starts[row] - origin) * 1e6,
+                           "dur": (frame_end - self.frame_starts[row]) * 1e6})
+            end = max(end, frame_end)
+        for tid, timer in enumerate(timers, start=2):
+            starts, work = timer.spans()
+            within = (starts >= origin) & (starts <= end)
+            for start, duration in zip(starts[within].tolist(), work[within].tolist()):
+                events.append({"name": timer.name, "cat": "task", "ph": "X", "pid": 0, "tid": tid,
+                               "ts": (start - origin) * 1e6, "dur": duration * 1e6})
+        with open(path, "w") as f:
+            json.dump({"traceEvents": events, "displayTimeUnit": "ms"}, f)
+
+
+class RateTimer:
+    """
+    Work time and wake-up lateness of a task that runs at a fixed rate. One
+    per engine task, so each can be measured on its own. Keeps as many ticks
+    as cover the frame profiler's trace, so write_trace() can put the tasks on
+    the same timeline; stats() covers the last `window` ticks.
+    """
+
+    def __init__(self, name: str, rate: float, window: int = Config.PROFILE_WINDOW,
+                 capacity: int = 0) -> None:
+        """
+        Args:
+            name (str): Shown in the HUD and the trace.
+            rate (float): Ticks per second the task aims for.
+            window (int): Ticks the percentiles cover.
+            capacity (int): Ticks kept; by default as many as PROFILE_FRAMES frames last.
+        """
+        self.name = name
+        self.rate = rate
+        self.window = window
+        self.capacity = capacity or max(window, int(rate * Config.PROFILE_FRAMES / Config.FPS))
+        self.starts = np.zeros(self.capacity)
+        self.work = np.zeros(self.capacity)
+        self.lateness = np.zeros(self.capacity)
+        self.ticks = 0
+
+    def record(self, lateness: float, work: float, start: float) -> None:
+        """Records a tick that started at `start` (on the profiler's clock), `lateness` after it was due."""
+        i = self.ticks % self.capacity
+        self.starts[i] = start
+        self.lateness[i] = lateness
+        self.work[i] = work
+        self.ticks += 1
+
+    def _rows(self, count: int) -> np.ndarray:
+        """Ring-buffer rows of the last `count` ticks, oldest first."""
+        n = min(self.ticks, self.capacity, count)
+        return np.arange(self.ticks - n, self.ticks) % self.capacity
+
+    def stats(self) -> dict:
+        """p50/p99 work and lateness in ms."""
+        rows = self._rows(self.window)
+        if len(rows) == 0:
+            return {}
+        work = self.work[rows] * 1000.0
+        lateness = self.lateness[rows] * 1000.0
+        return {"Work p50": float(np.percentile(work, 50)), "Work p99": float(np.percentile(work, 99)),
+                "Late p50": float(np.percentile(lateness, 50)), "Late p99": float(np.percentile(lateness, 99))}
+
+    def spans(self) -> Tuple[np.ndarray, np.ndarray]:
+        """Start times and work times (s) of the ticks kept, oldest first."""
+        rows = self._rows(self.capacity)
+        return self.starts[rows], self.work[rows]
+
+    def hud_line(self) -> str:
+        stats = self.stats()
+        if not stats:
+            return f"{self.name}: -"
+        return (f"{self.name} {self.rate:g}Hz: {stats['Work p50']:.2f} / {stats['Work p99']:.2f} ms, "
+                f"late {stats['Late p99']:.1f}")
+
+
+class StartupReport:
+    """
+    Times the phases of startup, each from the end of the previous one, up to
+    the first frame.
+    """
+
+    def __init__(self, enabled: bool = True, clock: Callable[[], float] = time.perf_counter) -> None:
+        self.enabled = enabled
+        self.clock = clock
+        self.start = clock()
+        self.phases: List[Tuple[str, float]] = []  # (name, seconds)
+        self._last = self.start
+
+    def mark(self, name: str) -> None:
+        """Ends the phase called name."""
+        now = self.clock()
+        self.phases.append((name, now - self._last))
+        self._last = now
+
+    def lines(self) -> List[str]:
+        lines = [f"{name:28s}{seconds * 1000.0:9.1f} ms" for name, seconds in self.phases]
+        lines.append(f"{'Total':28s}{(self._last - self.start) * 1000.0:9.1f} ms")
+        return lines
+
+    def print(self) -> None:
+        if self.enabled:
+            print("Startup:\n  " + "\n  ".join(self.lines()))
+
@@ -0,0 +1,123 @@
+"""
+Replays a session log written with Config.SESSION_LOG, either live to a MIDI
+port with the original timing, or to a Standard MIDI File.
+
+Note events and panics go back through a MIDIScheduler exactly as they left
+the original one, so the output matches what was played. The log is read in
+chunks straight from its memory map, so arbitrarily long logs replay in
+constant memory (apart from the MIDI file being built, when writing one).
+
+Examples:
+    python replay.py blastov_session.blog
+    python replay.py blastov_session.blog --out session.mid
+    python replay.py blastov_session.blog --summary
+"""
+import argparse
+import time
+
+import numpy as np
+
+from config import Config
+from music.harmony import SCALE_FLAVOURS, int_to_note
+from music.midi_file import MIDIFileWriter
+from music.midi_output import MIDIHandler
+from music.scheduler import NOTE_ON
+from session_log import KEY, KIND_NAMES, PANIC, read_log
+
+CHUNK = 4096  # Records read from the log at a time
+
+
+def is_output(kinds: np.ndarray) -> np.ndarray:
+    """Mask of the events that affect MIDI output: notes and panics."""
+    return (kinds <= NOTE_ON) | (kinds == PANIC)
+
+
+def note_chunks(records: np.ndarray):
+    """Yields the output events of the log as lists of (time, kind, note, velocity, channel)."""
+    for start in range(0, len(records), CHUNK):
+        chunk = records[start:start + CHUNK]
+        notes = chunk[is_output(chunk["kind"])]
+        if len(notes):
+            yield list(zip(notes["time"].tolist(), notes["kind"].tolist(), notes["a"].tolist(),
+                           notes["b"].tolist(), notes["channel"].tolist()))
+
+
+def replay_to_file(records: np.ndarray, path: str) -> int:
+    """Writes the log's notes to a .mid file. Returns the number of MIDI events written."""
+    writer = MIDIFileWriter()
+    last_time = 0.0
+    for notes in note_chunks(records):
+        for t, kind, note, velocity, channel in notes:
+            if kind == PANIC:
+                writer.update(t)
+                writer.panic()
+            else:
+                writer.scheduler.schedule(t, kind, note, velocity, channel)
+        # Events at the chunk's last timestamp may continue in the next chunk, so hold them back
+        last_time = notes[-1][0]
+        writer.update(np.nextafter(last_time, -np.inf))
+    writer.update(last_time)
+    writer.save(path)
+    return len(writer.events)
+
+
+def replay_live(records: np.ndarray, port_name: str, backend: str = Config.MIDI_BACKEND) -> None:
+    """Sends the log's notes to a MIDI port in real time, from the first note on."""
+    times = records["time"][is_output(records["kind"])]
+    if len(times) == 0:
+        return
+    # Start a little before the first note, so it can be scheduled ahead like the rest
+    start = time.perf_counter() - times[0] + Config.LOOKAHEAD
+    midi = MIDIHandler(port_name, clock=lambda: time.perf_counter() - start, backend=backend)
+    if not midi.out_port:
+        return
+    try:
+        for notes in note_chunks(records):
+            for t, kind, note, velocity, channel in notes:
+                while t > midi.clock() + Config.LOOKAHEAD:
+                    time.sleep(Config.LOOKAHEAD / 2)
+                if kind == PANIC:
+                    time.sleep(max(0.0, t - midi.clock()))
+                    midi.scheduler.clear()
+                else:
+                    midi.scheduler.schedule(t, kind, note, velocity, channel)
+        while midi.scheduler.next_time() is not None:
+            time.sleep(Config.LOOKAHEAD / 2)
+    except KeyboardInterrupt:
+        pass
+    midi.panic()
+
+
+def summary(records: np.ndarray) -> str:
+    """Event counts, duration and key changes of a log."""
+    if len(records) == 0:
+        return "Empty log"
+    kinds = records["kind"]
+    lines = [f"{len(records)} events over {records['time'][-1] - records['time'][0]:.1f}s"]
+    for kind, name in KIND_NAMES.items():
+        lines.append(f"  {name}: {np.count_nonzero(kinds == kind)}")
+    for record in records[kinds == KEY]:
+        lines.append(f"  {record['time']:8.2f}s key {int_to_note[record['a']]}{SCALE_FLAVOURS[record['b']]}")
+    return "\n".join(lines)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Replay a Blastov session log.")
+    parser.add_argument("log", help="Session log to replay.")
+    parser.add_argument("--out", help="Write a .mid file instead of playing live.")
+    parser.add_argument("--port", default=Config.MIDI_PORT_NAME, help="MIDI port to play to.")
+    parser.add_argument("--summary", action="store_true", help="Only print what the log contains.")
+    args = parser.parse_args()
+
+    records = read_log(args.log)
+    if args.summary:
+        print(summary(records))
+    elif args.out:
+        count = replay_to_file(records, args.out)
+        print(f"{count} MIDI events -> {args.out}")
+    else:
+        replay_live(records, args.port)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,158 @@
+"""
+Compact binary log of everything musical and every control input in a session.
+
+Each event is one fixed-size record appended to a memory-mapped file, so
+logging costs a struct.pack_into per event, creates no Python objects that
+outlive the call, and the file can grow indefinitely: when the mapping fills
+up, the file is extended by Config.SESSION_LOG_CHUNK records and mapped again.
+The header holds the record count and is updated on every append, so a log
+is readable up to its last event even if Blastov is killed.
+
+Records are (time, kind, channel, a, b, x, y). Times are simulated seconds,
+the timebase the MIDI scheduler uses. The meaning of the other fields depends
+on the kind:
+
+    NOTE_OFF, NOTE_ON  channel, a=note, b=velocity
+    KEY                a=scale root, b=scale type_id (index into SCALE_FLAVOURS)
+    QUEEN              channel=planet, a=chord root, b=chord type_id (index into CHORD_TYPES)
+    LAUNCH             x, y=launch velocity
+    THRUST             x, y=thrust force, (0, 0) when released
+    SWARM              a=satellites launched, x, y=launch position
+    FREEZE             (none)
+    PANIC              (none); every sounding note was stopped
+
+Note events are logged as the scheduler takes them from its queue, including
+note-offs of overlapping notes it doesn't send, and so are its panics, so
+replaying them through a MIDIScheduler reproduces the original output exactly. See replay.py.
+"""
+import mmap
+import os
+import struct
+import threading
+from typing import List
+
+import numpy as np
+
+from config import Config
+from music.scheduler import NOTE_OFF, NOTE_ON
+
+MAGIC = b"BLASTLOG"
+VERSION = 1
+
+# Event kinds; note kinds are the scheduler's own
+KEY = 3
+QUEEN = 4
+LAUNCH = 5
+THRUST = 6
+SWARM = 7
+FREEZE = 8
+PANIC = 9
+
+KIND_NAMES = {NOTE_OFF: "note_off", NOTE_ON: "note_on", KEY: "key", QUEEN: "queen",
+              LAUNCH: "launch", THRUST: "thrust", SWARM: "swarm", FREEZE: "freeze", PANIC: "panic"}
+
+RECORD = struct.Struct("<dBBhhff2x")
+HEADER = struct.Struct("<8sHHQ4x")  # Magic, version, record size, record count
+assert HEADER.size == RECORD.size
+
+# The same layout, for reading a log without unpacking it record by record
+RECORD_DTYPE = np.dtype([("time", "<f8"), ("kind", "u1"), ("channel", "u1"), ("a", "<i2"),
+                         ("b", "<i2"), ("x", "<f4"), ("y", "<f4"), ("pad", "V2")])
+
+class SessionLog:
+    """Append-only, memory-mapped event log. Safe to append to from several threads."""
+
+    def __init__(self, path: str = Config.SESSION_LOG_PATH,
+                 chunk_records: int = Config.SESSION_LOG_CHUNK) -> None:
+        """
+        Args:
+            path (str): File to write; an existing file is replaced.
+            chunk_records (int): Records the file grows by each time it fills up.
+        """
+        self.path = path
+        self.chunk_records = chunk_records
+        self.count = 0
+        self._lock = threading.Lock()
+        self._file = open(path, "w+b")
+        self._capacity = 0
+        self._map = None
+        self._grow()
+
+    def _grow(self) -> None:
+        if self._map is not None:
+            self._map.close()
+        self._capacity += self.chunk_records
+        self._file.truncate(RECORD.size * (self._capacity + 1))
+        self._map = mmap.mmap(self._file.fileno(), 0)
+        HEADER.pack_into(self._map, 0, MAGIC, VERSION, RECORD.size, self.count)
+
+    def append(self, time: float, kind: int, channel: int = 0, a: int = 0, b: int = 0,
+               x: float = 0.0, y: float = 0.0) -> None:
+        """Appends one record. See the module docstring for what the fields hold."""
+        with self._lock:
+            if self._map is None:
+                return
+            if self.count == self._capacity:
+                self._grow()
+            self.count += 1
+            RECORD.pack_into(self._map, RECORD.size * self.count, time, kind, channel, a, b, x, y)
+            HEADER.pack_into(self._map, 0, MAGIC, VERSION, RECORD.size, self.count)
+
+    def note(self, time: float, kind: int, note: int, velocity: int, channel: int) -> None:
+        self.append(time, kind, channel, note, velocity)
+
+    def key(self, time: float, scale) -> None:
+        self.append(time, KEY, 0, scale.root, scale.type_id)
+
+    def queen(self, time: float, chords: List) -> None:
+        for i, chord in enumerate(chords):
+            self.append(time, QUEEN, i, chord.root, chord.type_id)
+
+    def launch(self, time: float, velocity: np.ndarray) -> None:
+        self.append(time, LAUNCH, x=velocity[0], y=velocity[1])
+
+    def thrust(self, time: float, force) -> None:
+        x, y = (0.0, 0.0) if force is None else force
+        self.append(time, THRUST, x=x, y=y)
+
+    def swarm(self, time: float, position: np.ndarray, count: int) -> None:
+        self.append(time, SWARM, a=count, x=position[0], y=position[1])
+
+    def freeze(self, time: float) -> None:
+        self.append(time, FREEZE)
+
+    def panic(self, time: float) -> None:
+        self.append(time, PANIC)
+
+    def close(self) -> None:
+        """Trims the file to the records written and closes it."""
+        with self._lock:
+            if self._map is None:
+                return
+            self._map.flush()
+            self._map.close()
+            self._map = None
+            self._file.truncate(RECORD.size * (self.count + 1))
+            self._file.close()
+
+
+def read_log(path: str) -> np.ndarray:
+    """
+    Maps a log for reading, without loading it into memory.
+
+    Returns:
+        np.ndarray: Records as a structured array with fields time, kind,
+            channel, a, b, x and y.
+    """
+    with open(path, "rb") as f:
+        magic, version, record_size, count = HEADER.unpack(f.read(HEADER.size))
+    if magic != MAGIC or record_size != RECORD.size:
+        raise ValueError(f"{path} is not a Blastov session log")
+    if version != VERSION:
+        raise ValueError(f"{path} is log version {version}, expected {VERSION}")
+    # Trust the header over the file size: the tail of a file that wasn't closed is preallocated
+    available = os.path.getsize(path) // RECORD.size - 1
+    if min(count, available) == 0:
+        return np.zeros(0, dtype=RECORD_DTYPE)
+    return np.memmap(path, dtype=RECORD_DTYPE, mode="r", offset=HEADER.size,
+                     shape=(min(count, available),))
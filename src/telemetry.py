@@ -0,0 +1,206 @@
+"""
+Memory telemetry for long-running sessions.
+
+A background thread samples, every `interval` seconds:
+
+    rss       resident set size of the process
+    traced    memory allocated by Python, and the top allocation sites by
+              growth since the previous sample (with Config.TELEMETRY_TRACEMALLOC)
+    objects   live instances of the types most likely to pile up
+    gauges    lengths of queues and buffers registered with watch()
+
+Each sample is appended as a JSON line to a rolling log, which is moved to
+<path>.1 when it reaches `max_bytes`. A metric that keeps growing, i.e. whose
+median over the most recent third of the last `window` samples is more than
+`growth` above its median over the oldest third, is reported with a warning,
+once until it settles again. Sampling holds the GIL for a few milliseconds
+(longer with many objects), so it's off by default.
+
+    python telemetry.py blastov_memory.jsonl
+
+summarises a log.
+"""
+import argparse
+import gc
+import json
+import os
+import resource
+import threading
+import time
+import tracemalloc
+from collections import deque
+from typing import Callable, Deque, Dict, List, Optional
+
+import numpy as np
+
+from config import Config
+
+# Types whose live instances are counted; by name, so their modules needn't be imported
+WATCHED_TYPES = ("SolarSystemChromosome", "PlanetGene", "ChordData", "ScaleData", "Message")
+
+
+def rss_bytes() -> int:
+    """Current resident set size, or the peak where /proc isn't available."""
+    try:
+        with open("/proc/self/statm") as f:
+            return int(f.read().split()[1]) * os.sysconf("SC_PAGE_SIZE")
+    except (OSError, ValueError):
+        peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+        return peak if os.uname().sysname == "Darwin" else peak * 1024
+
+
+def count_objects(type_names=WATCHED_TYPES) -> Dict[str, int]:
+    """Live instances of each named type, among objects tracked by the garbage collector."""
+    counts = dict.fromkeys(type_names, 0)
+    for obj in gc.get_objects():
+        name = type(obj).__name__
+        if name in counts:
+            counts[name] += 1
+    return counts
+
+
+class MemoryTelemetry:
+    """Periodic memory sampling with a rolling JSON-lines log and growth warnings."""
+
+    def __init__(self, path: str = Config.TELEMETRY_LOG, interval: float = Config.TELEMETRY_INTERVAL,
+                 window: int = Config.TELEMETRY_WINDOW, growth: float = Config.TELEMETRY_GROWTH,
+                 max_bytes: int = Config.TELEMETRY_LOG_MAX_BYTES, trace: bool = Config.TELEMETRY_TRACEMALLOC,
+                 top: int = 5) -> None:
+        """
+        Args:
+            path (str): Log file, one JSON sample per line.
+            interval (float): Seconds between samples.
+            window (int): Samples the growth check looks back over.
+            growth (float): Relative growth over the window that triggers a warning.
+            max_bytes (int): Size at which the log is rolled over to path + '.1'.
+            trace (bool): Record Python allocations with tracemalloc, to report the top allocators.
+            top (int): Allocation sites kept per sample.
+        """
+        self.path = path
+        self.interval = interval
+        self.window = window
+        self.growth = growth
+        self.max_bytes = max_bytes
+        self.trace = trace
+        self.top = top
+        self.gauges: Dict[str, Callable[[], float]] = {}
+        self.history: Dict[str, Deque[float]] = {}
+        self.warned: Dict[str, bool] = {}
+        self.samples = 0
+        self.start_time = time.time()
+        self._snapshot = None
+        self._stop = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+
+    def watch(self, name: str, gauge: Callable[[], float]) -> None:
+        """Samples gauge() as the metric called name, e.g. the length of a queue."""
+        self.gauges[name] = gauge
+
+    def start(self) -> None:
+        if self.trace and not tracemalloc.is_tracing():
+            tracemalloc.start()
+        self._thread = threading.Thread(target=self._run, name="telemetry", daemon=True)
+        self._thread.start()
+
+    def stop(self) -> None:
+        """Stops sampling, after taking a last sample."""
+        self._stop.set()
+        if self._thread is not None:
+            self._thread.join()
+            self._thread = None
+        self.sample()
+        if self.trace:
+            tracemalloc.stop()
+
+    def _run(self) -> None:
+        while not self._stop.wait(self.interval):
+            self.sample()
+
+    def sample(self) -> dict:
+        """Takes one sample, logs it and checks for growth."""
+        metrics = {"RSS MB": rss_bytes() / 2**20, "Threads": threading.active_count()}
+        record = {"time": round(time.time() - self.start_time, 3), "metrics": metrics}
+        if self.trace and tracemalloc.is_tracing():
+            current, peak = tracemalloc.get_traced_memory()
+            metrics["Traced MB"] = current / 2**20
+            record["traced_peak_mb"] = peak / 2**20
+            record["top"] = self._top_allocators()
+        for name, count in count_objects().items():
+            metrics[f"{name} objects"] = count
+        for name, gauge in self.gauges.items():
+            try:
+                metrics[name] = gauge()
+            except Exception as e:  # A gauge must never stop the sampling
+                metrics[name] = None
+                print(f"Telemetry gauge '{name}' failed: {e}")
+        self.samples += 1
+        self._write(record)
+        self._check_growth(metrics)
+        return record
+
+    def _top_allocators(self) -> List[dict]:
+        """The allocation sites that grew most since the previous sample."""
+        snapshot = tracemalloc.take_snapshot().filter_traces(
+            (tracemalloc.Filter(False, tracemalloc.__file__), tracemalloc.Filter(False, __file__)))
+        if self._snapshot is None:
+            stats = snapshot.statistics("lineno")
+        else:
+            stats = snapshot.compare_to(self._snapshot, "lineno")
+        self._snapshot = snapshot
+        return [{"site": f"{stat.traceback[0].filename}:{stat.traceback[0].lineno}",
+                 "kb": stat.size / 1024, "change_kb": getattr(stat, "size_diff", stat.size) / 1024,
+                 "count": stat.count}
+                for stat in stats[:self.top]]
+
+    def _write(self, record: dict) -> None:
+        try:
+            if os.path.exists(self.path) and os.path.getsize(self.path) >= self.max_bytes:
+                os.replace(self.path, self.path + ".1")
+            with open(self.path, "a") as f:
+                f.write(json.dumps(record) + "\n")
+        except OSError as e:
+            print(f"Could not write telemetry to {self.path}: {e}")
+
+    def _check_growth(self, metrics: Dict[str, float]) -> None:
+        for name, value in metrics.items():
+            if value is None:
+                continue
+            history = self.history.setdefault(name, deque(maxlen=self.window))
+            history.append(value)
+            if len(history) < self.window:
+                continue
+            values = np.array(history)
+            third = max(1, self.window // 3)
+            before, after = np.median(values[:third]), np.median(values[-third:])
+            growing = after > before * (1.0 + self.growth) and after - before >= 1
+            if growing and not self.warned.get(name):
+                print(f"Memory telemetry: '{name}' grew from {before:.1f} to {after:.1f} "
+                      f"over the last {self.window} samples ({self.window * self.interval / 60:.0f} min)")
+            self.warned[name] = growing
+
+
+def summary(path: str) -> List[str]:
+    """First, last, minimum and maximum of every metric in a telemetry log."""
+    with open(path) as f:
+        records = [json.loads(line) for line in f if line.strip()]
+    if not records:
+        return ["No samples"]
+    names = list(records[-1]["metrics"])
+    lines = [f"{len(records)} samples over {(records[-1]['time'] - records[0]['time']) / 3600:.2f} h"]
+    for name in names:
+        values = [r["metrics"].get(name) for r in records if r["metrics"].get(name) is not None]
+        if values:
+            lines.append(f"  {name:32s}{values[0]:12.1f} -> {values[-1]:12.1f}  "
+                         f"(min {min(values):.1f}, max {max(values):.1f})")
+    return lines
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Summarise a memory telemetry log.")
+    parser.add_argument("log", nargs="?", default=Config.TELEMETRY_LOG)
+    args = parser.parse_args()
+    print("\n".join(summary(args.log)))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,62 @@
+import numpy as np
+import pytest
+
+from cache import cache_key, cached_arrays
+
+
+class Builder:
+    def __init__(self, value):
+        self.value, self.calls = value, 0
+
+    def __call__(self):
+        self.calls += 1
+        return {"table": np.full(4, self.value)}
+
+
+def test_cache_key_follows_its_inputs():
+    assert cache_key("markov-1", [60, 62]) == cache_key("markov-1", [60, 62])
+    assert cache_key("markov-1", [60, 62]) != cache_key("markov-1", [60, 64])
+    assert cache_key("markov-1", [60, 62]) != cache_key("markov-2", [60, 62])
+
+
+def test_cached_arrays_builds_once_per_key(tmp_path):
+    build = Builder(1)
+    key = cache_key("table", 1)
+    first = cached_arrays("table", key, build, directory=str(tmp_path))
+    second = cached_arrays("table", key, build, directory=str(tmp_path))
+    assert build.calls == 1
+    assert np.array_equal(first["table"], second["table"])
+
+
+def test_cached_arrays_rebuilds_when_the_key_changes(tmp_path):
+    cached_arrays("table", cache_key("table", 1), Builder(1), directory=str(tmp_path))
+    build = Builder(2)
+    arrays = cached_arrays("table", cache_key("table", 2), build, directory=str(tmp_path))
+    assert build.calls == 1
+    assert arrays["table"].tolist() == [2, 2, 2, 2]
+
+
+def truncated(path):
+    with open(path, "rb") as f:
+        data = f.read()
+    return data[:len(data) // 2]
+
+
+@pytest.mark.parametrize("damage", [lambda path: b"not an npz", lambda path: b"", truncated])
+def test_cached_arrays_rebuilds_a_corrupt_file(tmp_path, damage):
+    key = cache_key("table", 1)
+    path = tmp_path / f"table-{key}.npz"
+    cached_arrays("table", key, Builder(1), directory=str(tmp_path))
+    path.write_bytes(damage(path))
+    build = Builder(1)
+    cached_arrays("table", key, build, directory=str(tmp_path))
+    assert build.calls == 1
+    assert cached_arrays("table", key, Builder(3), directory=str(tmp_path))["table"].tolist() == [1, 1, 1, 1]
+
+
+def test_cached_arrays_disabled_never_touches_the_disk(tmp_path):
+    build = Builder(1)
+    for _ in range(2):
+        cached_arrays("table", cache_key("table", 1), build, directory=str(tmp_path), enabled=False)
+    assert build.calls == 2
+    assert list(tmp_path.iterdir()) == []
@@ -0,0 +1,103 @@
+import random
+from types import SimpleNamespace
+
+import numpy as np
+import pytest
+
+import genetic_engine
+from checkpoint import GACheckpoint
+from genetic_engine import GeneticSolarSystemGenerator
+from music.harmony import get_scale
+
+
+def gene_ids(generator):
+    return [[gene.chord.id for gene in chrom.planet_genes] for chrom in generator.population]
+
+
+def test_to_arrays_keeps_large_chord_ids():
+    """Ids grow with the registry (type_id * 12 + root), past what int16 holds."""
+    random.seed(0)
+    generator = GeneticSolarSystemGenerator(population_size=20, subpop_size=5)
+    generator.population[0].planet_genes[0].chord = SimpleNamespace(id=40_000)
+    assert generator.to_arrays()["genes"].tolist() == gene_ids(generator)
+
+
+def evolved(generations=4, seed=0):
+    random.seed(seed)
+    np.random.seed(seed)
+    generator = GeneticSolarSystemGenerator(population_size=30, subpop_size=8)
+    for _ in range(generations):
+        generator.run(get_scale("GMajor"))
+    return generator
+
+
+def carry_on(generator, generations=5):
+    random.seed(1)
+    np.random.seed(1)
+    for _ in range(generations):
+        queen, resolved = generator.run(get_scale("DMinor"))
+    return gene_ids(generator), generator.last_stats, resolved
+
+
+def test_checkpoint_round_trip_resumes_the_same_evolution(tmp_path):
+    original = evolved()
+    assert len(original.subpop)  # saved mid-SORIGA, so the subpopulation has to survive too
+    checkpoint = GACheckpoint(str(tmp_path / "ga.npz"))
+    checkpoint.close(original)
+    assert checkpoint.saves == 1
+
+    restored = GeneticSolarSystemGenerator(population_size=30, subpop_size=8)
+    assert GACheckpoint(str(tmp_path / "ga.npz")).load(restored)
+    assert gene_ids(restored) == gene_ids(original)
+    assert [fit for _, fit in restored.population_with_fitness] == \
+        [fit for _, fit in original.population_with_fitness]
+    assert list(restored.subpop) == list(original.subpop)
+    assert (restored.subpop_age, restored.current_scale_steps, restored.previous_scale) == \
+        (original.subpop_age, original.current_scale_steps, original.previous_scale)
+    # Only the fitness stats are saved; the diversity ones are recomputed each generation
+    assert restored.last_stats == {name: original.last_stats[name] for name in ("Best fit", "Avg fit")}
+    assert carry_on(restored) == carry_on(original)
+
+
+def test_checkpoint_of_another_population_size_is_ignored(tmp_path):
+    path = str(tmp_path / "ga.npz")
+    GACheckpoint(path).close(evolved())
+    other = GeneticSolarSystemGenerator(population_size=40, subpop_size=8)
+    genes = gene_ids(other)
+    assert not GACheckpoint(path).load(other)
+    assert gene_ids(other) == genes
+
+
+def state(generator):
+    return (gene_ids(generator), [fit for _, fit in generator.population_with_fitness], list(generator.subpop),
+            generator.subpop_age, generator.current_scale_steps, generator.previous_scale, generator.last_stats)
+
+
+@pytest.mark.parametrize("field, value", [("previous_scale", np.array("CNoSuchScale")),
+                                          ("vocabulary", np.array("another registry")),
+                                          ("stats", np.array([0.5]))])
+def test_rejected_checkpoint_leaves_the_generator_unchanged(tmp_path, field, value):
+    path = str(tmp_path / "ga.npz")
+    arrays = evolved(seed=2).to_arrays()
+    arrays[field] = value
+    np.savez(path, **arrays)
+    generator = evolved()
+    before = state(generator)
+    assert not GACheckpoint(path).load(generator)
+    assert state(generator) == before
+
+
+def test_vocabulary_key_covers_the_scales(monkeypatch):
+    key = genetic_engine.vocabulary_key()
+    monkeypatch.setattr(genetic_engine, "SCALE_FLAVOURS", genetic_engine.SCALE_FLAVOURS[:-1])
+    assert genetic_engine.vocabulary_key() != key
+
+
+def test_missing_checkpoint_loads_nothing(tmp_path):
+    assert not GACheckpoint(str(tmp_path / "none.npz")).load(evolved(generations=0))
+
+
+def test_empty_checkpoint_is_ignored(tmp_path):
+    path = tmp_path / "ga.npz"
+    path.write_bytes(b"")
+    assert not GACheckpoint(str(path)).load(evolved(generations=0))
@@ -0,0 +1,31 @@
+import pytest
+
+from music.harmony import (CHORD_FLAVOURS, CHORDS, QUALITIES, SCALE_FLAVOURS, get_scale, minor_flavour,
+                           register_chord_type)
+from physics.gravity import QUALITY_COLOURS
+
+
+def test_every_quality_has_a_colour():
+    assert set(QUALITIES) == set(QUALITY_COLOURS)
+    assert {chord.quality for chord in CHORDS} <= set(QUALITIES)
+
+
+def test_register_chord_type_rejects_unknown_quality():
+    count = len(CHORDS)
+    with pytest.raises(ValueError):
+        register_chord_type("test-sus", (0, 5, 7), quality="suspended")
+    assert len(CHORDS) == count
+    assert "test-sus" not in CHORD_FLAVOURS
+
+
+@pytest.mark.parametrize("flavour, minor", [("Major", "Minor"), ("Minor", "Minor"), ("Dorian", "Dorian"),
+                                            ("Lydian", "Minor"), ("MajorPentatonic", "MinorPentatonic"),
+                                            ("Blues", "Blues"), ("WholeTone", "Minor")])
+def test_minor_flavour(flavour, minor):
+    assert minor_flavour(flavour) == minor
+
+
+def test_minor_flavour_is_a_minor_scale_type():
+    for flavour in SCALE_FLAVOURS:
+        intervals = get_scale("C" + minor_flavour(flavour)).intervals
+        assert 3 in intervals and 4 not in intervals
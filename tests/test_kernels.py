@@ -0,0 +1,152 @@
+import importlib.util
+import os
+import sys
+import threading
+import types
+
+import numpy as np
+import pytest
+
+import kernels
+from markov import train_examples
+from markov.MarkovChainMelodyGenerator import MarkovChainMelodyGenerator
+from music.harmony import CHORDS, SCALES, get_chord
+from physics.gravity import Planet, Satellite, calculate_gravity, calculate_gravity_batch
+from physics.orbital_mechanics import predict_path
+
+KERNELS_PATH = os.path.join(os.path.dirname(kernels.__file__), "numba_kernels.py")
+
+
+def load_uncompiled():
+    """kernels.numba_kernels with njit as a no-op, so the kernels run as plain Python, without numba."""
+    fake = types.ModuleType("numba")
+    fake.njit = lambda *args, **kwargs: args[0] if args and callable(args[0]) else (lambda f: f)
+    spec = importlib.util.spec_from_file_location("numba_kernels_uncompiled", KERNELS_PATH)
+    module = importlib.util.module_from_spec(spec)
+    saved = sys.modules.get("numba")
+    sys.modules["numba"] = fake
+    try:
+        spec.loader.exec_module(module)
+    finally:
+        if saved is None:
+            del sys.modules["numba"]
+        else:
+            sys.modules["numba"] = saved
+    return module
+
+
+@pytest.fixture(scope="module", params=["uncompiled", "numba"])
+def compiled(request):
+    if request.param == "uncompiled":
+        return load_uncompiled()
+    pytest.importorskip("numba")
+    from kernels import numba_kernels
+    numba_kernels.warm_up()
+    return numba_kernels
+
+
+def both(monkeypatch, compiled, fn):
+    """fn() on the NumPy reference path, then on the kernels."""
+    monkeypatch.setattr(kernels, "jit", None)
+    reference = fn()
+    monkeypatch.setattr(kernels, "jit", compiled)
+    return reference, fn()
+
+
+def random_planets(rng, count):
+    planets = []
+    center = np.array([640, 360])
+    for _ in range(count):
+        orbiting = rng.random() < 0.7
+        pos = rng.integers(0, 1280, 2) if rng.random() < 0.5 else rng.uniform(0, 1280, 2)
+        planets.append(Planet(pos=pos, mass=float(rng.uniform(1, 50)), chord=CHORDS[0],
+                              orbit_center=center if orbiting else None,
+                              orbit_radius=float(rng.uniform(0, 300)), angular_speed=float(rng.uniform(-1, 1)),
+                              angle=float(rng.uniform(0, 6.3))))
+    return planets
+
+
+def test_gravity_matches_reference(monkeypatch, compiled):
+    rng = np.random.default_rng(0)
+    for _ in range(50):
+        sat = Satellite(rng.uniform(0, 1280, 2))
+        planets = random_planets(rng, int(rng.integers(1, 10)))
+        reference, result = both(monkeypatch, compiled, lambda: calculate_gravity(sat, planets))
+        assert np.array_equal(reference, result)
+
+
+def test_gravity_batch_matches_reference(monkeypatch, compiled):
+    rng = np.random.default_rng(1)
+    for _ in range(50):
+        positions = rng.uniform(-100, 1400, (int(rng.integers(1, 200)), 2))
+        planet_pos = rng.uniform(0, 1280, (int(rng.integers(1, 10)), 2))
+        planet_mass = rng.uniform(1, 50, len(planet_pos))
+        reference, result = both(monkeypatch, compiled,
+                                 lambda: calculate_gravity_batch(positions, planet_pos, planet_mass))
+        assert np.array_equal(reference, result)
+
+
+def test_predict_path_matches_reference(monkeypatch, compiled):
+    rng = np.random.default_rng(2)
+    for _ in range(20):
+        planets = random_planets(rng, int(rng.integers(1, 8)))
+        start, velocity = rng.uniform(0, 1280, 2), rng.uniform(-30, 30, 2)
+        reference, result = both(monkeypatch, compiled, lambda: predict_path(start, velocity, planets, steps=120))
+        assert reference == result
+
+
+def test_chord_bias_matches_reference(monkeypatch, compiled):
+    notes = train_examples.track_1() + train_examples.track_2() + train_examples.track_3()
+    model = MarkovChainMelodyGenerator(list(set(notes)))
+    model.train(notes)
+    rng = np.random.default_rng(3)
+    for i in range(200):
+        chord = get_chord(int(rng.integers(12)), int(rng.integers(8)))
+        scale = SCALES[int(rng.integers(len(SCALES)))]
+        probs = model.transition_matrix[i % len(model.states)]
+        pitch = int(rng.integers(60, 96))
+        reference, result = both(monkeypatch, compiled, lambda: model._apply_chord_bias(
+            probs, pitch, 60 + chord.root, scale.interval_mask, chord.interval_mask))
+        assert np.array_equal(reference, result)
+
+
+@pytest.mark.parametrize("size", [0, 1, 7, 8, 9, 127, 128, 129, 255, 256, 300, 1000, 4097])
+def test_pairwise_sum_matches_np_sum(compiled, size):
+    values = np.random.default_rng(size).standard_normal(size) * 1e6
+    assert compiled.pairwise_sum(values) == np.sum(values)
+
+
+def test_select_numpy_clears_the_kernels(monkeypatch):
+    monkeypatch.setattr(kernels, "jit", object())
+    assert kernels.select("numpy") == "numpy"
+    assert kernels.jit is None
+
+
+def join_warm_up():
+    for thread in threading.enumerate():
+        if thread.name == "kernels":
+            thread.join(timeout=120)
+
+
+def test_select_in_background_switches_once_compiled(monkeypatch):
+    pytest.importorskip("numba")
+    monkeypatch.setattr(kernels, "jit", None)
+    assert kernels.select("numba", background=True) == "numba"
+    join_warm_up()
+    from kernels import numba_kernels
+    assert kernels.jit is numba_kernels
+    kernels.select("numpy")
+
+
+def test_select_numpy_cancels_a_background_warm_up(monkeypatch):
+    pytest.importorskip("numba")
+    monkeypatch.setattr(kernels, "jit", None)
+    kernels.select("numba", background=True)
+    kernels.select("numpy")
+    join_warm_up()
+    assert kernels.jit is None
+
+
+def test_select_rejects_unknown_backend():
+    with pytest.raises(ValueError):
+        kernels.select("cuda")
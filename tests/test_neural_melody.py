@@ -0,0 +1,113 @@
+import time
+
+import numpy as np
+import pytest
+
+from ai.neural_melody import NeuralMelodyEngine
+from config import Config
+from music.harmony import get_chord, get_scale
+from music.sequencer import fold_melody_pitch
+
+C_MAJOR = get_scale("CMajor")
+C, G = get_chord(0, "maj"), get_chord(7, "maj")
+MARKOV = 7  # A fallback interval the stand-in network never picks
+
+
+def predictor(delay: float = 0.0):
+    """A numpy stand-in for the network: always +2 over a chord on the scale's root, -2 over any other."""
+    def predict(features: np.ndarray) -> np.ndarray:
+        if delay:
+            time.sleep(delay)
+        logits = np.full((len(features), Config.OUTPUT_SIZE), -50.0, dtype=np.float32)
+        interval = np.where(features[:, -2] == 0.0, 2, -2)
+        logits[np.arange(len(features)), interval + Config.OUTPUT_SIZE // 2] = 0.0
+        return logits
+    return predict
+
+
+@pytest.fixture
+def engine_for():
+    engines = []
+
+    def make(**kwargs):
+        engine = NeuralMelodyEngine(kwargs.pop("predict", predictor()), seed=0, **kwargs)
+        engine.start()
+        engines.append(engine)
+        return engine
+    yield make
+    for engine in engines:
+        engine.stop()
+
+
+def play(engine, pitch, chord, notes, gap=0.002):
+    """Plays notes at a steady rate, as the sequencer does; returns the intervals and the last pitch."""
+    intervals = []
+    for _ in range(notes):
+        interval = engine.next_interval(MARKOV, pitch, chord, C_MAJOR, 100)
+        intervals.append(interval)
+        pitch = fold_melody_pitch(pitch + interval)
+        time.sleep(gap)
+    return intervals, pitch
+
+
+def wait_for_predictions(engine, voice=0, timeout=5.0):
+    deadline = time.perf_counter() + timeout
+    while time.perf_counter() < deadline:
+        with engine._condition:
+            state = engine._voices.get(voice)
+            if state is not None and state.predicted and not state.pending:
+                return
+        time.sleep(0.001)
+    raise AssertionError("no predictions arrived")
+
+
+def test_steady_notes_are_prefetched(engine_for):
+    engine = engine_for(budget=1.0)
+    intervals, _ = play(engine, 72, C, 60)
+    assert intervals == [2] * 60
+    assert engine.fallbacks == 0
+
+
+def test_without_a_budget_only_the_first_note_falls_back(engine_for):
+    engine = engine_for(budget=0.0)
+    intervals, _ = play(engine, 72, C, 60)
+    assert intervals[0] == MARKOV and intervals[1:] == [2] * 59
+    assert engine.fallbacks == 1
+
+
+def test_a_chord_change_drops_the_predictions(engine_for):
+    engine = engine_for(budget=0.0)
+    _, pitch = play(engine, 72, C, 5)
+    wait_for_predictions(engine)
+    # Everything predicted over C is dropped: the first note over G has nothing ready
+    assert engine.next_interval(MARKOV, pitch, G, C_MAJOR, 100) == MARKOV
+    wait_for_predictions(engine)
+    intervals, _ = play(engine, fold_melody_pitch(pitch + MARKOV), G, 20)
+    assert intervals == [-2] * 20
+    assert engine.fallbacks == 2
+
+
+def test_a_note_the_network_did_not_pick_drops_the_predictions(engine_for):
+    engine = engine_for(budget=0.0)
+    _, pitch = play(engine, 72, C, 5)
+    wait_for_predictions(engine)
+    # The sequencer played something else, so predictions from the expected pitch don't apply
+    assert engine.next_interval(MARKOV, pitch + 1, C, C_MAJOR, 100) == MARKOV
+
+
+def test_a_slow_network_falls_back_to_the_markov_model_in_time(engine_for):
+    engine = engine_for(budget=0.005, predict=predictor(delay=0.2))
+    start = time.perf_counter()
+    intervals, _ = play(engine, 72, C, 3, gap=0.0)
+    assert intervals == [MARKOV] * 3
+    assert engine.fallbacks == 3
+    # Waits out the budget, not the network
+    assert time.perf_counter() - start < 0.15
+
+
+def test_no_budget_never_waits(engine_for):
+    engine = engine_for(budget=0.0, predict=predictor(delay=0.2))
+    start = time.perf_counter()
+    for _ in range(20):
+        assert engine.next_interval(MARKOV, 72, C, C_MAJOR, 100) == MARKOV
+    assert time.perf_counter() - start < 0.05
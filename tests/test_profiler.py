@@ -0,0 +1,68 @@
+import json
+
+import pytest
+
+from profiler import FrameProfiler, RateTimer
+
+
+class FakeClock:
+    def __init__(self):
+        self.now = 0.0
+
+    def __call__(self):
+        return self.now
+
+
+def profile_frames(durations, clock=None):
+    """A profiler fed one frame per dict of stage -> seconds, run in order."""
+    clock = clock or FakeClock()
+    profiler = FrameProfiler(enabled=True, capacity=64, clock=clock)
+    for stages in durations:
+        profiler.begin_frame()
+        for name, seconds in stages.items():
+            clock.now += seconds
+            profiler.mark(name)
+    profiler.begin_frame()
+    return profiler, clock
+
+
+def test_rate_timer_stats_cover_the_last_window():
+    timer = RateTimer("Music", 100.0, window=10, capacity=50)
+    for i in range(40):
+        timer.record(0.0, 0.010 if i < 30 else 0.001, i * 0.01)
+    assert timer.stats()["Work p99"] == 1.0
+    starts, work = timer.spans()
+    assert len(starts) == 40 and starts[0] == 0.0
+
+
+def test_trace_includes_the_timers_over_the_frames(tmp_path):
+    clock = FakeClock()
+    clock.now = 10.0
+    profiler, clock = profile_frames([{"Render": 0.010, "Flip": 0.002}] * 3, clock)
+    ga = RateTimer("GA", 8.0)
+    ga.record(0.0, 0.001, 5.0)  # Before the traced frames
+    ga.record(0.0, 0.003, 10.005)
+    path = tmp_path / "trace.json"
+    profiler.write_trace(str(path), [RateTimer("Input", 120.0), ga])
+
+    events = json.loads(path.read_text())["traceEvents"]
+    tracks = {event["tid"]: event["args"]["name"] for event in events if event["ph"] == "M"}
+    assert tracks == {0: "Frame", 1: "Render stages", 2: "Input", 3: "GA"}
+    ga_events = [event for event in events if event["ph"] == "X" and event["tid"] == 3]
+    assert len(ga_events) == 1
+    assert abs(ga_events[0]["ts"] - 5000.0) < 1e-6 and abs(ga_events[0]["dur"] - 3000.0) < 1e-6
+
+
+def test_stage_stats_only_count_frames_the_stage_ran_in():
+    frames = [{"Render": 0.010, "Flip": 0.002}] * 9 + [{"Render": 0.010, "Predict path": 0.004, "Flip": 0.002}]
+    stats = profile_frames(frames)[0].stats()
+    assert stats["Predict path"]["p50"] == stats["Predict path"]["max"] == pytest.approx(4.0)
+    assert stats["Predict path"]["frames"] == 1
+    # The frame total still covers every frame
+    assert stats["Frame"]["frames"] == 10 and stats["Frame"]["p50"] == pytest.approx(12.0)
+
+
+def test_stages_that_did_not_run_are_left_out():
+    profiler = profile_frames([{"Render": 0.010, "Predict path": 0.004}] + [{"Render": 0.010}] * 5)[0]
+    assert "Predict path" not in profiler.stats(window=5)
+    assert "Predict path" in profiler.stats(window=6)
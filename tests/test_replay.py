@@ -0,0 +1,20 @@
+import sys
+
+import pytest
+
+import offline
+import replay
+from session_log import read_log
+
+
+@pytest.mark.parametrize("chunk", [replay.CHUNK, 7])
+def test_replaying_an_offline_log_reproduces_its_midi_file(tmp_path, monkeypatch, chunk):
+    rendered, log, replayed = (str(tmp_path / name) for name in ("render.mid", "render.blog", "replay.mid"))
+    monkeypatch.setattr(sys, "argv", ["offline.py", "--duration", "20", "--keys", "0:CMajor,8:GMinor",
+                                      "--out", rendered, "--log", log])
+    offline.main()
+    # A small chunk size puts chunk boundaries between events at the same time
+    monkeypatch.setattr(replay, "CHUNK", chunk)
+    assert replay.replay_to_file(read_log(log), replayed) > 0
+    with open(rendered, "rb") as a, open(replayed, "rb") as b:
+        assert a.read() == b.read()
@@ -0,0 +1,61 @@
+import math
+
+from music.midi_backends import CLOCK_MESSAGE, START_MESSAGE, encode_note_off, encode_note_on
+from music.scheduler import PPQN, MIDIScheduler
+from music.sequencer import MusicalClock
+
+
+def make_scheduler(now: float = 0.0):
+    sent = []
+    scheduler = MIDIScheduler(lambda batch: sent.extend(batch), clock=lambda: now)
+    return scheduler, sent
+
+
+def test_dispatch_due_inf_flushes_the_queue():
+    scheduler, sent = make_scheduler()
+    scheduler.schedule_note(0.0, 60, 100, 0.5, 0)
+    scheduler.schedule_note(1.0, 62, 100, 0.5, 1)
+    assert scheduler.dispatch_due(math.inf) == 4
+    assert sent == [encode_note_on(0, 60, 100), encode_note_off(0, 60),
+                    encode_note_on(1, 62, 100), encode_note_off(1, 62)]
+    assert scheduler.queued == 0
+    assert scheduler.sounding == {}
+
+
+def test_dispatch_due_inf_with_transport_terminates_without_clock():
+    scheduler, sent = make_scheduler()
+    scheduler.start_transport(MusicalClock(lambda: 0.0, 120))
+    scheduler.schedule_note(0.25, 60, 100, 0.5, 0)
+    assert scheduler.dispatch_due(math.inf) == 2
+    assert START_MESSAGE in sent
+    assert CLOCK_MESSAGE not in sent
+
+
+def test_clock_pulses_up_to_now():
+    scheduler, sent = make_scheduler()
+    scheduler.start_transport(MusicalClock(lambda: 0.0, 120))
+    # One beat at 120 BPM, pulses at 0 and at every 1/24 beat up to and including it
+    scheduler.dispatch_due(0.5)
+    assert sent.count(CLOCK_MESSAGE) == PPQN + 1
+
+
+def test_overlapping_notes_send_one_note_off():
+    scheduler, sent = make_scheduler()
+    scheduler.schedule_note(0.0, 60, 100, 1.0, 0)
+    scheduler.schedule_note(0.5, 60, 90, 1.0, 0)
+    scheduler.dispatch_due(1.2)
+    assert scheduler.sounding == {(60, 0): 1}
+    assert encode_note_off(0, 60) not in sent
+    scheduler.dispatch_due(1.5)
+    assert scheduler.sounding == {}
+    assert sent.count(encode_note_off(0, 60)) == 1
+
+
+def test_clear_silences_sounding_notes():
+    scheduler, sent = make_scheduler()
+    scheduler.schedule_note(0.0, 64, 100, 1.0, 2)
+    scheduler.dispatch_due(0.0)
+    scheduler.clear()
+    assert sent[-1] == encode_note_off(2, 64)
+    assert scheduler.queued == 0
+    assert scheduler.sounding == {}